@@ -0,0 +1,190 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from django.conf import settings
+
+from ai import metrics
+
+
+class AdmissionRejected(Exception):
+    """
+    A chat request was refused; the client may retry after RETRY_AFTER
+    seconds.
+    """
+
+    def __init__(self, reason, message, retry_after):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Take one token. Returns 0 on success, otherwise the seconds until a
+        token is available.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class Waiter:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.event = threading.Event()
+        self.granted = False
+
+
+class Slot:
+    """
+    An admitted request's agent slot, released when the `with` block exits.
+    """
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.started = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.scheduler.release(time.monotonic() - self.started)
+
+
+class FairScheduler:
+    """
+    Admission control in front of the document agent for this process.
+
+    Each user has a token bucket (AGENT_CHAT_RATE_PER_MINUTE, bursts of
+    AGENT_CHAT_BURST). At most AGENT_CHAT_MAX_RUNNING requests run the agent
+    at once; the others wait in a bounded queue served in weighted fair
+    order, so a user with many queued requests cannot delay everyone else.
+    Requests over any limit are rejected immediately with a retry delay.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}
+        self.running = 0
+        self.queue = []  # heap of (finish tag, sequence, waiter)
+        self.queued_per_user = {}
+        self.sequence = itertools.count()
+        # Weighted fair queuing: a request's finish tag is its user's last
+        # tag (or the current virtual time, if later) plus 1 / weight.
+        self.virtual_time = 0.0
+        self.last_tags = {}
+        self.average_run = 5.0
+
+    def check_rate(self, user_id):
+        with self.lock:
+            bucket = self.buckets.get(user_id)
+            if bucket is None:
+                bucket = self.buckets[user_id] = TokenBucket(
+                    settings.AGENT_CHAT_RATE_PER_MINUTE / 60, settings.AGENT_CHAT_BURST
+                )
+            wait = bucket.take()
+        if wait:
+            self.reject("rate_limited", "Too many chat requests.", wait)
+
+    def admit(self, user_id):
+        """
+        Rate-limit USER_ID and wait for an agent slot. Returns a Slot to use
+        as a context manager; raises AdmissionRejected when over capacity.
+        """
+        self.check_rate(user_id)
+
+        with self.lock:
+            if self.running < settings.AGENT_CHAT_MAX_RUNNING and not self.queue:
+                self.running += 1
+                self.update_gauges()
+                metrics.agent_chat_queue_wait.observe(0)
+                return Slot(self)
+
+            queued = self.queued_per_user.get(user_id, 0)
+            if len(self.queue) >= settings.AGENT_CHAT_MAX_QUEUED:
+                reason, message = "queue_full", "The agent is at capacity."
+            elif queued >= settings.AGENT_CHAT_MAX_QUEUED_PER_USER:
+                reason, message = "user_queue_full", "Too many queued chat requests."
+            else:
+                reason = None
+            if reason:
+                retry_after = self.estimate_wait(len(self.queue))
+            else:
+                waiter = Waiter(user_id)
+                tag = max(self.virtual_time, self.last_tags.get(user_id, 0.0))
+                tag += 1 / get_user_weight(user_id)
+                self.last_tags[user_id] = tag
+                heapq.heappush(self.queue, (tag, next(self.sequence), waiter))
+                self.queued_per_user[user_id] = queued + 1
+                self.update_gauges()
+        if reason:
+            self.reject(reason, message, retry_after)
+
+        started = time.monotonic()
+        waiter.event.wait(settings.AGENT_CHAT_QUEUE_TIMEOUT)
+        with self.lock:
+            if not waiter.granted:
+                self.queue = [entry for entry in self.queue if entry[2] is not waiter]
+                heapq.heapify(self.queue)
+                self.dequeued(user_id)
+                self.update_gauges()
+                retry_after = self.estimate_wait(len(self.queue))
+        metrics.agent_chat_queue_wait.observe(time.monotonic() - started)
+        if not waiter.granted:
+            self.reject(
+                "queue_timeout", "Timed out waiting for the agent.", retry_after
+            )
+        return Slot(self)
+
+    def release(self, duration):
+        with self.lock:
+            self.average_run = 0.9 * self.average_run + 0.1 * duration
+            if self.queue:
+                # Hand the slot straight to the next request in fair order.
+                tag, _, waiter = heapq.heappop(self.queue)
+                self.virtual_time = tag
+                self.dequeued(waiter.user_id)
+                waiter.granted = True
+                waiter.event.set()
+            else:
+                self.running -= 1
+                self.virtual_time = 0.0
+                self.last_tags.clear()
+            self.update_gauges()
+
+    def dequeued(self, user_id):
+        self.queued_per_user[user_id] -= 1
+        if not self.queued_per_user[user_id]:
+            del self.queued_per_user[user_id]
+
+    def estimate_wait(self, queued):
+        return (queued + 1) * self.average_run / settings.AGENT_CHAT_MAX_RUNNING
+
+    def update_gauges(self):
+        metrics.agent_chat_queue_depth.set(len(self.queue))
+        metrics.agent_chat_running.set(self.running)
+
+    def reject(self, reason, message, retry_after):
+        metrics.agent_chat_rejections.inc(reason=reason)
+        raise AdmissionRejected(reason, message, retry_after)
+
+
+def get_user_weight(user_id):
+    return settings.AGENT_CHAT_USER_WEIGHTS.get(str(user_id), 1)
+
+
+chat_scheduler = FairScheduler()
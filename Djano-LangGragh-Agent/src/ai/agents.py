@@ -1,5 +1,6 @@
 from langgraph.prebuilt import create_react_agent
 
+from ai.history import get_history_hook
 from ai.llms import get_openai_model
 from ai.tools.documents import document_tools
 
@@ -11,6 +12,7 @@ def get_document_agent(model=None, checkpointer=None):
         model=llm_model,
         tools=document_tools,
         prompt="You are a helpful assistant in managing a user's documents within this app.",
+        pre_model_hook=get_history_hook(llm_model),
         checkpointer=checkpointer,
         name="document-assistant",
     )
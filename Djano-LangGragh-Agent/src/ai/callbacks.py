@@ -0,0 +1,127 @@
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from ai import metrics
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    Record agent graph steps, LLM calls (with token usage) and tool calls
+    as request spans and in-process metrics. One instance per agent run.
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self.runs = {}
+
+    def start(self, run_id, name):
+        self.runs[run_id] = (time.perf_counter(), name)
+
+    def finish(self, run_id):
+        return self.runs.pop(run_id, None)
+
+    # Graph steps: the run of a LangGraph node carries its name in metadata.
+
+    def on_chain_start(
+        self, serialized, inputs, *, run_id, metadata=None, name=None, **kwargs
+    ):
+        node = (metadata or {}).get("langgraph_node")
+        if node and node == name:
+            self.start(run_id, node)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        run = self.finish(run_id)
+        if run is not None:
+            start, node = run
+            duration = metrics.record_span("step", node, start)
+            metrics.agent_step_duration.observe(duration, node=node)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        run = self.finish(run_id)
+        if run is not None:
+            start, node = run
+            metrics.record_span("step", node, start, error=type(error).__name__)
+            metrics.agent_errors.inc(kind="step", error=type(error).__name__)
+
+    # LLM calls
+
+    def on_chat_model_start(
+        self, serialized, messages, *, run_id, metadata=None, **kwargs
+    ):
+        model = (metadata or {}).get("ls_model_name") or "unknown"
+        self.start(run_id, model)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        model = (metadata or {}).get("ls_model_name") or "unknown"
+        self.start(run_id, model)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self.finish(run_id)
+        if run is None:
+            return
+        start, model = run
+        prompt_tokens, completion_tokens = get_token_usage(response)
+        duration = metrics.record_span(
+            "llm",
+            model,
+            start,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+        )
+        metrics.agent_llm_duration.observe(duration, model=model)
+        metrics.agent_llm_tokens.inc(prompt_tokens, model=model, kind="prompt")
+        metrics.agent_llm_tokens.inc(completion_tokens, model=model, kind="completion")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self.finish(run_id)
+        if run is not None:
+            start, model = run
+            metrics.record_span("llm", model, start, error=type(error).__name__)
+        metrics.agent_errors.inc(kind="llm", error=type(error).__name__)
+
+    # Tool calls
+
+    def on_tool_start(self, serialized, input_str, *, run_id, name=None, **kwargs):
+        self.start(run_id, name or (serialized or {}).get("name") or "unknown")
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        run = self.finish(run_id)
+        if run is None:
+            return
+        start, tool = run
+        content = getattr(output, "content", output)
+        size = len(content if isinstance(content, str) else str(content))
+        duration = metrics.record_span("tool", tool, start, result_chars=size)
+        metrics.agent_tool_duration.observe(duration, tool=tool, status="ok")
+        metrics.agent_tool_result_size.observe(size, tool=tool)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        run = self.finish(run_id)
+        if run is None:
+            return
+        start, tool = run
+        duration = metrics.record_span("tool", tool, start, error=type(error).__name__)
+        metrics.agent_tool_duration.observe(duration, tool=tool, status="error")
+        metrics.agent_errors.inc(kind="tool", error=type(error).__name__)
+
+
+def get_token_usage(response):
+    """
+    Return (prompt_tokens, completion_tokens) of an LLMResult.
+    """
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+    if not prompt_tokens and not completion_tokens:
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+
+from ai.agents import get_document_agent
+from ai.callbacks import MetricsCallbackHandler
+from ai.checkpointer import get_checkpointer, prune_thread
+from ai.db import database_sync_to_async
+from ai.metrics import metrics_enabled
+
+
+def describe_update(update):
+    """
+    Turn a LangGraph "updates" stream chunk into small progress events.
+    """
+    events = []
+    for node, values in update.items():
+        for message in (values or {}).get("messages", []):
+            if getattr(message, "tool_calls", None):
+                tools = [call["name"] for call in message.tool_calls]
+                events.append({"type": "tool_calls", "node": node, "tools": tools})
+            elif message.type == "tool":
+                events.append(
+                    {"type": "tool_result", "node": node, "tool": message.name}
+                )
+            elif message.type == "ai":
+                events.append({"type": "message", "node": node})
+    return events
+
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def get_agent_loop():
+    """
+    The event loop every agent turn of this process runs on, started in a
+    daemon thread on first use. A single long-lived loop lets the model's and
+    the tools' async HTTP clients keep their connection pools across turns.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="agent-loop", daemon=True
+            ).start()
+    return _loop
+
+
+def run_chat(thread, prompt, on_event=None):
+    """
+    Run one user turn of the document agent on a chat thread and return the
+    final response text. ON_EVENT is called with each progress event.
+
+    Synchronous entry point for views and the job worker: the turn runs on the
+    agent loop so the agent's tool calls of one step execute concurrently.
+    """
+    future = asyncio.run_coroutine_threadsafe(
+        arun_chat(thread, prompt, on_event=on_event), get_agent_loop()
+    )
+    return future.result()
+
+
+async def arun_chat(thread, prompt, on_event=None):
+    agent = get_document_agent(checkpointer=get_checkpointer())
+    inputs = {"messages": [{"role": "user", "content": prompt}]}
+    config = {
+        "configurable": {"user_id": thread.owner_id, "thread_id": thread.thread_id}
+    }
+    if metrics_enabled():
+        config["callbacks"] = [MetricsCallbackHandler()]
+
+    state = None
+    async for mode, chunk in agent.astream(
+        inputs, config=config, stream_mode=["updates", "values"]
+    ):
+        if mode == "values":
+            state = chunk
+        elif on_event is not None:
+            for event in describe_update(chunk):
+                await database_sync_to_async(on_event)(event)
+
+    await database_sync_to_async(finish_turn)(thread)
+    return state["messages"][-1].content
+
+
+def finish_turn(thread):
+    thread.save(update_fields=["updated_at"])
+    prune_thread(thread.thread_id)
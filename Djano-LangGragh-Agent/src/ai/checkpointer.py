@@ -0,0 +1,287 @@
+import random
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from ai.db import database_sync_to_async
+from ai.models import ChatThread, Checkpoint, CheckpointWrite
+
+# Checkpoints whose pending writes list() loads with one query.
+WRITES_BATCH_SIZE = 200
+
+
+def checkpoint_key(row):
+    return (row.thread_id, row.checkpoint_ns, row.checkpoint_id)
+
+
+class DjangoCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer stored in the project database through the ORM,
+    so it works on both SQLite and PostgreSQL.
+    """
+
+    def get_tuple(self, config):
+        configurable = config["configurable"]
+        queryset = Checkpoint.objects.filter(
+            thread_id=str(configurable["thread_id"]),
+            checkpoint_ns=configurable.get("checkpoint_ns", ""),
+        )
+        if checkpoint_id := get_checkpoint_id(config):
+            queryset = queryset.filter(checkpoint_id=checkpoint_id)
+        row = queryset.order_by("-checkpoint_id").first()
+        if row is None:
+            return None
+        return self.to_tuple(row)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        queryset = Checkpoint.objects.all()
+        if config is not None:
+            configurable = config["configurable"]
+            queryset = queryset.filter(thread_id=str(configurable["thread_id"]))
+            if "checkpoint_ns" in configurable:
+                queryset = queryset.filter(checkpoint_ns=configurable["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                queryset = queryset.filter(checkpoint_id=checkpoint_id)
+        for key, value in (filter or {}).items():
+            queryset = queryset.filter(**{f"metadata__{key}": value})
+        if before is not None:
+            queryset = queryset.filter(checkpoint_id__lt=get_checkpoint_id(before))
+        queryset = queryset.order_by("-checkpoint_id")
+        if limit is not None:
+            queryset = queryset[:limit]
+        rows = list(queryset)
+        # One query for the pending writes of each batch of checkpoints.
+        for start in range(0, len(rows), WRITES_BATCH_SIZE):
+            batch = rows[start : start + WRITES_BATCH_SIZE]
+            writes = self.load_writes(batch)
+            for row in batch:
+                yield self.to_tuple(row, writes[checkpoint_key(row)])
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        configurable = config["configurable"]
+        thread_id = str(configurable["thread_id"])
+        checkpoint_ns = configurable.get("checkpoint_ns", "")
+        type_, serialized = self.serde.dumps_typed(checkpoint)
+        # Single INSERT .. ON CONFLICT statement: no read-then-write race
+        # between the graph's background saver threads.
+        Checkpoint.objects.bulk_create(
+            [
+                Checkpoint(
+                    thread_id=thread_id,
+                    checkpoint_ns=checkpoint_ns,
+                    checkpoint_id=checkpoint["id"],
+                    parent_checkpoint_id=configurable.get("checkpoint_id"),
+                    type=type_,
+                    checkpoint=serialized,
+                    metadata=get_checkpoint_metadata(config, metadata),
+                )
+            ],
+            update_conflicts=True,
+            unique_fields=["thread_id", "checkpoint_ns", "checkpoint_id"],
+            update_fields=["parent_checkpoint_id", "type", "checkpoint", "metadata"],
+        )
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        configurable = config["configurable"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, serialized = self.serde.dumps_typed(value)
+            rows.append(
+                CheckpointWrite(
+                    thread_id=str(configurable["thread_id"]),
+                    checkpoint_ns=configurable.get("checkpoint_ns", ""),
+                    checkpoint_id=str(configurable["checkpoint_id"]),
+                    task_id=task_id,
+                    task_path=task_path,
+                    idx=WRITES_IDX_MAP.get(channel, idx),
+                    channel=channel,
+                    type=type_,
+                    value=serialized,
+                )
+            )
+
+        # Special channels (errors, interrupts) overwrite; regular writes
+        # are only stored once per task and index.
+        unique_fields = [
+            "thread_id",
+            "checkpoint_ns",
+            "checkpoint_id",
+            "task_id",
+            "idx",
+        ]
+        if all(channel in WRITES_IDX_MAP for channel, _ in writes):
+            CheckpointWrite.objects.bulk_create(
+                rows,
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=["task_path", "channel", "type", "value"],
+            )
+        else:
+            CheckpointWrite.objects.bulk_create(rows, ignore_conflicts=True)
+
+    def delete_thread(self, thread_id):
+        with transaction.atomic():
+            Checkpoint.objects.filter(thread_id=str(thread_id)).delete()
+            CheckpointWrite.objects.filter(thread_id=str(thread_id)).delete()
+
+    # Async API used by agent.astream(), see ai.db.database_sync_to_async.
+
+    async def aget_tuple(self, config):
+        return await database_sync_to_async(self.get_tuple)(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        rows = await database_sync_to_async(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )()
+        for row in rows:
+            yield row
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await database_sync_to_async(self.put)(
+            config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await database_sync_to_async(self.put_writes)(
+            config, writes, task_id, task_path
+        )
+
+    async def adelete_thread(self, thread_id):
+        await database_sync_to_async(self.delete_thread)(thread_id)
+
+    def prune(self, thread_ids, *, strategy="keep_latest"):
+        for thread_id in thread_ids:
+            if strategy == "delete":
+                self.delete_thread(thread_id)
+            else:
+                prune_thread(thread_id, keep=1)
+
+    def get_next_version(self, current, channel):
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def load_writes(self, rows):
+        """
+        Pending writes of the checkpoint ROWS, by checkpoint_key.
+        """
+        keys = {checkpoint_key(row) for row in rows}
+        writes = CheckpointWrite.objects.filter(
+            thread_id__in={thread_id for thread_id, _, _ in keys},
+            checkpoint_id__in={checkpoint_id for _, _, checkpoint_id in keys},
+        )
+        by_checkpoint = defaultdict(list)
+        for write in writes:
+            if checkpoint_key(write) in keys:
+                by_checkpoint[checkpoint_key(write)].append(write)
+        return by_checkpoint
+
+    def to_tuple(self, row, writes=None):
+        config = {
+            "configurable": {
+                "thread_id": row.thread_id,
+                "checkpoint_ns": row.checkpoint_ns,
+                "checkpoint_id": row.checkpoint_id,
+            }
+        }
+        parent_config = None
+        if row.parent_checkpoint_id:
+            parent_config = {
+                "configurable": {
+                    "thread_id": row.thread_id,
+                    "checkpoint_ns": row.checkpoint_ns,
+                    "checkpoint_id": row.parent_checkpoint_id,
+                }
+            }
+        if writes is None:
+            writes = self.load_writes([row])[checkpoint_key(row)]
+        writes = sorted(
+            writes, key=lambda w: writes_sort_key(w.task_path, w.task_id, w.idx)
+        )
+        return CheckpointTuple(
+            config,
+            self.serde.loads_typed((row.type, bytes(row.checkpoint))),
+            row.metadata,
+            parent_config,
+            [
+                (w.task_id, w.channel, self.serde.loads_typed((w.type, bytes(w.value))))
+                for w in writes
+            ],
+        )
+
+
+def prune_thread(thread_id, keep=None):
+    """
+    Delete all but the latest KEEP checkpoints (per namespace) of a thread,
+    along with their pending writes.
+    """
+    keep = keep or settings.AGENT_CHECKPOINTS_KEEP
+    namespaces = (
+        Checkpoint.objects.filter(thread_id=thread_id)
+        .values_list("checkpoint_ns", flat=True)
+        .distinct()
+    )
+    with transaction.atomic():
+        for checkpoint_ns in list(namespaces):
+            checkpoints = Checkpoint.objects.filter(
+                thread_id=thread_id, checkpoint_ns=checkpoint_ns
+            )
+            kept = checkpoints.order_by("-checkpoint_id").values_list(
+                "checkpoint_id", flat=True
+            )[keep - 1 : keep]
+            if not kept:
+                continue
+            oldest_kept = kept[0]
+            checkpoints.filter(checkpoint_id__lt=oldest_kept).delete()
+            CheckpointWrite.objects.filter(
+                thread_id=thread_id,
+                checkpoint_ns=checkpoint_ns,
+                checkpoint_id__lt=oldest_kept,
+            ).delete()
+
+
+def prune_expired_threads(days=None):
+    """
+    Delete threads (and all their checkpoints) idle for more than DAYS days.
+    """
+    days = days or settings.AGENT_THREAD_RETENTION_DAYS
+    cutoff = timezone.now() - timedelta(days=days)
+    expired = list(
+        ChatThread.objects.filter(updated_at__lt=cutoff).values_list(
+            "thread_id", flat=True
+        )
+    )
+    with transaction.atomic():
+        Checkpoint.objects.filter(thread_id__in=expired).delete()
+        CheckpointWrite.objects.filter(thread_id__in=expired).delete()
+        ChatThread.objects.filter(thread_id__in=expired).delete()
+    return len(expired)
+
+
+checkpointer = DjangoCheckpointSaver()
+
+
+def get_checkpointer():
+    return checkpointer
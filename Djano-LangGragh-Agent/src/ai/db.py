@@ -0,0 +1,20 @@
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def database_sync_to_async(func):
+    """
+    sync_to_async for ORM calls made from the agent loop. They run in the
+    loop's thread pool (thread_sensitive=False), so concurrent turns do not
+    queue on one thread. Those threads never see a request finish, so the
+    connection is closed after each call, as Django does after a request.
+    """
+
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(call, thread_sensitive=False)
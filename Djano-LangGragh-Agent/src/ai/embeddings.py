@@ -0,0 +1,85 @@
+import hashlib
+import re
+from functools import lru_cache
+
+import numpy as np
+from django.conf import settings
+from langchain_core.embeddings import Embeddings
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class StubEmbeddings(Embeddings):
+    """
+    Offline embeddings using the hashing trick over words and word pairs.
+    Deterministic across processes, no model download or API key needed.
+    """
+
+    def __init__(self, dimensions=256):
+        self.dimensions = dimensions
+
+    def embed_text(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        words = TOKEN_RE.findall((text or "").lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            sign = 1.0 if value & 1 else -1.0
+            vector[(value >> 1) % self.dimensions] += sign
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_text(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_text(text)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings from a local sentence-transformers model (CPU only).
+    """
+
+    def __init__(self, model):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as exc:
+            raise ImportError(
+                "EMBEDDING_PROVIDER=local requires `pip install sentence-transformers`."
+            ) from exc
+        self.model = SentenceTransformer(model, device="cpu")
+
+    def embed_documents(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def get_embedding_model(provider=None):
+    """
+    The embedding model of PROVIDER (default EMBEDDING_PROVIDER), created
+    once per process and shared.
+    """
+    return load_embedding_model(provider or settings.EMBEDDING_PROVIDER)
+
+
+@lru_cache(maxsize=None)
+def load_embedding_model(provider):
+    if provider == "stub":
+        return StubEmbeddings()
+    if provider == "local":
+        return LocalEmbeddings(model=settings.EMBEDDING_MODEL or "all-MiniLM-L6-v2")
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(
+            model=settings.EMBEDDING_MODEL or "text-embedding-3-small",
+            api_key=settings.OPENAI_API_KEY,
+            base_url=settings.OPENAI_BASE_URL,
+        )
+    raise ValueError(f"Unknown EMBEDDING_PROVIDER: {provider}")
@@ -0,0 +1,71 @@
+from django.conf import settings
+from langchain_core.messages import RemoveMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+
+SUMMARY_MESSAGE_ID = "conversation-summary"
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below between a user and a document assistant. "
+    "Keep document ids, titles and any facts or preferences the user stated. "
+    "Reply with the summary only."
+)
+
+
+def summarize_messages(llm_model, previous_summary, messages):
+    transcript = "\n".join(
+        f"{message.type}: {message.content}" for message in messages if message.content
+    )
+    if previous_summary:
+        transcript = f"Earlier summary: {previous_summary}\n\n{transcript}"
+    response = llm_model.invoke(
+        [("system", SUMMARY_PROMPT), ("human", transcript)],
+    )
+    return response.content
+
+
+def get_history_hook(llm_model, max_tokens=None):
+    """
+    Build a pre-model hook that keeps the history sent to the model under
+    MAX_TOKENS. When the thread grows past it, the older messages are folded
+    into a running summary and the most recent half of the budget is kept.
+    """
+    max_tokens = max_tokens or settings.AGENT_HISTORY_MAX_TOKENS
+
+    def bound_history(state):
+        messages = state["messages"]
+        if count_tokens_approximately(messages) <= max_tokens:
+            return {}
+
+        summary = None
+        if messages and messages[0].id == SUMMARY_MESSAGE_ID:
+            summary, messages = messages[0].content, messages[1:]
+
+        # Start the kept window on a human message so tool calls are never
+        # separated from their results.
+        kept = trim_messages(
+            messages,
+            max_tokens=max_tokens // 2,
+            token_counter=count_tokens_approximately,
+            strategy="last",
+            start_on="human",
+        )
+        if not kept:
+            human_indexes = [i for i, m in enumerate(messages) if m.type == "human"]
+            kept = messages[human_indexes[-1] :] if human_indexes else messages
+        dropped = messages[: len(messages) - len(kept)]
+        if dropped:
+            summary = summarize_messages(llm_model, summary, dropped)
+
+        updated = [RemoveMessage(id=REMOVE_ALL_MESSAGES)]
+        if summary:
+            updated.append(
+                SystemMessage(
+                    content=summary,
+                    id=SUMMARY_MESSAGE_ID,
+                    name="conversation_summary",
+                )
+            )
+        return {"messages": updated + kept}
+
+    return bound_history
@@ -0,0 +1,196 @@
+import logging
+import threading
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from ai.chat import run_chat
+from ai.models import ChatJob, ChatJobEvent
+
+logger = logging.getLogger(__name__)
+
+
+class TooManyJobs(Exception):
+    pass
+
+
+class LeaseLost(Exception):
+    """
+    The job was re-queued (its lease ran out) and may run elsewhere.
+    """
+
+
+def submit_job(thread, prompt):
+    """
+    Queue a chat turn for the worker pool. Raises TooManyJobs when the user
+    already has AGENT_JOBS_MAX_PENDING_PER_USER unfinished jobs.
+    """
+    pending = ChatJob.objects.filter(
+        owner_id=thread.owner_id, status__in=[ChatJob.QUEUED, ChatJob.RUNNING]
+    ).count()
+    if pending >= settings.AGENT_JOBS_MAX_PENDING_PER_USER:
+        raise TooManyJobs("Too many chat jobs in progress for this user.")
+    job = ChatJob.objects.create(owner_id=thread.owner_id, thread=thread, prompt=prompt)
+    ChatJobEvent.objects.create(job=job, data={"type": "status", "status": job.status})
+    return job
+
+
+def requeue_expired_jobs():
+    """
+    Put running jobs whose worker stopped renewing its lease back in the queue.
+    """
+    return ChatJob.objects.filter(
+        status=ChatJob.RUNNING, lease_expires_at__lt=timezone.now()
+    ).update(status=ChatJob.QUEUED, worker=None, lease_expires_at=None)
+
+
+def claim_jobs(worker, limit):
+    """
+    Claim up to LIMIT queued jobs, oldest first, while respecting the global
+    and per-user running limits. One job runs per thread at a time.
+    """
+    running = ChatJob.objects.filter(status=ChatJob.RUNNING)
+    limit = min(limit, settings.AGENT_JOBS_MAX_RUNNING - running.count())
+    if limit <= 0:
+        return []
+
+    running_per_user = Counter(running.values_list("owner_id", flat=True))
+    running_threads = set(running.values_list("thread_id", flat=True))
+    candidates = ChatJob.objects.filter(status=ChatJob.QUEUED).order_by("created_at")
+
+    claimed = []
+    for job in candidates[: limit * 10]:
+        if running_per_user[job.owner_id] >= settings.AGENT_JOBS_MAX_RUNNING_PER_USER:
+            continue
+        if job.thread_id in running_threads:
+            continue
+        now = timezone.now()
+        # Conditional UPDATE: only one worker can move a job out of "queued".
+        updated = ChatJob.objects.filter(id=job.id, status=ChatJob.QUEUED).update(
+            status=ChatJob.RUNNING,
+            worker=worker,
+            started_at=now,
+            lease_expires_at=now + timedelta(seconds=settings.AGENT_JOBS_LEASE_SECONDS),
+        )
+        if not updated:
+            continue
+        running_per_user[job.owner_id] += 1
+        running_threads.add(job.thread_id)
+        claimed.append(job.id)
+        if len(claimed) == limit:
+            break
+    return claimed
+
+
+def claimed(job):
+    """
+    JOB as long as the claim it was loaded with still holds: running, on the
+    same worker and from the same claim.
+    """
+    return ChatJob.objects.filter(
+        id=job.id,
+        status=ChatJob.RUNNING,
+        worker=job.worker,
+        started_at=job.started_at,
+    )
+
+
+def renew_lease(job):
+    """
+    Extend the lease of JOB. Returns whether its claim still holds.
+    """
+    lease = timezone.now() + timedelta(seconds=settings.AGENT_JOBS_LEASE_SECONDS)
+    return claimed(job).update(lease_expires_at=lease) == 1
+
+
+class LeaseHeartbeat:
+    """
+    Renew the lease of a job every third of AGENT_JOBS_LEASE_SECONDS from a
+    background thread, so a long LLM or tool call without progress events
+    does not get the job re-queued while it runs.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        interval = settings.AGENT_JOBS_LEASE_SECONDS / 3
+        try:
+            while not self.stopped.wait(interval):
+                if not renew_lease(self.job):
+                    logger.warning("Chat job %s lost its lease", self.job.job_id)
+                    return
+        finally:
+            connection.close()
+
+
+def record_event(job, data):
+    """
+    Add a progress event and renew the lease. Raises LeaseLost when the job
+    is no longer this worker's.
+    """
+    with transaction.atomic():
+        if not renew_lease(job):
+            raise LeaseLost(job.job_id)
+        ChatJobEvent.objects.create(job=job, data=data)
+
+
+def finish_job(job, status, response=None, error=None):
+    """
+    Store the outcome of JOB. Returns False, without writing anything, when
+    the job is no longer this worker's.
+    """
+    # Together, so a finished job always has all of its events.
+    with transaction.atomic():
+        updated = claimed(job).update(
+            status=status,
+            response=response,
+            error=error,
+            finished_at=timezone.now(),
+            lease_expires_at=None,
+        )
+        if not updated:
+            return False
+        ChatJobEvent.objects.create(job=job, data={"type": "status", "status": status})
+    return True
+
+
+def process_job(job_id):
+    """
+    Run a claimed job to completion. Called from the worker pool threads.
+    """
+    close_old_connections()
+    try:
+        job = ChatJob.objects.select_related("thread").get(id=job_id)
+        with LeaseHeartbeat(job):
+            try:
+                record_event(job, {"type": "status", "status": ChatJob.RUNNING})
+                response = run_chat(
+                    job.thread,
+                    job.prompt,
+                    on_event=lambda event: record_event(job, event),
+                )
+            except LeaseLost:
+                logger.warning("Chat job %s was re-queued while running", job.job_id)
+                return
+            except Exception as e:
+                finished = finish_job(job, ChatJob.FAILED, error=str(e))
+            else:
+                finished = finish_job(job, ChatJob.SUCCEEDED, response=response)
+        if not finished:
+            logger.warning("Chat job %s lost its lease before finishing", job.job_id)
+    finally:
+        close_old_connections()
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ai.checkpointer import prune_expired_threads, prune_thread
+from ai.models import Checkpoint
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete chat threads idle for longer than the retention period and keep "
+        "only the latest checkpoints of the remaining threads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=settings.AGENT_THREAD_RETENTION_DAYS
+        )
+        parser.add_argument("--keep", type=int, default=settings.AGENT_CHECKPOINTS_KEEP)
+
+    def handle(self, *args, **options):
+        expired = prune_expired_threads(days=options["days"])
+        thread_ids = Checkpoint.objects.values_list("thread_id", flat=True).distinct()
+        for thread_id in list(thread_ids):
+            prune_thread(thread_id, keep=options["keep"])
+        self.stdout.write(
+            f"Deleted {expired} expired thread(s); pruned {len(thread_ids)} thread(s)."
+        )
@@ -0,0 +1,39 @@
+import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ai.jobs import claim_jobs, process_job, requeue_expired_jobs
+
+
+class Command(BaseCommand):
+    help = "Worker pool that runs queued document agent chat jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=settings.AGENT_JOBS_WORKERS)
+        parser.add_argument("--interval", type=float, default=0.5)
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run the jobs queued right now and exit when they finish.",
+        )
+
+    def handle(self, *args, **options):
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        workers = options["workers"]
+        self.stdout.write(f"Chat job worker {worker} started with {workers} thread(s).")
+
+        running = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                running = {future for future in running if not future.done()}
+                requeue_expired_jobs()
+                for job_id in claim_jobs(worker, workers - len(running)):
+                    running.add(pool.submit(process_job, job_id))
+
+                if options["once"] and not running:
+                    break
+                time.sleep(options["interval"])
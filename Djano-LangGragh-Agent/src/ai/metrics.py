@@ -0,0 +1,206 @@
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (100, 1000, 4000, 16000, 64000, 256000)
+
+# Spans of the request being handled, set by RequestMetricsMiddleware.
+_request_spans = ContextVar("request_spans", default=None)
+
+
+def metrics_enabled():
+    return settings.METRICS_ENABLED
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def label_values(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def format_labels(self, values, extra=()):
+        pairs = list(zip(self.labelnames, values)) + list(extra)
+        if not pairs:
+            return ""
+        escaped = (
+            (name, value.replace("\\", "\\\\").replace('"', '\\"'))
+            for name, value in pairs
+        )
+        return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self.lock:
+            items = sorted(self.values.items())
+            lines.extend(self.render_samples(items))
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render_samples(self, items):
+        for key, value in items:
+            yield f"{self.name}{self.format_labels(key)} {value}"
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def render_samples(self, items):
+        for key, value in items:
+            yield f"{self.name}{self.format_labels(key)} {value}"
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.label_values(labels)
+        with self.lock:
+            state = self.values.get(key)
+            if state is None:
+                # Per-bucket counts (made cumulative when rendered), sum, count.
+                state = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def render_samples(self, items):
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = self.format_labels(key, [("le", f"{bound:g}")])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = self.format_labels(key, [("le", "+Inf")])
+            yield f"{self.name}_bucket{labels} {count}"
+            yield f"{self.name}_sum{self.format_labels(key)} {total}"
+            yield f"{self.name}_count{self.format_labels(key)} {count}"
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ["view", "method", "status"],
+)
+agent_step_duration = Histogram(
+    "agent_step_duration_seconds",
+    "Duration of each agent graph step.",
+    ["node"],
+)
+agent_llm_duration = Histogram(
+    "agent_llm_duration_seconds",
+    "Duration of each LLM call made by the agent.",
+    ["model"],
+)
+agent_llm_tokens = Counter(
+    "agent_llm_tokens_total",
+    "Tokens used by the agent's LLM calls.",
+    ["model", "kind"],
+)
+agent_tool_duration = Histogram(
+    "agent_tool_duration_seconds",
+    "Duration of each agent tool call.",
+    ["tool", "status"],
+)
+agent_tool_result_size = Histogram(
+    "agent_tool_result_chars",
+    "Size of agent tool results in characters.",
+    ["tool"],
+    buckets=SIZE_BUCKETS,
+)
+agent_errors = Counter(
+    "agent_errors_total",
+    "Errors raised while running the agent.",
+    ["kind", "error"],
+)
+agent_chat_queue_depth = Gauge(
+    "agent_chat_queue_depth",
+    "Chat requests waiting for an agent slot.",
+)
+agent_chat_running = Gauge(
+    "agent_chat_running",
+    "Chat requests currently running the agent.",
+)
+agent_chat_queue_wait = Histogram(
+    "agent_chat_queue_wait_seconds",
+    "Time chat requests waited for an agent slot.",
+)
+agent_chat_rejections = Counter(
+    "agent_chat_rejections_total",
+    "Chat requests rejected by admission control.",
+    ["reason"],
+)
+
+REGISTRY = [
+    http_request_duration,
+    agent_step_duration,
+    agent_llm_duration,
+    agent_llm_tokens,
+    agent_tool_duration,
+    agent_tool_result_size,
+    agent_errors,
+    agent_chat_queue_depth,
+    agent_chat_running,
+    agent_chat_queue_wait,
+    agent_chat_rejections,
+]
+
+
+def render_metrics():
+    """
+    Render every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def start_request_spans():
+    spans = []
+    return spans, _request_spans.set(spans)
+
+
+def end_request_spans(token):
+    _request_spans.reset(token)
+
+
+def record_span(kind, name, start, **attributes):
+    """
+    Add a span that started at START (time.perf_counter()) to the spans of
+    the current request, if any. Returns the span duration in seconds.
+    """
+    duration = time.perf_counter() - start
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append({"kind": kind, "name": name, "duration": duration, **attributes})
+    return duration
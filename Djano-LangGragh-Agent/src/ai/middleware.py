@@ -0,0 +1,60 @@
+import logging
+import time
+
+from django.core.exceptions import MiddlewareNotUsed
+
+from ai import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Time every request by view, collect the agent spans recorded while it
+    runs and summarize them in a Server-Timing header. Removed from the
+    middleware chain entirely when METRICS_ENABLED is off.
+    """
+
+    def __init__(self, get_response):
+        if not metrics.metrics_enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        spans, token = metrics.start_request_spans()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.end_request_spans(token)
+        duration = time.perf_counter() - start
+
+        match = request.resolver_match
+        metrics.http_request_duration.observe(
+            duration,
+            view=match.view_name if match else "unmatched",
+            method=request.method,
+            status=response.status_code,
+        )
+        if spans:
+            response["Server-Timing"] = format_server_timing(spans, duration)
+            logger.debug("%s %s spans=%s", request.method, request.path, spans)
+        return response
+
+
+def format_server_timing(spans, duration):
+    """
+    Total time spent in LLM and tool calls (with call counts) and overall.
+    Tool calls may overlap, so their total can exceed the wall time.
+    """
+    totals = {}
+    for span in spans:
+        if span["kind"] in ("llm", "tool"):
+            total, count = totals.get(span["kind"], (0.0, 0))
+            totals[span["kind"]] = (total + span["duration"], count + 1)
+    entries = [
+        f'{kind};dur={total * 1000:.1f};desc="{count} calls"'
+        for kind, (total, count) in sorted(totals.items())
+    ]
+    entries.append(f"total;dur={duration * 1000:.1f}")
+    return ", ".join(entries)
@@ -0,0 +1,123 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:20
+
+import ai.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ChatThread",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "thread_id",
+                    models.CharField(
+                        default=ai.models.new_thread_id, max_length=64, unique=True
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="Checkpoint",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("thread_id", models.CharField(max_length=255)),
+                (
+                    "checkpoint_ns",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("checkpoint_id", models.CharField(max_length=255)),
+                (
+                    "parent_checkpoint_id",
+                    models.CharField(blank=True, max_length=255, null=True),
+                ),
+                ("type", models.CharField(blank=True, max_length=32, null=True)),
+                ("checkpoint", models.BinaryField()),
+                ("metadata", models.JSONField(default=dict)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("thread_id", "checkpoint_ns", "checkpoint_id"),
+                        name="checkpoint_unique_id",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="CheckpointWrite",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("thread_id", models.CharField(max_length=255)),
+                (
+                    "checkpoint_ns",
+                    models.CharField(blank=True, default="", max_length=255),
+                ),
+                ("checkpoint_id", models.CharField(max_length=255)),
+                ("task_id", models.CharField(max_length=255)),
+                ("task_path", models.CharField(blank=True, default="", max_length=255)),
+                ("idx", models.IntegerField()),
+                ("channel", models.CharField(max_length=255)),
+                ("type", models.CharField(blank=True, max_length=32, null=True)),
+                ("value", models.BinaryField(blank=True, null=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=(
+                            "thread_id",
+                            "checkpoint_ns",
+                            "checkpoint_id",
+                            "task_id",
+                            "idx",
+                        ),
+                        name="checkpoint_write_unique_idx",
+                    )
+                ],
+            },
+        ),
+    ]
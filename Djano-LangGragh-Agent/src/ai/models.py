@@ -0,0 +1,126 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+User = settings.AUTH_USER_MODEL
+
+
+def new_thread_id():
+    return str(uuid.uuid4())
+
+
+class ChatThread(models.Model):
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    thread_id = models.CharField(max_length=64, unique=True, default=new_thread_id)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.thread_id}"
+
+
+class Checkpoint(models.Model):
+    thread_id = models.CharField(max_length=255)
+    checkpoint_ns = models.CharField(max_length=255, blank=True, default="")
+    checkpoint_id = models.CharField(max_length=255)
+    parent_checkpoint_id = models.CharField(max_length=255, blank=True, null=True)
+
+    type = models.CharField(max_length=32, blank=True, null=True)
+    checkpoint = models.BinaryField()
+    metadata = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["thread_id", "checkpoint_ns", "checkpoint_id"],
+                name="checkpoint_unique_id",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.thread_id}:{self.checkpoint_id}"
+
+
+class CheckpointWrite(models.Model):
+    thread_id = models.CharField(max_length=255)
+    checkpoint_ns = models.CharField(max_length=255, blank=True, default="")
+    checkpoint_id = models.CharField(max_length=255)
+    task_id = models.CharField(max_length=255)
+    task_path = models.CharField(max_length=255, blank=True, default="")
+    idx = models.IntegerField()
+
+    channel = models.CharField(max_length=255)
+    type = models.CharField(max_length=32, blank=True, null=True)
+    value = models.BinaryField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "thread_id",
+                    "checkpoint_ns",
+                    "checkpoint_id",
+                    "task_id",
+                    "idx",
+                ],
+                name="checkpoint_write_unique_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.thread_id}:{self.checkpoint_id}:{self.task_id}"
+
+
+class ChatJob(models.Model):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+    thread = models.ForeignKey(ChatThread, on_delete=models.CASCADE)
+
+    job_id = models.CharField(max_length=64, unique=True, default=new_thread_id)
+    prompt = models.TextField()
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=QUEUED)
+    response = models.TextField(blank=True, null=True)
+    error = models.TextField(blank=True, null=True)
+    worker = models.CharField(max_length=255, blank=True, null=True)
+    lease_expires_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="chat_job_status_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.job_id}"
+
+    @property
+    def finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+
+class ChatJobEvent(models.Model):
+    job = models.ForeignKey(ChatJob, on_delete=models.CASCADE, related_name="events")
+
+    data = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.job_id}:{self.id}"
@@ -0,0 +1,454 @@
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from langgraph.checkpoint.base import empty_checkpoint
+
+from .admission import AdmissionRejected, FairScheduler, TokenBucket
+from .checkpointer import DjangoCheckpointSaver, prune_thread
+from .jobs import (
+    LeaseHeartbeat,
+    LeaseLost,
+    claim_jobs,
+    finish_job,
+    process_job,
+    record_event,
+    renew_lease,
+    requeue_expired_jobs,
+)
+from .metrics import Counter, Histogram
+from .middleware import format_server_timing
+from .models import ChatJob, ChatJobEvent, ChatThread, Checkpoint
+from .tools.client import UserLimiter
+
+
+@override_settings(
+    AGENT_JOBS_MAX_RUNNING=3,
+    AGENT_JOBS_MAX_RUNNING_PER_USER=2,
+    AGENT_JOBS_LEASE_SECONDS=60,
+    AGENT_JOBS_EVENTS_WAIT=0,
+)
+class ChatJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="owner")
+        cls.other = get_user_model().objects.create(username="other")
+
+    def create_job(self, owner=None, thread=None):
+        owner = owner or self.user
+        thread = thread or ChatThread.objects.create(owner=owner)
+        return ChatJob.objects.create(owner=owner, thread=thread, prompt="Hi")
+
+    def test_claim_marks_jobs_running_with_a_lease(self):
+        job = self.create_job()
+        self.assertEqual(claim_jobs("worker-1", 5), [job.id])
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (ChatJob.RUNNING, "worker-1"))
+        self.assertGreater(job.lease_expires_at, timezone.now())
+
+        # Already claimed: another worker gets nothing.
+        self.assertEqual(claim_jobs("worker-2", 5), [])
+
+    def test_claim_respects_limits(self):
+        thread = ChatThread.objects.create(owner=self.user)
+        same_thread = [self.create_job(thread=thread) for _ in range(2)]
+        mine = [self.create_job() for _ in range(2)]
+        theirs = [self.create_job(owner=self.other) for _ in range(2)]
+
+        claimed = claim_jobs("worker", 10)
+        # One job per thread, two per user, three in total.
+        self.assertEqual(claimed, [same_thread[0].id, mine[0].id, theirs[0].id])
+        self.assertEqual(claim_jobs("worker", 10), [])
+
+    def test_expired_lease_is_requeued(self):
+        expired, alive = self.create_job(), self.create_job()
+        claim_jobs("worker", 5)
+        ChatJob.objects.filter(id=expired.id).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(requeue_expired_jobs(), 1)
+        expired.refresh_from_db()
+        alive.refresh_from_db()
+        self.assertEqual((expired.status, expired.worker), (ChatJob.QUEUED, None))
+        self.assertEqual(alive.status, ChatJob.RUNNING)
+        self.assertEqual(claim_jobs("worker-2", 5), [expired.id])
+
+    def test_events_renew_the_lease(self):
+        job = self.create_job()
+        claim_jobs("worker", 1)
+        job.refresh_from_db()
+        soon = timezone.now() + timedelta(seconds=5)
+        ChatJob.objects.filter(id=job.id).update(lease_expires_at=soon)
+
+        record_event(job, {"type": "tool_start"})
+        job.refresh_from_db()
+        self.assertGreater(job.lease_expires_at, soon)
+        self.assertEqual(requeue_expired_jobs(), 0)
+
+    def reclaim(self, job, worker):
+        # The lease runs out and another claim takes the job over.
+        ChatJob.objects.filter(id=job.id).update(
+            lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        requeue_expired_jobs()
+        self.assertEqual(claim_jobs(worker, 1), [job.id])
+
+    def test_expired_claim_no_longer_writes(self):
+        job = self.create_job()
+        claim_jobs("worker", 1)
+        job.refresh_from_db()
+        # Same worker name: the claims still differ by started_at.
+        self.reclaim(job, "worker")
+
+        with self.assertRaises(LeaseLost):
+            record_event(job, {"type": "tool_start"})
+        self.assertFalse(renew_lease(job))
+        self.assertFalse(finish_job(job, ChatJob.SUCCEEDED, response="Stale"))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.response), (ChatJob.RUNNING, None))
+        self.assertFalse(ChatJobEvent.objects.filter(job=job).exists())
+        self.assertTrue(finish_job(job, ChatJob.SUCCEEDED, response="Done"))
+
+    def test_process_job_stops_after_losing_the_lease(self):
+        job = self.create_job()
+        claim_jobs("worker-1", 1)
+
+        def run_chat(thread, prompt, on_event):
+            on_event({"type": "tool_start"})
+            self.reclaim(job, "worker-2")
+            on_event({"type": "tool_end"})
+            return "Stale"
+
+        with mock.patch("ai.jobs.run_chat", run_chat), mock.patch(
+            "ai.jobs.close_old_connections"
+        ):
+            with self.assertLogs("ai.jobs", "WARNING"):
+                process_job(job.id)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.worker), (ChatJob.RUNNING, "worker-2"))
+        events = ChatJobEvent.objects.filter(job=job).values_list("data", flat=True)
+        self.assertEqual([event["type"] for event in events], ["status", "tool_start"])
+
+    @override_settings(AGENT_JOBS_LEASE_SECONDS=0.03)
+    def test_heartbeat_renews_the_lease_between_events(self):
+        job = self.create_job()
+        renewed = threading.Event()
+        results = iter([True, False])
+
+        def renew_lease(job):
+            result = next(results)
+            if not result:
+                renewed.set()
+            return result
+
+        with mock.patch("ai.jobs.renew_lease", renew_lease), self.assertLogs(
+            "ai.jobs", "WARNING"
+        ):
+            with LeaseHeartbeat(job) as heartbeat:
+                # Stops by itself once the lease is lost.
+                self.assertTrue(renewed.wait(5))
+                heartbeat.thread.join(5)
+                self.assertFalse(heartbeat.thread.is_alive())
+
+    def get_events(self, job, **headers):
+        self.client.force_login(job.owner)
+        return self.client.get(f"/api/agent/jobs/{job.job_id}/events/", **headers)
+
+    def test_events_resume_after_cursor(self):
+        job = self.create_job()
+        first = ChatJobEvent.objects.create(job=job, data={"type": "status"})
+        second = ChatJobEvent.objects.create(job=job, data={"type": "tool_start"})
+
+        response = self.get_events(job)
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn(f"id: {first.id}\n", body)
+        self.assertIn(f"id: {second.id}\n", body)
+
+        response = self.get_events(job, HTTP_LAST_EVENT_ID=str(first.id))
+        body = b"".join(response.streaming_content).decode()
+        self.assertNotIn(f"id: {first.id}\n", body)
+        self.assertIn(f"id: {second.id}\n", body)
+
+    def test_events_of_finished_job(self):
+        job = self.create_job()
+        claim_jobs("worker", 1)
+        job.refresh_from_db()
+        finish_job(job, ChatJob.SUCCEEDED, response="Done")
+        last = ChatJobEvent.objects.filter(job=job).last()
+
+        response = self.get_events(job)
+        body = b"".join(response.streaming_content).decode()
+        self.assertIn('"status": "succeeded"', body)
+
+        response = self.get_events(job, HTTP_LAST_EVENT_ID=str(last.id))
+        self.assertEqual(response.status_code, 204)
+
+
+class UserLimiterTests(SimpleTestCase):
+    def test_limit_holds_across_event_loops(self):
+        limiter = UserLimiter(2)
+        lock = threading.Lock()
+        running = {"now": 0, "max": 0}
+
+        async def call(user_id):
+            async with limiter.slot(user_id):
+                with lock:
+                    running["now"] += 1
+                    running["max"] = max(running["max"], running["now"])
+                await asyncio.sleep(0.01)
+                with lock:
+                    running["now"] -= 1
+
+        async def turn():
+            await asyncio.gather(*(call(1) for _ in range(5)))
+
+        # Each thread runs its own loop, like separate chat turns.
+        threads = [
+            threading.Thread(target=asyncio.run, args=(turn(),)) for _ in range(3)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(running["max"], 2)
+        self.assertEqual((limiter.active, dict(limiter.waiters)), ({}, {}))
+
+    def test_users_are_independent_and_cancelled_waiters_leave(self):
+        limiter = UserLimiter(1)
+
+        async def main():
+            await limiter.acquire(1)
+            await asyncio.wait_for(limiter.acquire(2), timeout=1)
+            waiter = asyncio.create_task(limiter.acquire(1))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            self.assertEqual(dict(limiter.waiters), {})
+
+            next_call = asyncio.create_task(limiter.acquire(1))
+            await asyncio.sleep(0)
+            limiter.release(1)
+            await asyncio.wait_for(next_call, timeout=1)
+            limiter.release(1)
+            limiter.release(2)
+
+        asyncio.run(main())
+        self.assertEqual(limiter.active, {})
+
+
+class CheckpointerTests(TestCase):
+    def setUp(self):
+        self.saver = DjangoCheckpointSaver()
+        self.config = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+
+    def put(self, config, step):
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {"messages": [f"message {step}"]}
+        return self.saver.put(config, checkpoint, {"step": step}, {})
+
+    def test_round_trip(self):
+        first = self.put(self.config, 1)
+        second = self.put(first, 2)
+        self.saver.put_writes(first, [("messages", "pending 1")], "task-a")
+        self.saver.put_writes(
+            second, [("messages", "pending 2"), ("other", 3)], "task-b"
+        )
+
+        latest = self.saver.get_tuple(self.config)
+        self.assertEqual(latest.config, second)
+        self.assertEqual(latest.parent_config, first)
+        self.assertEqual(latest.checkpoint["channel_values"]["messages"], ["message 2"])
+        self.assertEqual(latest.metadata["step"], 2)
+        self.assertEqual(
+            latest.pending_writes,
+            [("task-b", "messages", "pending 2"), ("task-b", "other", 3)],
+        )
+        self.assertEqual(self.saver.get_tuple(first).metadata["step"], 1)
+        self.assertIsNone(
+            self.saver.get_tuple({"configurable": {"thread_id": "missing"}})
+        )
+
+        # One query for the checkpoints and one for all of their writes.
+        with self.assertNumQueries(2):
+            listed = list(self.saver.list(self.config))
+        self.assertEqual([item.config for item in listed], [second, first])
+        self.assertEqual(
+            [item.pending_writes for item in listed],
+            [latest.pending_writes, [("task-a", "messages", "pending 1")]],
+        )
+        self.assertEqual(len(list(self.saver.list(self.config, limit=1))), 1)
+        self.assertEqual(
+            [item.config for item in self.saver.list(self.config, before=second)],
+            [first],
+        )
+        self.assertEqual(
+            [item.config for item in self.saver.list(None, filter={"step": 1})],
+            [first],
+        )
+
+    def test_prune_keeps_latest(self):
+        config = self.config
+        for step in range(4):
+            config = self.put(config, step)
+            self.saver.put_writes(config, [("messages", step)], "task")
+        prune_thread("t1", keep=2)
+        self.assertEqual(Checkpoint.objects.filter(thread_id="t1").count(), 2)
+        self.assertEqual(
+            [item.metadata["step"] for item in self.saver.list(self.config)], [3, 2]
+        )
+
+
+@override_settings(
+    AGENT_CHAT_RATE_PER_MINUTE=60,
+    AGENT_CHAT_BURST=2,
+    AGENT_CHAT_MAX_RUNNING=1,
+    AGENT_CHAT_MAX_QUEUED=10,
+    AGENT_CHAT_MAX_QUEUED_PER_USER=5,
+    AGENT_CHAT_QUEUE_TIMEOUT=5,
+    AGENT_CHAT_USER_WEIGHTS={},
+)
+class AdmissionTests(TestCase):
+    def setUp(self):
+        self.scheduler = FairScheduler()
+
+    def test_token_bucket(self):
+        with mock.patch("ai.admission.time.monotonic", return_value=100.0) as now:
+            bucket = TokenBucket(rate=0.5, burst=2)
+            self.assertEqual([bucket.take(), bucket.take()], [0, 0])
+            self.assertAlmostEqual(bucket.take(), 2.0)
+            now.return_value = 101.0
+            self.assertAlmostEqual(bucket.take(), 1.0)
+            now.return_value = 102.0
+            self.assertEqual(bucket.take(), 0)
+
+    def test_rate_limit(self):
+        self.scheduler.check_rate(1)
+        self.scheduler.check_rate(1)
+        with self.assertRaises(AdmissionRejected) as rejected:
+            self.scheduler.check_rate(1)
+        self.assertEqual(rejected.exception.reason, "rate_limited")
+        self.assertEqual(rejected.exception.retry_after, 1)
+        self.scheduler.check_rate(2)  # buckets are per user
+
+    def queue(self, user_id, admitted):
+        """
+        Start a thread that waits for a slot, records USER_ID in ADMITTED
+        and releases it. Returns once the request is queued.
+        """
+        queued = len(self.scheduler.queue)
+
+        def run():
+            with self.scheduler.admit(user_id):
+                admitted.append(user_id)
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        while len(self.scheduler.queue) == queued:
+            time.sleep(0.001)
+        return thread
+
+    def test_weighted_fair_order(self):
+        admitted = []
+        with override_settings(AGENT_CHAT_BURST=10):
+            slot = self.scheduler.admit(1)
+            threads = [self.queue(1, admitted) for _ in range(3)]
+            threads.append(self.queue(2, admitted))
+            slot.__exit__(None, None, None)
+            for thread in threads:
+                thread.join()
+        # User 2 goes ahead of user 1's backlog.
+        self.assertEqual(admitted, [1, 2, 1, 1])
+        self.assertEqual((self.scheduler.running, self.scheduler.queue), (0, []))
+
+    @override_settings(AGENT_CHAT_MAX_QUEUED=0)
+    def test_queue_full(self):
+        with self.scheduler.admit(1):
+            with self.assertRaises(AdmissionRejected) as rejected:
+                self.scheduler.admit(2)
+        self.assertEqual(rejected.exception.reason, "queue_full")
+        self.assertGreaterEqual(rejected.exception.retry_after, 1)
+
+    @override_settings(AGENT_CHAT_MAX_QUEUED_PER_USER=1)
+    def test_user_queue_full(self):
+        admitted = []
+        with self.scheduler.admit(1):
+            thread = self.queue(2, admitted)
+            with self.assertRaises(AdmissionRejected) as rejected:
+                self.scheduler.admit(2)
+        thread.join()
+        self.assertEqual(rejected.exception.reason, "user_queue_full")
+        self.assertEqual(admitted, [2])
+
+    @override_settings(AGENT_CHAT_QUEUE_TIMEOUT=0.01)
+    def test_queue_timeout(self):
+        with self.scheduler.admit(1):
+            with self.assertRaises(AdmissionRejected) as rejected:
+                self.scheduler.admit(2)
+        self.assertEqual(rejected.exception.reason, "queue_timeout")
+        self.assertEqual(self.scheduler.queue, [])
+        self.assertEqual(self.scheduler.queued_per_user, {})
+
+    def test_rejections_return_429_with_retry_after(self):
+        user = get_user_model().objects.create(username="owner")
+        self.client.force_login(user)
+        with mock.patch("documents.views.chat_scheduler", self.scheduler):
+            for _ in range(2):
+                response = self.client.post("/api/agent/jobs/", {"prompt": "Hi"})
+                self.assertEqual(response.status_code, 202)
+            response = self.client.post("/api/agent/jobs/", {"prompt": "Hi"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "1")
+        self.assertEqual(response.json()["reason"], "rate_limited")
+
+
+class MetricsTests(SimpleTestCase):
+    def test_counter_renders_escaped_labels(self):
+        counter = Counter("calls_total", "Calls.", ["tool"])
+        counter.inc(tool='say "hi"')
+        counter.inc(2, tool='say "hi"')
+        self.assertEqual(
+            counter.render(),
+            [
+                "# HELP calls_total Calls.",
+                "# TYPE calls_total counter",
+                'calls_total{tool="say \\"hi\\""} 3',
+            ],
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.7, 5):
+            histogram.observe(value)
+        self.assertEqual(
+            histogram.render()[2:],
+            [
+                'latency_seconds_bucket{le="0.1"} 1',
+                'latency_seconds_bucket{le="1"} 3',
+                'latency_seconds_bucket{le="+Inf"} 4',
+                "latency_seconds_sum 6.25",
+                "latency_seconds_count 4",
+            ],
+        )
+
+    def test_server_timing_sums_llm_and_tool_spans(self):
+        spans = [
+            {"kind": "llm", "name": "gpt", "duration": 0.5},
+            {"kind": "tool", "name": "search", "duration": 0.25},
+            {"kind": "tool", "name": "search", "duration": 0.25},
+            {"kind": "step", "name": "agent", "duration": 1},
+        ]
+        self.assertEqual(
+            format_server_timing(spans, 1.2),
+            'llm;dur=500.0;desc="1 calls", tool;dur=500.0;desc="2 calls", '
+            "total;dur=1200.0",
+        )
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import weakref
+from collections import Counter, defaultdict, deque
+from contextlib import asynccontextmanager
+
+import httpx
+from django.conf import settings
+
+# One pooled client per event loop, since asyncio objects cannot be shared
+# between loops. Agent turns all run on the process-wide loop of
+# ai.chat.get_agent_loop().
+_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client():
+    """
+    Return the pooled async HTTP client of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=settings.AGENT_TOOL_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.AGENT_TOOL_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AGENT_TOOL_MAX_CONNECTIONS,
+            ),
+        )
+        _clients[loop] = client
+    return client
+
+
+class UserLimiter:
+    """
+    Caps the concurrent calls of each user at LIMIT across the process, over
+    all of that user's chat turns and whichever thread or event loop they
+    run on. Waiters are served in order; idle users hold no state.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.active = Counter()
+        self.waiters = defaultdict(deque)
+
+    @asynccontextmanager
+    async def slot(self, user_id):
+        await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release(user_id)
+
+    async def acquire(self, user_id):
+        with self.lock:
+            if self.active[user_id] < self.limit:
+                self.active[user_id] += 1
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            self.waiters[user_id].append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            with self.lock:
+                waiters = self.waiters.get(user_id)
+                if waiters is not None and waiter in waiters:
+                    waiters.remove(waiter)
+                    if not waiters:
+                        del self.waiters[user_id]
+                    raise
+            # The slot was handed to us; pass it on unless wake() will.
+            if not waiter.cancelled():
+                self.release(user_id)
+            raise
+
+    def release(self, user_id):
+        with self.lock:
+            waiters = self.waiters.get(user_id)
+            if not waiters:
+                self.active[user_id] -= 1
+                if self.active[user_id] <= 0:
+                    del self.active[user_id]
+                return
+            # Hand the slot over: the count of active calls stays the same.
+            waiter = waiters.popleft()
+            if not waiters:
+                del self.waiters[user_id]
+        waiter.get_loop().call_soon_threadsafe(self.wake, user_id, waiter)
+
+    def wake(self, user_id, waiter):
+        if waiter.done():
+            # Cancelled after it was handed the slot.
+            self.release(user_id)
+        else:
+            waiter.set_result(None)
+
+
+_user_limiter = None
+_user_limiter_lock = threading.Lock()
+
+
+def user_slot(user_id):
+    """
+    Cap the concurrent API calls of one user's tool calls, across all of the
+    user's chat turns in this process, at AGENT_TOOL_CONCURRENCY_PER_USER.
+    Use as `async with user_slot(user_id):`.
+    """
+    global _user_limiter
+    with _user_limiter_lock:
+        if _user_limiter is None:
+            _user_limiter = UserLimiter(settings.AGENT_TOOL_CONCURRENCY_PER_USER)
+    return _user_limiter.slot(user_id)
+
+
+async def request_api(user_id, method, url, **kwargs):
+    """
+    Send a request to the documents API for USER_ID through the pooled
+    client, raising httpx.HTTPStatusError on error responses.
+    """
+    async with user_slot(user_id):
+        response = await get_http_client().request(method, url, **kwargs)
+    response.raise_for_status()
+    return response
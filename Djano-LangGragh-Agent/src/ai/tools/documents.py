@@ -1,8 +1,17 @@
-import requests
+import httpx
+from django.conf import settings
 from langchain_core.runnables import RunnableConfig
 from langchain_core.tools import tool
 
-API_BASE_URL = "http://127.0.0.1:8000/api/docs/"
+from ai.tools.client import request_api
+
+
+def api_url():
+    return settings.DOCUMENTS_API_URL
+
+
+# Most document content returned to the agent in one tool call (characters).
+MAX_TOOL_CONTENT_CHARS = 8000
 
 
 def get_user_id(config: RunnableConfig):
@@ -14,20 +23,23 @@ def get_user_id(config: RunnableConfig):
 
 
 @tool
-def search_query_documents(query: str, limit: int = 5, config: RunnableConfig = {}):
+async def search_query_documents(
+    query: str, limit: int = 5, config: RunnableConfig = {}
+):
     """
-    Search the most recent LIMIT documents for the current user.
+    Full-text search the current user's documents by title and content.
+    Returns up to LIMIT documents, best matches first. Words match as prefixes.
     """
     user_id = get_user_id(config)
     params = {
         "search": query,
         "limit": limit if limit <= 25 else 25,
         "user_id": user_id,
+        "fields": "id,title",
     }
 
     try:
-        response = requests.get(API_BASE_URL, params=params)
-        response.raise_for_status()
+        response = await request_api(user_id, "GET", api_url(), params=params)
         data = response.json()
         results = data.get("results", data) if isinstance(data, dict) else data
 
@@ -37,16 +49,44 @@ def search_query_documents(query: str, limit: int = 5, config: RunnableConfig =
 
 
 @tool
-def list_documents(limit: int = 5, config: RunnableConfig = {}):
+async def semantic_search_documents(
+    query: str, limit: int = 5, config: RunnableConfig = {}
+):
+    """
+    Find the current user's documents by meaning rather than exact words.
+    Use this for fuzzy or descriptive questions. Returns up to LIMIT documents,
+    most similar first.
+    """
+    user_id = get_user_id(config)
+    params = {
+        "q": query,
+        "limit": limit if limit <= 25 else 25,
+        "user_id": user_id,
+    }
+
+    try:
+        response = await request_api(
+            user_id, "GET", f"{api_url()}semantic-search/", params=params
+        )
+        return response.json()["results"]
+    except Exception as e:
+        return f"Error searching documents: {str(e)}"
+
+
+@tool
+async def list_documents(limit: int = 5, config: RunnableConfig = {}):
     """
     List the most recent documents for the current user.
     """
     user_id = get_user_id(config)
-    params = {"limit": limit if limit <= 25 else 25, "user_id": user_id}
+    params = {
+        "limit": limit if limit <= 25 else 25,
+        "user_id": user_id,
+        "fields": "id,title",
+    }
 
     try:
-        response = requests.get(API_BASE_URL, params=params)
-        response.raise_for_status()
+        response = await request_api(user_id, "GET", api_url(), params=params)
         data = response.json()
 
         results = data.get("results", data) if isinstance(data, dict) else data
@@ -57,7 +97,7 @@ def list_documents(limit: int = 5, config: RunnableConfig = {}):
 
 
 @tool
-def get_document(document_id: int, config: RunnableConfig):
+async def get_document(document_id: int, config: RunnableConfig):
     """
     Get the details of a document.
     """
@@ -65,17 +105,55 @@ def get_document(document_id: int, config: RunnableConfig):
     params = {"user_id": user_id}
 
     try:
-        response = requests.get(f"{API_BASE_URL}{document_id}/", params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.HTTPError as e:
+        response = await request_api(
+            user_id, "GET", f"{api_url()}{document_id}/", params=params
+        )
+        document = response.json()
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             return "Document not found."
         return f"Error retrieving document: {str(e)}"
 
+    content = document.get("content") or ""
+    if document.get("content_truncated") or len(content) > MAX_TOOL_CONTENT_CHARS:
+        document["content"] = content[:MAX_TOOL_CONTENT_CHARS]
+        document["content_truncated"] = True
+        document["note"] = (
+            f"Only the first {len(document['content'])} of "
+            f"{document.get('content_length')} characters are included. "
+            "Use read_document_range to read further."
+        )
+    return document
+
+
+@tool
+async def read_document_range(
+    document_id: int, offset: int = 0, length: int = 4000, config: RunnableConfig = {}
+):
+    """
+    Read part of a long document: LENGTH characters starting at OFFSET.
+    The result includes next_offset to continue reading, or null at the end.
+    """
+    user_id = get_user_id(config)
+    params = {
+        "offset": offset,
+        "length": min(length, MAX_TOOL_CONTENT_CHARS),
+        "user_id": user_id,
+    }
+
+    try:
+        response = await request_api(
+            user_id, "GET", f"{api_url()}{document_id}/content/", params=params
+        )
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
+            return "Document not found."
+        return f"Error reading document: {str(e)}"
+
 
 @tool
-def create_document(title: str, content: str, config: RunnableConfig):
+async def create_document(title: str, content: str, config: RunnableConfig):
     """
     Create a new document.
     """
@@ -83,15 +161,14 @@ def create_document(title: str, content: str, config: RunnableConfig):
     payload = {"title": title, "content": content, "user_id": user_id}
 
     try:
-        response = requests.post(API_BASE_URL, json=payload)
-        response.raise_for_status()
+        response = await request_api(user_id, "POST", api_url(), json=payload)
         return response.json()
     except Exception as e:
         return f"Error creating document: {str(e)}"
 
 
 @tool
-def update_document(
+async def update_document(
     document_id: int,
     title: str = None,
     content: str = None,
@@ -108,17 +185,18 @@ def update_document(
         payload["content"] = content
 
     try:
-        response = requests.patch(f"{API_BASE_URL}{document_id}/", json=payload)
-        response.raise_for_status()
+        response = await request_api(
+            user_id, "PATCH", f"{api_url()}{document_id}/", json=payload
+        )
         return response.json()
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             return "Document not found."
         return f"Error updating document: {str(e)}"
 
 
 @tool
-def delete_document(document_id: int, config: RunnableConfig):
+async def delete_document(document_id: int, config: RunnableConfig):
     """
     Delete a document.
     """
@@ -126,19 +204,97 @@ def delete_document(document_id: int, config: RunnableConfig):
     params = {"user_id": user_id}
 
     try:
-        response = requests.delete(f"{API_BASE_URL}{document_id}/", params=params)
-        response.raise_for_status()
+        response = await request_api(
+            user_id, "DELETE", f"{api_url()}{document_id}/", params=params
+        )
         return {"message": "success"}
-    except requests.exceptions.HTTPError as e:
+    except httpx.HTTPStatusError as e:
         if e.response.status_code == 404:
             return "Document not found."
         return f"Error deleting document: {str(e)}"
 
 
+@tool
+async def bulk_get_documents(document_ids: list[int], config: RunnableConfig):
+    """
+    Get the details of several documents at once (up to 100 ids).
+    """
+    user_id = get_user_id(config)
+    params = {"ids": ",".join(str(pk) for pk in document_ids), "user_id": user_id}
+
+    try:
+        response = await request_api(
+            user_id, "GET", f"{api_url()}bulk-get/", params=params
+        )
+        return response.json()
+    except Exception as e:
+        return f"Error retrieving documents: {str(e)}"
+
+
+@tool
+async def bulk_create_documents(documents: list[dict], config: RunnableConfig):
+    """
+    Create several documents at once (up to 100).
+    Each document is a dict with a "title" and a "content".
+    """
+    user_id = get_user_id(config)
+    payload = {"documents": documents, "user_id": user_id}
+
+    try:
+        response = await request_api(
+            user_id, "POST", f"{api_url()}bulk-create/", json=payload
+        )
+        return response.json()
+    except Exception as e:
+        return f"Error creating documents: {str(e)}"
+
+
+@tool
+async def bulk_update_documents(documents: list[dict], config: RunnableConfig):
+    """
+    Update several documents at once (up to 100).
+    Each document is a dict with an "id" and the "title" and/or "content" to change.
+    """
+    user_id = get_user_id(config)
+    payload = {"documents": documents, "user_id": user_id}
+
+    try:
+        response = await request_api(
+            user_id, "POST", f"{api_url()}bulk-update/", json=payload
+        )
+        return response.json()
+    except Exception as e:
+        return f"Error updating documents: {str(e)}"
+
+
+@tool
+async def bulk_delete_documents(document_ids: list[int], config: RunnableConfig):
+    """
+    Delete several documents at once (up to 100 ids).
+    """
+    user_id = get_user_id(config)
+    payload = {"ids": document_ids, "user_id": user_id}
+
+    try:
+        response = await request_api(
+            user_id, "POST", f"{api_url()}bulk-delete/", json=payload
+        )
+        return response.json()
+    except Exception as e:
+        return f"Error deleting documents: {str(e)}"
+
+
 document_tools = [
     create_document,
     list_documents,
+    search_query_documents,
+    semantic_search_documents,
     get_document,
+    read_document_range,
     delete_document,
     update_document,
+    bulk_get_documents,
+    bulk_create_documents,
+    bulk_update_documents,
+    bulk_delete_documents,
 ]
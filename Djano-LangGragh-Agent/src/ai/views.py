@@ -0,0 +1,14 @@
+from django.http import Http404, HttpResponse
+
+from ai.metrics import metrics_enabled, render_metrics
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint for this process's metrics.
+    """
+    if not metrics_enabled():
+        raise Http404
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
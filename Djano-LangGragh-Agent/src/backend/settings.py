@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -39,11 +39,14 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "documents",
+    "ai",
     "rest_framework",
     "drf_spectacular",
 ]
 
 MIDDLEWARE = [
+    "ai.middleware.RequestMetricsMiddleware",
+    "documents.profiling.QueryProfilerMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,9 +83,34 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # WAL lets readers run alongside the writer; IMMEDIATE transactions
+        # wait for the write lock up front instead of failing on upgrade.
+        "OPTIONS": {
+            "init_command": "PRAGMA journal_mode=WAL;",
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory by default; point CACHE_BACKEND/CACHE_LOCATION at a shared
+# backend (e.g. django.core.cache.backends.redis.RedisCache) when running
+# several processes so invalidations are seen by all of them.
+
+CACHES = {
+    "default": {
+        "BACKEND": config(
+            "CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": config("CACHE_LOCATION", default="documents"),
     }
 }
 
+DOCUMENTS_CACHE_TIMEOUT = config("DOCUMENTS_CACHE_TIMEOUT", default=300, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -128,6 +156,90 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 OPENAI_API_KEY = config("OPENAI_API_KEY")
 OPENAI_BASE_URL = config("OPENAI_BASE_URL", default="https://api.avalai.ir/v1")
 
+# Agent conversation memory: each chat thread is checkpointed in the database,
+# the history sent to the model is summarized past AGENT_HISTORY_MAX_TOKENS,
+# and old checkpoints are pruned (`manage.py prune_checkpoints`).
+AGENT_HISTORY_MAX_TOKENS = config("AGENT_HISTORY_MAX_TOKENS", default=4000, cast=int)
+AGENT_CHECKPOINTS_KEEP = config("AGENT_CHECKPOINTS_KEEP", default=2, cast=int)
+AGENT_THREAD_RETENTION_DAYS = config(
+    "AGENT_THREAD_RETENTION_DAYS", default=30, cast=int
+)
+
+# Background chat jobs (`manage.py run_chat_jobs`): global and per-user limits.
+AGENT_JOBS_WORKERS = config("AGENT_JOBS_WORKERS", default=4, cast=int)
+AGENT_JOBS_MAX_RUNNING = config("AGENT_JOBS_MAX_RUNNING", default=8, cast=int)
+AGENT_JOBS_MAX_RUNNING_PER_USER = config(
+    "AGENT_JOBS_MAX_RUNNING_PER_USER", default=2, cast=int
+)
+AGENT_JOBS_MAX_PENDING_PER_USER = config(
+    "AGENT_JOBS_MAX_PENDING_PER_USER", default=10, cast=int
+)
+AGENT_JOBS_LEASE_SECONDS = config("AGENT_JOBS_LEASE_SECONDS", default=300, cast=int)
+# Seconds a job events request waits for a new event before it ends and the
+# client reconnects with Last-Event-ID.
+AGENT_JOBS_EVENTS_WAIT = config("AGENT_JOBS_EVENTS_WAIT", default=15, cast=float)
+
+# Admission control for /api/agent/chat/ (per process): per-user token buckets,
+# a cap on concurrent agent runs and a bounded, weighted fair queue.
+# AGENT_CHAT_USER_WEIGHTS gives some users a larger share, e.g. "1:2,7:4".
+AGENT_CHAT_RATE_PER_MINUTE = config(
+    "AGENT_CHAT_RATE_PER_MINUTE", default=20, cast=float
+)
+AGENT_CHAT_BURST = config("AGENT_CHAT_BURST", default=5, cast=int)
+AGENT_CHAT_MAX_RUNNING = config("AGENT_CHAT_MAX_RUNNING", default=8, cast=int)
+AGENT_CHAT_MAX_QUEUED = config("AGENT_CHAT_MAX_QUEUED", default=32, cast=int)
+AGENT_CHAT_MAX_QUEUED_PER_USER = config(
+    "AGENT_CHAT_MAX_QUEUED_PER_USER", default=4, cast=int
+)
+AGENT_CHAT_QUEUE_TIMEOUT = config("AGENT_CHAT_QUEUE_TIMEOUT", default=30, cast=float)
+AGENT_CHAT_USER_WEIGHTS = {
+    user_id: float(weight)
+    for user_id, weight in (
+        item.split(":")
+        for item in config("AGENT_CHAT_USER_WEIGHTS", default="", cast=Csv())
+    )
+}
+
+# Adds X-Query-Count, X-Query-Time-Ms and X-Query-Duplicates headers to every
+# response and logs requests that repeat a statement (N+1 queries).
+QUERY_PROFILING = config("QUERY_PROFILING", default=DEBUG, cast=bool)
+
+# Request and agent metrics (LLM/tool timings, token counts) exposed at /metrics.
+# When disabled the middleware and callbacks are not installed at all.
+METRICS_ENABLED = config("METRICS_ENABLED", default=False, cast=bool)
+
+# Agent document tools call the documents API at DOCUMENTS_API_URL. They are
+# async and share a pooled HTTP client; each user's concurrent tool calls are
+# capped at AGENT_TOOL_CONCURRENCY_PER_USER.
+DOCUMENTS_API_URL = config(
+    "DOCUMENTS_API_URL", default="http://127.0.0.1:8000/api/docs/"
+)
+AGENT_TOOL_CONCURRENCY_PER_USER = config(
+    "AGENT_TOOL_CONCURRENCY_PER_USER", default=4, cast=int
+)
+AGENT_TOOL_MAX_CONNECTIONS = config("AGENT_TOOL_MAX_CONNECTIONS", default=20, cast=int)
+AGENT_TOOL_TIMEOUT = config("AGENT_TOOL_TIMEOUT", default=30.0, cast=float)
+
+# Documents longer than DOCUMENT_CHUNK_THRESHOLD characters are also stored as
+# DOCUMENT_PART_SIZE parts; reads return the first part plus ranges on request.
+DOCUMENT_CHUNK_THRESHOLD = config("DOCUMENT_CHUNK_THRESHOLD", default=65536, cast=int)
+DOCUMENT_PART_SIZE = config("DOCUMENT_PART_SIZE", default=16384, cast=int)
+
+# NDJSON import/export: documents per bulk_create transaction and rows fetched
+# per database round trip.
+DOCUMENTS_IMPORT_BATCH_SIZE = config(
+    "DOCUMENTS_IMPORT_BATCH_SIZE", default=1000, cast=int
+)
+DOCUMENTS_EXPORT_CHUNK_SIZE = config(
+    "DOCUMENTS_EXPORT_CHUNK_SIZE", default=2000, cast=int
+)
+
+# Semantic search: "stub" (offline hashing), "local" (sentence-transformers)
+# or "openai". Documents are embedded by `manage.py embed_documents`.
+EMBEDDING_PROVIDER = config("EMBEDDING_PROVIDER", default="stub")
+EMBEDDING_MODEL = config("EMBEDDING_MODEL", default="")
+VECTOR_INDEX_DIR = config("VECTOR_INDEX_DIR", default=str(BASE_DIR / "vector_index"))
+
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
@@ -17,6 +17,7 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
+from ai.views import metrics_view
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularRedocView,
@@ -26,6 +27,7 @@ from drf_spectacular.views import (
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("documents.urls")),
+    path("metrics", metrics_view, name="metrics"),
     # Swagger & Schema
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path(
@@ -0,0 +1,12 @@
+"""
+Benchmarks for the documents API and the agent endpoint. The package sets up
+Django on import; run the modules with `python -m benchmarks.<name>` from src/.
+"""
+
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+
+import django  # noqa: E402
+
+django.setup()
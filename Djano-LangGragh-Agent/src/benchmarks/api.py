@@ -0,0 +1,196 @@
+"""
+Scale benchmark for the documents API: CRUD, list and search scenarios.
+
+Builds a throwaway test database and, for each corpus size, tops up a
+synthetic corpus spread over several users and runs every scenario with
+concurrent in-process clients. Reports RPS, p50/p95/p99 latency and the
+database queries per request.
+
+Usage (from src/):
+    python -m benchmarks.api --documents 10000,1000000 --users 10 --concurrency 4
+"""
+
+import argparse
+import random
+import threading
+
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from benchmarks.corpus import WORDS, create_users, load_corpus
+from benchmarks.pagination import cursor_at_depth
+from benchmarks.runner import benchmark_database, print_report, run_scenario
+from documents.models import Document
+
+SCENARIOS = [
+    "list",
+    "list-deep",
+    "retrieve",
+    "search",
+    "bulk-get",
+    "create",
+    "update",
+    "delete",
+]
+
+_local = threading.local()
+
+
+def get_client():
+    if not hasattr(_local, "client"):
+        _local.client = APIClient()
+    return _local.client
+
+
+class Scenarios:
+    def __init__(self, owner_ids, seed=0):
+        self.owner_ids = owner_ids
+        self.rng = random.Random(seed)
+        self.ids = {}
+        self.deep_cursors = {}
+        self.created = []
+        self.lock = threading.Lock()
+        for owner_id in owner_ids:
+            ids = list(
+                Document.objects.filter(owner_id=owner_id, active=True)
+                .order_by("id")
+                .values_list("id", flat=True)
+            )
+            self.ids[owner_id] = ids
+            self.deep_cursors[owner_id] = cursor_at_depth(owner_id, len(ids) // 2)
+
+    def pick(self):
+        with self.lock:
+            owner_id = self.rng.choice(self.owner_ids)
+            return owner_id, self.rng.choice(self.ids[owner_id])
+
+    def words(self, count):
+        with self.lock:
+            return " ".join(self.rng.sample(WORDS, count))
+
+    def list(self, i):
+        owner_id, _ = self.pick()
+        response = get_client().get("/api/docs/", {"user_id": owner_id, "limit": 25})
+        return response.status_code == 200
+
+    def list_deep(self, i):
+        owner_id, _ = self.pick()
+        params = {"user_id": owner_id, "cursor": self.deep_cursors[owner_id]}
+        return get_client().get("/api/docs/", params).status_code == 200
+
+    def retrieve(self, i):
+        owner_id, document_id = self.pick()
+        response = get_client().get(f"/api/docs/{document_id}/", {"user_id": owner_id})
+        return response.status_code == 200
+
+    def search(self, i):
+        owner_id, _ = self.pick()
+        params = {"user_id": owner_id, "search": self.words(2), "limit": 10}
+        return get_client().get("/api/docs/", params).status_code == 200
+
+    def bulk_get(self, i):
+        owner_id, _ = self.pick()
+        with self.lock:
+            ids = self.rng.sample(self.ids[owner_id], min(20, len(self.ids[owner_id])))
+        params = {"user_id": owner_id, "ids": ",".join(map(str, ids))}
+        return get_client().get("/api/docs/bulk-get/", params).status_code == 200
+
+    def create(self, i):
+        owner_id, _ = self.pick()
+        payload = {
+            "user_id": owner_id,
+            "title": self.words(3),
+            "content": self.words(40),
+        }
+        response = get_client().post("/api/docs/", payload, format="json")
+        if response.status_code != 201:
+            return False
+        with self.lock:
+            self.created.append((owner_id, response.json()["id"]))
+        return True
+
+    def update(self, i):
+        owner_id, document_id = self.pick()
+        payload = {"user_id": owner_id, "title": self.words(3)}
+        response = get_client().patch(
+            f"/api/docs/{document_id}/", payload, format="json"
+        )
+        return response.status_code == 200
+
+    def delete(self, i):
+        with self.lock:
+            if not self.created:
+                return False
+            owner_id, document_id = self.created.pop()
+        response = get_client().delete(f"/api/docs/{document_id}/?user_id={owner_id}")
+        return response.status_code == 204
+
+
+def run(sizes, users, content_size, requests, concurrency, scenarios):
+    owner_ids = create_users(users)
+    loaded = 0
+    for size in sizes:
+        print(f"\nLoading corpus up to {size:,} documents...")
+        per_user = (size - loaded) // users
+        if per_user > 0:
+            load_corpus(owner_ids, per_user, content_size=content_size, seed=size)
+            loaded += per_user * users
+
+        runner = Scenarios(owner_ids, seed=size)
+        runner.list(0)  # warm up URL resolving and serializer setup
+        results = []
+        for name in scenarios:
+            call = getattr(runner, name.replace("-", "_"))
+            # Deletes consume the documents made by the create scenario.
+            count = min(requests, len(runner.created)) if name == "delete" else requests
+            results.append(run_scenario(name, call, count, concurrency))
+        print_report(
+            results,
+            title=f"{loaded:,} documents, {users} users, concurrency {concurrency}",
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--documents",
+        default="10000,100000",
+        help="Comma-separated corpus sizes to benchmark, smallest first.",
+    )
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--content-size", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--scenarios", default=",".join(SCENARIOS), help="Comma-separated subset."
+    )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Keep the per-user read cache enabled (off by default to measure "
+        "the database).",
+    )
+    args = parser.parse_args()
+
+    sizes = sorted(int(size) for size in args.documents.split(","))
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    caches = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    with benchmark_database(), override_settings(
+        **({} if args.cache else {"CACHES": caches})
+    ):
+        run(
+            sizes,
+            args.users,
+            args.content_size,
+            args.requests,
+            args.concurrency,
+            scenarios,
+        )
+
+
+if __name__ == "__main__":
+    main()
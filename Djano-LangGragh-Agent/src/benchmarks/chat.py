@@ -0,0 +1,122 @@
+"""
+Load test for the agent chat endpoint against a fake OpenAI-compatible model.
+
+Builds a throwaway test database with a small corpus, serves the project over
+HTTP in-process (so the agent's tools call a live API), points the model at
+benchmarks.fake_openai and sends concurrent `POST /api/agent/chat/` requests.
+Requests are anonymous, so they all act as user 1, who owns the corpus.
+Reports RPS and p50/p95/p99 latency, plus the status codes and model calls.
+
+Usage (from src/):
+    python -m benchmarks.chat --requests 100 --concurrency 16 --latency 0.5
+"""
+
+import argparse
+import threading
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import httpx
+from django.core.wsgi import get_wsgi_application
+from django.test import override_settings
+
+from benchmarks.corpus import create_users, load_corpus
+from benchmarks.fake_openai import FakeOpenAIServer
+from benchmarks.runner import benchmark_database, print_report, run_scenario
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_project():
+    server = make_server(
+        "127.0.0.1",
+        0,
+        get_wsgi_application(),
+        server_class=ThreadingWSGIServer,
+        handler_class=QuietHandler,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(args):
+    load_corpus(create_users(1), args.documents)
+
+    model = FakeOpenAIServer(
+        ("127.0.0.1", 0), latency=args.latency, tool_calls=args.tool_calls
+    ).start()
+    api = serve_project()
+    base_url = f"http://127.0.0.1:{api.server_port}"
+
+    overrides = {
+        "OPENAI_BASE_URL": model.base_url,
+        "DOCUMENTS_API_URL": f"{base_url}/api/docs/",
+    }
+    if not args.admission:
+        # Measure the agent itself; pass --admission to include rate limits.
+        overrides.update(
+            AGENT_CHAT_RATE_PER_MINUTE=1e9,
+            AGENT_CHAT_BURST=10**6,
+            AGENT_CHAT_MAX_RUNNING=max(args.concurrency, 1),
+        )
+
+    lock = threading.Lock()
+    local = threading.local()
+    statuses = {}
+
+    def chat(i):
+        if not hasattr(local, "client"):
+            local.client = httpx.Client(base_url=base_url, timeout=120)
+        response = local.client.post(
+            "/api/agent/chat/", json={"prompt": f"List my latest documents ({i})"}
+        )
+        with lock:
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        return response.status_code == 200
+
+    with override_settings(**overrides):
+        # The first turn pays one-off imports and client setup; keep it out.
+        httpx.post(f"{base_url}/api/agent/chat/", json={"prompt": "hi"}, timeout=120)
+        result = run_scenario(
+            "agent-chat", chat, args.requests, args.concurrency, count_queries=False
+        )
+    api.shutdown()
+    model.shutdown()
+
+    print_report(
+        [result],
+        title=(
+            f"Agent chat: concurrency {args.concurrency}, model latency "
+            f"{args.latency}s, {args.tool_calls} tool call(s) per turn"
+        ),
+    )
+    print(f"Status codes: {statuses}; model calls: {model.requests}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5, help="Model latency.")
+    parser.add_argument("--tool-calls", type=int, default=1)
+    parser.add_argument("--documents", type=int, default=1000)
+    parser.add_argument(
+        "--admission",
+        action="store_true",
+        help="Keep the chat admission limits (rate limits and fair queue).",
+    )
+    args = parser.parse_args()
+
+    with benchmark_database():
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+Synthetic corpus generator for benchmarks.
+
+Creates users and documents with raw batched INSERTs (the full-text triggers
+still run) and realistic, searchable content of a configurable size.
+
+Usage (from src/), loading into the configured database:
+    python -m benchmarks.corpus --users 10 --documents 100000 --content-size 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.utils import timezone
+
+from documents.models import Document, sync_document_parts
+
+WORDS = (
+    "agent analysis api archive budget cache client cloud contract customer "
+    "data database deadline design document draft email engineering finance "
+    "graph index invoice learning machine meeting memo migration model network "
+    "notes onboarding plan policy product project proposal python query "
+    "quarterly release report research review roadmap sales schema search "
+    "security server service spec strategy summary support team travel vendor"
+).split()
+
+INSERT_SQL = (
+    "INSERT INTO documents_document "
+    "(owner_id, title, content, content_length, active, active_at, created_at, "
+    "updated_at) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+)
+
+
+class TextSource:
+    """
+    Cheap random text: slices of one pre-generated block of words, so a
+    million documents do not need a million random.choices() calls.
+    """
+
+    def __init__(self, rng, size=1_000_000):
+        words = []
+        length = 0
+        while length < size:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        self.text = " ".join(words)
+        self.rng = rng
+
+    def sample(self, size):
+        size = min(size, len(self.text))
+        start = self.rng.randrange(0, len(self.text) - size + 1)
+        start = self.text.find(" ", start) + 1
+        return self.text[start : start + size].strip()
+
+
+def create_users(count, prefix="bench-user"):
+    User = get_user_model()
+    users = User.objects.bulk_create(
+        [User(username=f"{prefix}-{i}") for i in range(count)]
+    )
+    if users and users[0].pk is None:  # backends without RETURNING
+        users = list(User.objects.filter(username__startswith=f"{prefix}-"))
+    return [user.pk for user in users]
+
+
+def load_corpus(
+    owner_ids, documents, content_size=500, seed=0, batch_size=10_000, stdout=None
+):
+    """
+    Insert DOCUMENTS documents for each owner, with content of about
+    CONTENT_SIZE characters (0.5x to 1.5x) and created_at one second apart.
+    """
+    rng = random.Random(seed)
+    source = TextSource(rng, size=max(1_000_000, content_size * 4))
+    start = timezone.now()
+    total = len(owner_ids) * documents
+    inserted = 0
+    with connection.cursor() as cursor:
+        for owner_id in owner_ids:
+            for offset in range(0, documents, batch_size):
+                rows = []
+                for i in range(offset, min(offset + batch_size, documents)):
+                    created_at = start - timedelta(seconds=i)
+                    content = source.sample(
+                        rng.randint(content_size // 2, content_size * 3 // 2)
+                    )
+                    title = f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}"
+                    rows.append(
+                        (
+                            owner_id,
+                            title,
+                            content,
+                            len(content),
+                            True,
+                            created_at,
+                            created_at,
+                            created_at,
+                        )
+                    )
+                with transaction.atomic():
+                    cursor.executemany(INSERT_SQL, rows)
+                inserted += len(rows)
+                if stdout:
+                    stdout.write(f"\r{inserted:,}/{total:,} documents")
+    if stdout:
+        stdout.write("\n")
+
+    # Large documents also need their parts (see Document.is_chunked).
+    if content_size * 3 // 2 > settings.DOCUMENT_CHUNK_THRESHOLD:
+        chunked = Document.objects.filter(
+            owner_id__in=owner_ids,
+            content_length__gt=settings.DOCUMENT_CHUNK_THRESHOLD,
+        ).only("id", "content", "content_length")
+        batch = []
+        for document in chunked.iterator(chunk_size=100):
+            batch.append(document)
+            if len(batch) == 100:
+                sync_document_parts(batch, created=True)
+                batch = []
+        sync_document_parts(batch, created=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--documents", type=int, default=10_000, help="Per user.")
+    parser.add_argument("--content-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    owner_ids = create_users(args.users, prefix=f"bench-{int(time.time())}")
+    load_corpus(
+        owner_ids,
+        args.documents,
+        content_size=args.content_size,
+        seed=args.seed,
+        stdout=sys.stdout,
+    )
+    print(
+        f"Loaded {args.users * args.documents:,} documents for users "
+        f"{owner_ids[0]}..{owner_ids[-1]} in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Fake OpenAI-compatible chat completions server for load tests.
+
+Answers `POST /v1/chat/completions` with a fixed latency instead of calling a
+real model. When the request offers tools and the last message is from the
+user, it first replies with tool calls (so the agent exercises its tools),
+then answers with text once the tool results come back. Streaming requests
+get the same reply as server-sent events.
+
+Usage (from src/), then point OPENAI_BASE_URL at http://127.0.0.1:8100/v1:
+    python -m benchmarks.fake_openai --port 8100 --latency 0.5
+"""
+
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFERRED_TOOLS = ("list_documents", "search_query_documents")
+
+_ids = itertools.count(1)
+
+
+def estimate_tokens(messages):
+    return sum(len(json.dumps(message)) for message in messages) // 4
+
+
+def build_reply(request, tool_calls):
+    """
+    Return the assistant message for a chat completions request body.
+    """
+    messages = request.get("messages") or []
+    tools = [tool["function"]["name"] for tool in request.get("tools") or []]
+    last = messages[-1] if messages else {}
+
+    if tools and tool_calls and last.get("role") == "user":
+        preferred = [name for name in PREFERRED_TOOLS if name in tools] or tools
+        calls = []
+        for i in range(tool_calls):
+            name = preferred[i % len(preferred)]
+            arguments = {"limit": 5}
+            if name == "search_query_documents":
+                arguments["query"] = "report"
+            calls.append(
+                {
+                    "id": f"call_{next(_ids)}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)},
+                }
+            )
+        return {"role": "assistant", "content": None, "tool_calls": calls}
+
+    if last.get("role") == "tool":
+        content = "Here is what I found in your documents."
+    else:
+        content = "This is a canned reply from the fake model."
+    return {"role": "assistant", "content": content}
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeOpenAI/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": "fake-model"}]})
+        else:
+            self.send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "Not found"}})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        time.sleep(self.server.latency)
+        message = build_reply(request, self.server.tool_calls)
+        prompt_tokens = estimate_tokens(request.get("messages") or [])
+        completion_tokens = len(json.dumps(message)) // 4
+        completion_id = f"chatcmpl-{next(_ids)}"
+        model = request.get("model", "fake-model")
+        finish_reason = "tool_calls" if message.get("tool_calls") else "stop"
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        with self.server.lock:
+            self.server.requests += 1
+
+        if request.get("stream"):
+            self.stream_reply(completion_id, model, message, finish_reason, usage)
+            return
+        self.send_json(
+            200,
+            {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {"index": 0, "message": message, "finish_reason": finish_reason}
+                ],
+                "usage": usage,
+            },
+        )
+
+    def stream_reply(self, completion_id, model, message, finish_reason, usage):
+        delta = {"role": "assistant", "content": message.get("content") or ""}
+        if message.get("tool_calls"):
+            delta["tool_calls"] = [
+                {"index": i, **call} for i, call in enumerate(message["tool_calls"])
+            ]
+        chunks = [
+            {"index": 0, "delta": delta, "finish_reason": None},
+            {"index": 0, "delta": {}, "finish_reason": finish_reason},
+        ]
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for choice in chunks:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [choice],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [],
+            "usage": usage,
+        }
+        self.wfile.write(f"data: {json.dumps(final)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.5, tool_calls=1):
+        super().__init__(address, FakeOpenAIHandler)
+        self.latency = latency
+        self.tool_calls = tool_calls
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds.")
+    parser.add_argument(
+        "--tool-calls",
+        type=int,
+        default=1,
+        help="Tool calls requested per user turn (0 to answer directly).",
+    )
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        (args.host, args.port), latency=args.latency, tool_calls=args.tool_calls
+    )
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
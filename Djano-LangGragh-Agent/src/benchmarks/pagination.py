@@ -0,0 +1,96 @@
+"""
+Benchmark per-user document listing at increasing page depths.
+
+Builds a throwaway test database, loads a synthetic corpus for one user and
+times `GET /api/docs/?user_id=..&limit=..` at several depths, comparing the
+keyset cursor against the OFFSET query it replaces.
+
+Usage (from src/):
+    python -m benchmarks.pagination --documents 1000000
+"""
+
+import argparse
+import statistics
+import time
+
+from django.db import connection
+from django.test.utils import setup_test_environment
+from rest_framework.pagination import Cursor
+from rest_framework.test import APIClient
+
+from benchmarks.corpus import create_users, load_corpus
+from documents.models import Document
+from documents.pagination import DocumentCursorPagination
+
+
+def cursor_at_depth(owner_id, depth):
+    document = (
+        Document.objects.filter(owner_id=owner_id, active=True)
+        .order_by("-created_at", "-id")
+        .only("created_at")[depth]
+    )
+    paginator = DocumentCursorPagination()
+    paginator.base_url = "/api/docs/"
+    position = str(document.created_at)
+    url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+    return url.split("cursor=", 1)[1]
+
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def run(documents, limit, repeat):
+    (user_id,) = create_users(1)
+    print(f"Loading {documents:,} documents...")
+    started = time.perf_counter()
+    load_corpus([user_id], documents)
+    print(f"Loaded in {time.perf_counter() - started:.1f}s")
+
+    client = APIClient()
+    queryset = Document.objects.filter(owner_id=user_id, active=True).order_by(
+        "-created_at", "-id"
+    )
+
+    print(f"{'depth':>10} {'cursor ms':>10} {'offset ms':>10}")
+    depth = 0
+    while depth < documents:
+        params = {"user_id": user_id, "limit": limit}
+        if depth:
+            params["cursor"] = cursor_at_depth(user_id, depth)
+
+        def fetch_cursor_page():
+            response = client.get("/api/docs/", params)
+            assert response.status_code == 200, response.content
+
+        def fetch_offset_page():
+            list(queryset[depth : depth + limit])
+
+        cursor_ms = time_call(fetch_cursor_page, repeat)
+        offset_ms = time_call(fetch_offset_page, repeat)
+        print(f"{depth:>10,} {cursor_ms:>10.2f} {offset_ms:>10.2f}")
+        depth = depth * 10 if depth else limit * 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        run(args.documents, args.limit, args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()
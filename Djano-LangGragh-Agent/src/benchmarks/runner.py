@@ -0,0 +1,145 @@
+"""
+Shared helpers: a throwaway benchmark database, a concurrent request runner
+and the latency/throughput report.
+"""
+
+import os
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Create a throwaway test database for the duration of the block. SQLite
+    uses a file instead of shared memory so concurrent threads do not hit
+    table locks.
+    """
+    setup_test_environment()
+    path = None
+    if connection.vendor == "sqlite":
+        fd, path = tempfile.mkstemp(suffix=".sqlite3", prefix="benchmark-")
+        os.close(fd)
+        connection.settings_dict["TEST"]["NAME"] = path
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class Result:
+    def __init__(self, name):
+        self.name = name
+        self.timings = []
+        self.queries = []
+        self.errors = 0
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, duration, queries=None, ok=True):
+        with self.lock:
+            self.timings.append(duration)
+            if queries is not None:
+                self.queries.append(queries)
+            if not ok:
+                self.errors += 1
+
+    def row(self):
+        ms = [timing * 1000 for timing in self.timings]
+        return {
+            "scenario": self.name,
+            "requests": len(self.timings),
+            "errors": self.errors,
+            "rps": len(self.timings) / self.elapsed if self.elapsed else 0.0,
+            "p50": percentile(ms, 50),
+            "p95": percentile(ms, 95),
+            "p99": percentile(ms, 99),
+            "queries": statistics.mean(self.queries) if self.queries else None,
+        }
+
+
+def run_scenario(name, call, requests, concurrency=1, count_queries=True):
+    """
+    Call CALL(i) REQUESTS times from CONCURRENCY threads. CALL returns a
+    truthy value on success. Query counts are captured per request on the
+    calling thread's database connection.
+    """
+    result = Result(name)
+
+    def run_one(i):
+        started = time.perf_counter()
+        try:
+            if count_queries:
+                with CaptureQueriesContext(connections["default"]) as captured:
+                    ok = call(i)
+                queries = len(captured.captured_queries)
+            else:
+                ok = call(i)
+                queries = None
+            result.add(time.perf_counter() - started, queries, bool(ok))
+        except Exception:
+            result.add(time.perf_counter() - started, None, ok=False)
+
+    indexes = iter(range(requests))
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    i = next(indexes, None)
+                if i is None:
+                    return
+                run_one(i)
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    else:
+        for i in range(requests):
+            run_one(i)
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def print_report(results, title=None):
+    if title:
+        print(f"\n{title}")
+    header = (
+        f"{'scenario':<20} {'reqs':>6} {'err':>4} {'rps':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        row = result.row()
+        queries = "-" if row["queries"] is None else f"{row['queries']:.1f}"
+        print(
+            f"{row['scenario']:<20} {row['requests']:>6} {row['errors']:>4} "
+            f"{row['rps']:>8.1f} {row['p50']:>8.2f} {row['p95']:>8.2f} "
+            f"{row['p99']:>8.2f} {queries:>8}"
+        )
@@ -0,0 +1,86 @@
+import hashlib
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+CACHE_ALIAS = getattr(settings, "DOCUMENTS_CACHE_ALIAS", "default")
+CACHE_TIMEOUT = getattr(settings, "DOCUMENTS_CACHE_TIMEOUT", 300)
+
+_stats = {"hits": 0, "misses": 0, "invalidations": 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def record(stat):
+    with _stats_lock:
+        _stats[stat] += 1
+
+
+def get_cache_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    return stats
+
+
+def version_key(user_id):
+    return f"documents:{user_id}:version"
+
+
+def get_user_version(user_id):
+    cache = get_cache()
+    version = cache.get(version_key(user_id))
+    if version is None:
+        cache.add(version_key(user_id), 1, timeout=None)
+        version = cache.get(version_key(user_id), 1)
+    return version
+
+
+def invalidate_user(user_id):
+    """
+    Bump the user's cache version so every cached read for them is skipped.
+    Old entries are left to expire.
+    """
+    cache = get_cache()
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.add(version_key(user_id), 2, timeout=None)
+    record("invalidations")
+
+
+def response_key(user_id, request):
+    path_hash = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f"documents:{user_id}:v{get_user_version(user_id)}:{path_hash}"
+
+
+def cached_response(user_id, request, get_response):
+    """
+    Return the cached response data for this user and URL, or build it with
+    get_response() and cache it if it is a 200.
+    """
+    if not user_id:
+        return get_response()
+
+    cache = get_cache()
+    key = response_key(user_id, request)
+    data = cache.get(key)
+    if data is not None:
+        record("hits")
+        response = Response(data, status=status.HTTP_200_OK)
+        response["X-Cache"] = "HIT"
+        return response
+
+    record("misses")
+    response = get_response()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, timeout=CACHE_TIMEOUT)
+    response["X-Cache"] = "MISS"
+    return response
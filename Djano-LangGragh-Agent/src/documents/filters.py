@@ -0,0 +1,16 @@
+from rest_framework import filters
+
+from .search import search_documents
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter backed by the document full-text index instead of
+    LIKE '%term%' scans over title and content.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, "")
+        if not query.strip():
+            return queryset
+        return search_documents(queryset, query)
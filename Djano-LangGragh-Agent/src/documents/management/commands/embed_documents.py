@@ -0,0 +1,104 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from ai.embeddings import get_embedding_model
+from documents.models import Document, DocumentChunk
+from documents.vector_index import build_user_index, chunk_text
+
+
+class Command(BaseCommand):
+    help = (
+        "Background worker that embeds new and changed documents and rebuilds "
+        "the per-user vector indexes used by semantic search."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=32)
+        parser.add_argument("--interval", type=float, default=5.0)
+        parser.add_argument(
+            "--once", action="store_true", help="Process pending documents and exit."
+        )
+        parser.add_argument("--provider", help="Override EMBEDDING_PROVIDER.")
+        parser.add_argument(
+            "--rebuild-interval",
+            type=float,
+            default=60.0,
+            help="Seconds between index rebuilds while a backlog is processed.",
+        )
+        parser.add_argument(
+            "--rebuild-all",
+            action="store_true",
+            help="Rebuild every user's index first, e.g. after an upgrade.",
+        )
+
+    def handle(self, *args, **options):
+        model = get_embedding_model(options["provider"])
+        dirty_users = set()
+        if options["rebuild_all"]:
+            dirty_users.update(
+                DocumentChunk.objects.values_list("owner_id", flat=True).distinct()
+            )
+        rebuilt_at = time.monotonic()
+        while True:
+            processed = self.process_pending(model, options["batch_size"], dirty_users)
+            if processed:
+                self.stdout.write(f"Embedded {processed} document(s).")
+            # Rebuilding reads all of a user's chunks: do it once the backlog
+            # is done, not after every batch, and now and then during a long
+            # backfill so searches see progress.
+            if not processed or (
+                time.monotonic() - rebuilt_at >= options["rebuild_interval"]
+            ):
+                for user_id in dirty_users:
+                    build_user_index(user_id)
+                dirty_users.clear()
+                rebuilt_at = time.monotonic()
+            if processed:
+                continue
+            if options["once"]:
+                break
+            time.sleep(options["interval"])
+
+    def process_pending(self, model, batch_size, dirty_users):
+        """
+        Embed a batch of pending documents and add the users whose indexes
+        need a rebuild to DIRTY_USERS. Returns the number of documents.
+        """
+        # Drop chunks of soft-deleted documents so their users' indexes shrink.
+        stale = DocumentChunk.objects.filter(document__active=False)
+        dirty_users.update(stale.values_list("owner_id", flat=True).distinct())
+        stale.delete()
+
+        pending = list(
+            Document.objects.filter(active=True)
+            .filter(Q(embedded_at__isnull=True) | Q(embedded_at__lt=F("updated_at")))
+            .order_by("updated_at")
+            .only("id", "owner_id", "title", "content", "updated_at")[:batch_size]
+        )
+        for document in pending:
+            texts = chunk_text(document.title, document.content)
+            vectors = model.embed_documents(texts) if texts else []
+            chunks = [
+                DocumentChunk(
+                    document_id=document.id,
+                    owner_id=document.owner_id,
+                    position=position,
+                    text=text,
+                    embedding=np.asarray(vector, dtype=np.float32).tobytes(),
+                )
+                for position, (text, vector) in enumerate(zip(texts, vectors))
+            ]
+            with transaction.atomic():
+                DocumentChunk.objects.filter(document_id=document.id).delete()
+                DocumentChunk.objects.bulk_create(chunks)
+                # Stamp the version that was embedded; a concurrent edit moves
+                # updated_at past it and the document is picked up again.
+                Document.objects.filter(id=document.id).update(
+                    embedded_at=document.updated_at
+                )
+            dirty_users.add(document.owner_id)
+        return len(pending)
@@ -0,0 +1,40 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from documents.models import Document
+from documents.ndjson import export_documents
+
+
+class Command(BaseCommand):
+    help = "Stream documents to an NDJSON file (or stdout) one row at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", "-o", help="Output file. Defaults to stdout.")
+        parser.add_argument("--user-id", type=int, help="Only export this user.")
+        parser.add_argument(
+            "--include-inactive",
+            action="store_true",
+            help="Also export soft-deleted documents.",
+        )
+        parser.add_argument("--chunk-size", type=int)
+
+    def handle(self, *args, **options):
+        queryset = Document.objects.all()
+        if not options["include_inactive"]:
+            queryset = queryset.filter(active=True)
+        if options["user_id"]:
+            queryset = queryset.filter(owner_id=options["user_id"])
+
+        lines = export_documents(queryset, chunk_size=options["chunk_size"])
+        count = 0
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                for line in lines:
+                    output.write(line)
+                    count += 1
+        else:
+            for line in lines:
+                sys.stdout.write(line)
+                count += 1
+        self.stderr.write(f"Exported {count} document(s).")
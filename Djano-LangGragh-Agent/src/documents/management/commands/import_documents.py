@@ -0,0 +1,48 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from documents.ndjson import UnknownOwner, import_documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Import documents from an NDJSON file (one JSON object per line) in "
+        "batched transactions. Use '-' to read from stdin."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file, or '-' for stdin.")
+        parser.add_argument(
+            "--user-id",
+            type=int,
+            help="Owner of every imported document. Defaults to each "
+            "record's owner_id.",
+        )
+        parser.add_argument("--batch-size", type=int)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if path == "-":
+            report = self.run_import(sys.stdin.buffer, options)
+        else:
+            try:
+                with open(path, "rb") as lines:
+                    report = self.run_import(lines, options)
+            except OSError as e:
+                raise CommandError(e)
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {error['error']}")
+        self.stdout.write(
+            f"Imported {report['created']} document(s), "
+            f"{report['failed']} line(s) failed."
+        )
+
+    def run_import(self, lines, options):
+        try:
+            return import_documents(
+                lines, owner_id=options["user_id"], batch_size=options["batch_size"]
+            )
+        except UnknownOwner as e:
+            raise CommandError(e)
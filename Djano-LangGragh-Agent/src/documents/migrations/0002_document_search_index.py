@@ -0,0 +1,96 @@
+from django.db import migrations
+
+SQLITE_FORWARDS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS documents_document_fts USING fts5(
+        title,
+        content,
+        content='documents_document',
+        content_rowid='id',
+        tokenize='porter unicode61',
+        prefix='2 3'
+    )
+    """,
+    # Only active documents are indexed, so soft-deleting a document removes
+    # it from the index and re-activating it puts it back.
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_document_fts_ai
+    AFTER INSERT ON documents_document WHEN new.active BEGIN
+        INSERT INTO documents_document_fts(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_document_fts_ad
+    AFTER DELETE ON documents_document WHEN old.active BEGIN
+        INSERT INTO documents_document_fts(documents_document_fts, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS documents_document_fts_au
+    AFTER UPDATE OF title, content, active ON documents_document BEGIN
+        INSERT INTO documents_document_fts(documents_document_fts, rowid, title, content)
+        SELECT 'delete', old.id, old.title, old.content WHERE old.active;
+        INSERT INTO documents_document_fts(rowid, title, content)
+        SELECT new.id, new.title, new.content WHERE new.active;
+    END
+    """,
+    """
+    INSERT INTO documents_document_fts(rowid, title, content)
+    SELECT id, title, content FROM documents_document WHERE active
+    """,
+]
+
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS documents_document_fts_au",
+    "DROP TRIGGER IF EXISTS documents_document_fts_ad",
+    "DROP TRIGGER IF EXISTS documents_document_fts_ai",
+    "DROP TABLE IF EXISTS documents_document_fts",
+]
+
+POSTGRES_FORWARDS = [
+    """
+    ALTER TABLE documents_document ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(content, '')), 'B')
+    ) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS documents_document_search_idx
+    ON documents_document USING GIN (search_vector)
+    """,
+]
+
+POSTGRES_BACKWARDS = [
+    "DROP INDEX IF EXISTS documents_document_search_idx",
+    "ALTER TABLE documents_document DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_vendor_sql(statements):
+    def run(apps, schema_editor):
+        vendor_statements = statements.get(schema_editor.connection.vendor, [])
+        for statement in vendor_statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_vendor_sql(
+                {"sqlite": SQLITE_FORWARDS, "postgresql": POSTGRES_FORWARDS}
+            ),
+            run_vendor_sql(
+                {"sqlite": SQLITE_BACKWARDS, "postgresql": POSTGRES_BACKWARDS}
+            ),
+        ),
+    ]
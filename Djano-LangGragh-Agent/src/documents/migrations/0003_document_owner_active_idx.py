@@ -0,0 +1,19 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_document_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='document',
+            index=models.Index(condition=models.Q(('active', True)), fields=['owner', '-created_at', '-id'], name='document_owner_active_idx'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.10 on 2026-10-19 08:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Length
+
+
+def backfill_content_parts(apps, schema_editor):
+    Document = apps.get_model("documents", "Document")
+    DocumentPart = apps.get_model("documents", "DocumentPart")
+    Document.objects.update(content_length=Coalesce(Length("content"), 0))
+
+    part_size = settings.DOCUMENT_PART_SIZE
+    large = Document.objects.filter(
+        content_length__gt=settings.DOCUMENT_CHUNK_THRESHOLD
+    ).only("id", "content")
+    for document in large.iterator(chunk_size=10):
+        content = document.content
+        DocumentPart.objects.bulk_create(
+            [
+                DocumentPart(document_id=document.id, position=position, text=text)
+                for position, text in enumerate(
+                    content[i : i + part_size]
+                    for i in range(0, len(content), part_size)
+                )
+            ],
+            batch_size=100,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("documents", "0004_document_chunks"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="document",
+            name="content_length",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name="DocumentPart",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("position", models.PositiveIntegerField()),
+                ("text", models.TextField()),
+                (
+                    "document",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="parts",
+                        to="documents.document",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["document", "position"],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("document", "position"),
+                        name="document_part_unique_position",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_content_parts, migrations.RunPython.noop),
+    ]
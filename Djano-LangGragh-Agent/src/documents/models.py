@@ -1,11 +1,26 @@
 from django.db import models
 from django.conf import settings
+from django.db.models.functions import Coalesce, Now
 from django.utils import timezone
 # Create your models here.
 
 User = settings.AUTH_USER_MODEL
 
 
+class DocumentQuerySet(models.QuerySet):
+    # Single UPDATE statements: no read-modify-save race and no per-row queries.
+
+    def soft_delete(self):
+        return self.filter(active=True).update(
+            active=False, active_at=None, updated_at=Now()
+        )
+
+    def activate(self):
+        return self.update(
+            active=True, active_at=Coalesce("active_at", Now()), updated_at=Now()
+        )
+
+
 class Document(models.Model):
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
 
@@ -21,13 +36,129 @@ class Document(models.Model):
     updated_at = models.DateTimeField(
         auto_now=True
     )  # db auto update this field to when it's updated
+    embedded_at = models.DateTimeField(
+        blank=True, null=True
+    )  # updated_at of the version whose chunks are embedded
+    content_length = models.PositiveIntegerField(
+        default=0
+    )  # above DOCUMENT_CHUNK_THRESHOLD the content is also stored as parts
+
+    content_truncated = False  # set by read views that only load a prefix
+
+    objects = DocumentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["owner", "-created_at", "-id"],
+                condition=models.Q(active=True),
+                name="document_owner_active_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title}"
 
+    @property
+    def is_chunked(self):
+        return self.content_length > settings.DOCUMENT_CHUNK_THRESHOLD
+
     def save(self, *args, **kwargs):
-        if self.active and self.active_at is None:
+        # Keep the time the document was activated; only a change of state
+        # touches active_at. Use Document.objects.soft_delete()/activate()
+        # to change the state of stored documents without loading them.
+        if not self.active:
+            self.active_at = None
+        elif self.active_at is None:
             self.active_at = timezone.now()
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None:
+            content_changed = self.content_changed()
         else:
-            self.active_at = None
+            content_changed = "content" in update_fields
+        if content_changed:
+            self.content_length = len(self.content or "")
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "content_length"}
+        adding = self._state.adding
         super().save(*args, **kwargs)
+        if content_changed:
+            sync_document_parts([self], created=adding)
+            self._stored_content_hash = hash(self.content)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Lets save() skip rewriting the parts when the content is unchanged,
+        # e.g. on a title-only PATCH. Strings cache their hash.
+        if "content" in instance.__dict__:
+            instance._stored_content_hash = hash(instance.content)
+        return instance
+
+    def content_changed(self):
+        if self._state.adding:
+            return True
+        if "content" in self.get_deferred_fields():
+            return False
+        return getattr(self, "_stored_content_hash", None) != hash(self.content)
+
+
+class DocumentChunk(models.Model):
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="chunks"
+    )
+    owner = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    position = models.PositiveIntegerField()
+    text = models.TextField()
+    embedding = models.BinaryField()  # float32 vector
+
+    class Meta:
+        ordering = ["document", "position"]
+
+    def __str__(self):
+        return f"{self.document_id}:{self.position}"
+
+
+class DocumentPart(models.Model):
+    document = models.ForeignKey(
+        Document, on_delete=models.CASCADE, related_name="parts"
+    )
+
+    position = models.PositiveIntegerField()
+    text = models.TextField()
+
+    class Meta:
+        ordering = ["document", "position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["document", "position"], name="document_part_unique_position"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.document_id}:{self.position}"
+
+
+def split_content(content, part_size=None):
+    part_size = part_size or settings.DOCUMENT_PART_SIZE
+    return [content[i : i + part_size] for i in range(0, len(content), part_size)]
+
+
+def sync_document_parts(documents, created=False):
+    """
+    Store the content of chunked documents as ordered DocumentParts,
+    replacing the parts of their previous version.
+    """
+    parts = [
+        DocumentPart(document_id=document.id, position=position, text=text)
+        for document in documents
+        if document.is_chunked
+        for position, text in enumerate(split_content(document.content))
+    ]
+    if not created:
+        DocumentPart.objects.filter(
+            document_id__in=[document.id for document in documents]
+        ).delete()
+    DocumentPart.objects.bulk_create(parts, batch_size=100)
@@ -0,0 +1,150 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate_user
+from .models import Document, sync_document_parts
+from .serializers import DocumentImportSerializer
+
+EXPORT_FIELDS = [
+    "id",
+    "owner_id",
+    "title",
+    "content",
+    "active",
+    "created_at",
+    "updated_at",
+]
+MAX_REPORTED_ERRORS = 100
+
+
+class UnknownOwner(ValueError):
+    pass
+
+
+def import_documents(lines, owner_id=None, batch_size=None):
+    """
+    Create documents from NDJSON LINES (bytes or str, one JSON object per
+    line) with one bulk_create per BATCH_SIZE documents, each batch in its
+    own transaction. Lines are consumed lazily, so memory stays bounded by
+    the batch size. Invalid lines are skipped and reported.
+
+    Records carry their owner as `owner_id` unless OWNER_ID is given. An
+    unknown OWNER_ID raises UnknownOwner before any line is read; records
+    with an unknown owner_id are skipped and reported like invalid lines.
+    """
+    if owner_id is not None and not user_exists(owner_id):
+        raise UnknownOwner(f"Unknown user: {owner_id}.")
+    batch_size = batch_size or settings.DOCUMENTS_IMPORT_BATCH_SIZE
+    report = {"created": 0, "failed": 0, "errors": []}
+    batch = []
+
+    def fail(line_number, error):
+        report["failed"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_number, "error": error})
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            fail(line_number, f"Invalid JSON: {e}")
+            continue
+        if not isinstance(record, dict):
+            fail(line_number, "Expected a JSON object.")
+            continue
+
+        if owner_id is not None:
+            record["owner_id"] = owner_id
+        serializer = DocumentImportSerializer(data=record)
+        if not serializer.is_valid():
+            fail(
+                line_number,
+                "; ".join(
+                    f"{field}: {' '.join(map(str, messages))}"
+                    for field, messages in serializer.errors.items()
+                ),
+            )
+            continue
+        batch.append((line_number, serializer.validated_data))
+
+        if len(batch) >= batch_size:
+            report["created"] += save_import_batch(batch, fail, owner_id is None)
+            batch = []
+
+    if batch:
+        report["created"] += save_import_batch(batch, fail, owner_id is None)
+    return report
+
+
+def user_exists(user_id):
+    try:
+        return get_user_model().objects.filter(id=user_id).exists()
+    except (TypeError, ValueError):
+        return False
+
+
+def save_import_batch(batch, fail, check_owners=True):
+    """
+    Save BATCH, a list of (line number, record), in one transaction. With
+    CHECK_OWNERS, records whose owner does not exist are passed to FAIL
+    first, so they cannot abort the transaction with a foreign key error.
+    """
+    if check_owners:
+        owner_ids = {record["owner_id"] for _, record in batch}
+        known = set(
+            get_user_model()
+            .objects.filter(id__in=owner_ids)
+            .values_list("id", flat=True)
+        )
+        for line_number, record in batch:
+            if record["owner_id"] not in known:
+                fail(line_number, f"owner_id: Unknown user {record['owner_id']}.")
+        batch = [item for item in batch if item[1]["owner_id"] in known]
+    return save_documents([record for _, record in batch])
+
+
+def save_documents(records):
+    now = timezone.now()
+    documents = [
+        Document(
+            owner_id=record["owner_id"],
+            title=record["title"],
+            content=record["content"],
+            content_length=len(record["content"] or ""),
+            active=record["active"],
+            active_at=now if record["active"] else None,
+        )
+        for record in records
+    ]
+    if not documents:
+        return 0
+    with transaction.atomic():
+        documents = Document.objects.bulk_create(documents)
+        sync_document_parts(documents, created=True)
+    for owner_id in {document.owner_id for document in documents}:
+        invalidate_user(owner_id)
+    return len(documents)
+
+
+def export_documents(queryset, chunk_size=None):
+    """
+    Yield the documents of QUERYSET as NDJSON lines. Rows are fetched
+    CHUNK_SIZE at a time through .iterator() (a server-side cursor on
+    PostgreSQL), so the export never holds the whole result set.
+    """
+    chunk_size = chunk_size or settings.DOCUMENTS_EXPORT_CHUNK_SIZE
+    rows = queryset.order_by("id").values(*EXPORT_FIELDS)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield json.dumps(row, default=serialize_value, ensure_ascii=False) + "\n"
+
+
+def serialize_value(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
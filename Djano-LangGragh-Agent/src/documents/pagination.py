@@ -0,0 +1,29 @@
+from rest_framework.pagination import CursorPagination
+
+
+class DocumentCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), so every page is a range scan on
+    the owner index no matter how deep the client has paged.
+    Honors the `limit` query parameter sent by the agent tools.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = 25
+    page_size_query_param = "limit"
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if "search_rank" not in queryset.query.extra_select:
+            return super().paginate_queryset(queryset, request, view)
+
+        # Ranked search results keep their relevance order: return the top
+        # `limit` matches as a single page.
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.cursor = None
+        self.has_next = False
+        self.has_previous = False
+        self.page = list(queryset[: self.page_size])
+        return self.page
@@ -0,0 +1,89 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryProfile:
+    """
+    Record the SQL statements run on this thread's database connections
+    while the context is active: count, total time and repeated statements
+    (the same SQL with different parameters, the usual sign of an N+1).
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.stack = None
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - started))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def duplicates(self):
+        """
+        Statements run more than once, with how many times, most first.
+        """
+        counts = Counter(sql for sql, _ in self.queries)
+        return [(sql, count) for sql, count in counts.most_common() if count > 1]
+
+    def summary(self):
+        lines = [f"{self.count} queries in {self.total_time * 1000:.1f} ms"]
+        for sql, count in self.duplicates():
+            lines.append(f"  {count}x {sql}")
+        return "\n".join(lines)
+
+
+class QueryProfilerMiddleware:
+    """
+    Add the request's query count, total query time and number of repeated
+    statements as response headers, and log requests with repeats. Only
+    installed when QUERY_PROFILING is on (the default in DEBUG).
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with QueryProfile() as profile:
+            response = self.get_response(request)
+
+        duplicates = profile.duplicates()
+        response["X-Query-Count"] = str(profile.count)
+        response["X-Query-Time-Ms"] = f"{profile.total_time * 1000:.1f}"
+        response["X-Query-Duplicates"] = str(sum(count - 1 for _, count in duplicates))
+        if duplicates:
+            logger.warning(
+                "Repeated queries on %s %s\n%s",
+                request.method,
+                request.path,
+                profile.summary(),
+            )
+        return response
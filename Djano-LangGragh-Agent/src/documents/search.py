@@ -0,0 +1,127 @@
+import re
+
+from django.db import connection, connections
+from django.db.models import Q
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Same triggers as migration 0002. SQLite drops triggers whenever Django
+# rebuilds documents_document (e.g. AddField with a default), so they are
+# restored after every migrate by ensure_sqlite_search_triggers().
+SQLITE_TRIGGERS = {
+    "documents_document_fts_ai": """
+        CREATE TRIGGER IF NOT EXISTS documents_document_fts_ai
+        AFTER INSERT ON documents_document WHEN new.active BEGIN
+            INSERT INTO documents_document_fts(rowid, title, content)
+            VALUES (new.id, new.title, new.content);
+        END
+    """,
+    "documents_document_fts_ad": """
+        CREATE TRIGGER IF NOT EXISTS documents_document_fts_ad
+        AFTER DELETE ON documents_document WHEN old.active BEGIN
+            INSERT INTO documents_document_fts(
+                documents_document_fts, rowid, title, content
+            )
+            VALUES ('delete', old.id, old.title, old.content);
+        END
+    """,
+    "documents_document_fts_au": """
+        CREATE TRIGGER IF NOT EXISTS documents_document_fts_au
+        AFTER UPDATE OF title, content, active ON documents_document BEGIN
+            INSERT INTO documents_document_fts(
+                documents_document_fts, rowid, title, content
+            )
+            SELECT 'delete', old.id, old.title, old.content WHERE old.active;
+            INSERT INTO documents_document_fts(rowid, title, content)
+            SELECT new.id, new.title, new.content WHERE new.active;
+        END
+    """,
+}
+
+
+def ensure_sqlite_search_triggers(using="default"):
+    """
+    Recreate missing full-text triggers and rebuild the index from the
+    active documents if any were missing.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s",
+            ["documents_document_fts"],
+        )
+        if cursor.fetchone() is None:
+            return
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        existing = {row[0] for row in cursor.fetchall()}
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+        if not missing:
+            return
+        for name in missing:
+            cursor.execute(SQLITE_TRIGGERS[name])
+        cursor.execute(
+            "INSERT INTO documents_document_fts(documents_document_fts) "
+            "VALUES ('delete-all')"
+        )
+        cursor.execute(
+            "INSERT INTO documents_document_fts(rowid, title, content) "
+            "SELECT id, title, content FROM documents_document WHERE active"
+        )
+
+
+def get_search_terms(query):
+    return TOKEN_RE.findall(query or "")[:16]
+
+
+def build_sqlite_match(terms):
+    # Quote every term so FTS5 operators in user input are treated as text,
+    # and make each one a prefix query.
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def build_postgres_tsquery(terms):
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def search_documents(queryset, query):
+    """
+    Filter a Document queryset with the full-text index and order it by rank.
+    Falls back to substring matching on databases without an index.
+    """
+    terms = get_search_terms(query)
+    if not terms:
+        return queryset
+
+    if connection.vendor == "sqlite":
+        queryset = queryset.extra(
+            tables=["documents_document_fts"],
+            where=[
+                "documents_document_fts.rowid = documents_document.id",
+                "documents_document_fts MATCH %s",
+            ],
+            params=[build_sqlite_match(terms)],
+            # bm25() is lower for better matches, title weighted above content
+            select={"search_rank": "bm25(documents_document_fts, 10.0, 1.0)"},
+        )
+        return queryset.order_by("search_rank", "-created_at")
+
+    if connection.vendor == "postgresql":
+        tsquery = build_postgres_tsquery(terms)
+        queryset = queryset.extra(
+            where=["documents_document.search_vector @@ to_tsquery('english', %s)"],
+            params=[tsquery],
+            select={
+                "search_rank": "-ts_rank_cd(documents_document.search_vector, "
+                "to_tsquery('english', %s))"
+            },
+            select_params=[tsquery],
+        )
+        return queryset.order_by("search_rank", "-created_at")
+
+    for term in terms:
+        queryset = queryset.filter(
+            Q(title__icontains=term) | Q(content__icontains=term)
+        )
+    return queryset
@@ -1,15 +1,148 @@
+from django.conf import settings
 from rest_framework import serializers
+from ai.models import ChatJob
 from .models import Document
 
 
+class SparseFieldsetMixin:
+    """
+    Drop every field not listed in the `fields` keyword argument, if given.
+    Fields in `Meta.optional_fields` are only returned when listed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is None:
+            fields = self.get_default_fields()
+        for field_name in set(self.fields) - set(fields):
+            self.fields.pop(field_name)
+
+    @classmethod
+    def get_default_fields(cls):
+        optional = getattr(cls.Meta, "optional_fields", ())
+        return [field for field in cls.Meta.fields if field not in optional]
+
+
 # 1. Serializer for the Chat Endpoint
 class ChatRequestSerializer(serializers.Serializer):
     prompt = serializers.CharField(required=True, max_length=5000)
+    thread_id = serializers.CharField(required=False, max_length=64)
+
+
+class ChatJobSerializer(serializers.ModelSerializer):
+    thread_id = serializers.CharField(source="thread.thread_id", read_only=True)
+
+    class Meta:
+        model = ChatJob
+        fields = [
+            "job_id",
+            "thread_id",
+            "status",
+            "response",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = fields
 
 
 # 2. Serializer for the Document CRUD ViewSet
-class DocumentSerializer(serializers.ModelSerializer):
+class DocumentSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    content_truncated = serializers.BooleanField(read_only=True)
+    snippet = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Document
+        fields = [
+            "id",
+            "title",
+            "content",
+            "content_length",
+            "content_truncated",
+            "created_at",
+            "updated_at",
+            "active",
+            "snippet",
+        ]
+        read_only_fields = ["id", "content_length", "created_at", "updated_at"]
+        optional_fields = ["snippet"]
+
+    def to_representation(self, instance):
+        # Read views load a bounded prefix of the content instead of the
+        # whole column; chunked documents only return their first part.
+        if "content_head" in instance.__dict__:
+            head = instance.__dict__.pop("content_head")
+            if instance.is_chunked:
+                instance.content = head[: settings.DOCUMENT_PART_SIZE]
+                instance.content_truncated = True
+            else:
+                instance.content = head
+        return super().to_representation(instance)
+
+
+# 3. Content-free serializer for document lists
+class DocumentListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    snippet = serializers.CharField(read_only=True)
+
     class Meta:
         model = Document
-        fields = ["id", "title", "content", "created_at", "updated_at", "active"]
-        read_only_fields = ["id", "created_at", "updated_at"]
+        fields = ["id", "title", "snippet", "created_at", "updated_at", "active"]
+        read_only_fields = fields
+
+
+# 4. Serializers for the bulk document endpoints
+BULK_MAX_DOCUMENTS = 100
+
+
+class DocumentBulkCreateSerializer(serializers.Serializer):
+    documents = DocumentSerializer(many=True, max_length=BULK_MAX_DOCUMENTS)
+
+
+class DocumentBulkUpdateItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField(required=False)
+    content = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class DocumentBulkUpdateSerializer(serializers.Serializer):
+    documents = DocumentBulkUpdateItemSerializer(
+        many=True, max_length=BULK_MAX_DOCUMENTS
+    )
+
+
+class DocumentImportSerializer(serializers.Serializer):
+    """
+    One NDJSON import record. Other keys (e.g. `id` and timestamps from an
+    export) are ignored; imported documents get new ids.
+    """
+
+    owner_id = serializers.IntegerField()
+    title = serializers.CharField(default="Title")
+    content = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        allow_null=True,
+        trim_whitespace=False,
+        default=None,
+    )
+    active = serializers.BooleanField(default=True)
+
+
+class DocumentIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), max_length=BULK_MAX_DOCUMENTS
+    )
+
+
+# 5. Serializer for semantic search queries
+class SemanticSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=1000)
+    limit = serializers.IntegerField(min_value=1, max_value=25, default=5)
+
+
+# 6. Serializer for document content range reads
+class DocumentRangeSerializer(serializers.Serializer):
+    offset = serializers.IntegerField(min_value=0, default=0)
+    length = serializers.IntegerField(min_value=1, max_value=65536, default=4000)
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_user
+from .models import Document
+from .search import ensure_sqlite_search_triggers
+
+
+@receiver(post_save, sender=Document)
+@receiver(post_delete, sender=Document)
+def invalidate_document_cache(sender, instance, **kwargs):
+    invalidate_user(instance.owner_id)
+
+
+def restore_search_triggers(sender, using, **kwargs):
+    ensure_sqlite_search_triggers(using)
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db.models.functions import Substr
+
+from .models import Document, DocumentPart
+
+
+def read_document_range(document, offset, length):
+    """
+    Read LENGTH characters of content from OFFSET without loading the whole
+    document: only the overlapping parts, or a SUBSTR of a small document.
+    """
+    if offset >= document.content_length:
+        return ""
+
+    if not document.is_chunked:
+        return (
+            Document.objects.filter(pk=document.pk)
+            .annotate(part=Substr("content", offset + 1, length))
+            .values_list("part", flat=True)
+            .get()
+        )
+
+    part_size = settings.DOCUMENT_PART_SIZE
+    first = offset // part_size
+    last = (offset + length - 1) // part_size
+    texts = DocumentPart.objects.filter(
+        document_id=document.pk, position__range=(first, last)
+    ).values_list("text", flat=True)
+    start = offset - first * part_size
+    return "".join(texts.order_by("position"))[start : start + length]
+
+
+def iter_document_content(document):
+    """
+    Yield the document content part by part for streaming responses.
+    """
+    if not document.is_chunked:
+        yield read_document_range(document, 0, document.content_length)
+        return
+
+    parts = (
+        DocumentPart.objects.filter(document_id=document.pk)
+        .order_by("position")
+        .values_list("text", flat=True)
+    )
+    yield from parts.iterator(chunk_size=4)
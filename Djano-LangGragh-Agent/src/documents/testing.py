@@ -0,0 +1,32 @@
+from contextlib import contextmanager
+
+from .profiling import QueryProfile
+
+
+@contextmanager
+def max_queries(budget, allow_duplicates=False):
+    """
+    Fail if the block runs more than BUDGET queries or, unless
+    ALLOW_DUPLICATES, the same statement more than once (an N+1).
+
+        with max_queries(2):
+            client.get("/api/docs/")
+    """
+    with QueryProfile() as profile:
+        yield profile
+    if profile.count > budget:
+        raise AssertionError(
+            f"Query budget exceeded: {profile.count} > {budget}.\n"
+            f"{profile.summary()}"
+        )
+    if not allow_duplicates and profile.duplicates():
+        raise AssertionError(f"Repeated queries.\n{profile.summary()}")
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin: `with self.assertMaxQueries(2): ...`.
+    """
+
+    def assertMaxQueries(self, budget, allow_duplicates=False):
+        return max_queries(budget, allow_duplicates=allow_duplicates)
@@ -1,3 +1,627 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ai.embeddings import get_embedding_model
+
+from . import vector_index
+from .cache import get_cache, get_user_version, invalidate_user, version_key
+from .models import Document, DocumentChunk, DocumentPart
+from .testing import QueryBudgetMixin
+
+NO_CACHE = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+
+
+@override_settings(CACHES=NO_CACHE)
+class DocumentQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Query budgets per endpoint. Reads and bulk operations must not grow with
+    the number of documents involved; repeated statements fail the budget.
+    The budgets include the SAVEPOINTs TestCase adds around transactions.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="owner")
+        Document.objects.bulk_create(
+            Document(owner=cls.user, title=f"Report {i}", content=f"quarterly {i}")
+            for i in range(30)
+        )
+        cls.ids = list(
+            Document.objects.filter(owner=cls.user).values_list("id", flat=True)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.params = {"user_id": self.user.id}
+
+    def test_list(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get("/api/docs/", self.params)
+        self.assertEqual(len(response.json()["results"]), 25)
+
+    def test_search(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get("/api/docs/", {**self.params, "search": "rep"})
+        self.assertEqual(response.status_code, 200)
+
+    def test_retrieve(self):
+        with self.assertMaxQueries(1):
+            response = self.client.get(f"/api/docs/{self.ids[0]}/", self.params)
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_get(self):
+        ids = ",".join(map(str, self.ids))
+        with self.assertMaxQueries(1):
+            response = self.client.get(
+                "/api/docs/bulk-get/", {**self.params, "ids": ids}
+            )
+        self.assertEqual(len(response.json()["results"]), 30)
+
+    def test_create(self):
+        payload = {**self.params, "title": "New", "content": "Text"}
+        with self.assertMaxQueries(1):
+            response = self.client.post("/api/docs/", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    def test_update(self):
+        payload = {**self.params, "title": "Renamed", "content": "New text"}
+        with self.assertMaxQueries(4):
+            response = self.client.patch(
+                f"/api/docs/{self.ids[0]}/", payload, format="json"
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_create(self):
+        documents = [{"title": f"Bulk {i}", "content": "Text"} for i in range(50)]
+        with self.assertMaxQueries(4):
+            response = self.client.post(
+                "/api/docs/bulk-create/",
+                {**self.params, "documents": documents},
+                format="json",
+            )
+        self.assertEqual(len(response.json()["results"]), 50)
+
+    def test_bulk_update(self):
+        documents = [{"id": pk, "title": "Renamed"} for pk in self.ids]
+        with self.assertMaxQueries(5):
+            response = self.client.post(
+                "/api/docs/bulk-update/",
+                {**self.params, "documents": documents},
+                format="json",
+            )
+        self.assertEqual(len(response.json()["results"]), 30)
+
+    def test_bulk_delete(self):
+        with self.assertMaxQueries(2):
+            response = self.client.post(
+                "/api/docs/bulk-delete/",
+                {**self.params, "ids": self.ids},
+                format="json",
+            )
+        self.assertEqual(response.json()["deleted"], 30)
+
+    def test_destroy_is_a_single_update(self):
+        document = Document.objects.get(id=self.ids[0])
+        with self.assertMaxQueries(1):
+            response = self.client.delete(
+                f"/api/docs/{document.id}/?user_id={self.user.id}"
+            )
+        self.assertEqual(response.status_code, 204)
+        document.refresh_from_db()
+        self.assertFalse(document.active)
+        self.assertIsNone(document.active_at)
+
+        response = self.client.delete(
+            f"/api/docs/{document.id}/?user_id={self.user.id}"
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class DocumentActivationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="owner")
+
+    def test_save_keeps_active_at(self):
+        document = Document.objects.create(owner=self.user, title="Doc")
+        activated_at = document.active_at
+        self.assertIsNotNone(activated_at)
+
+        document.title = "Renamed"
+        document.save()
+        document.refresh_from_db()
+        self.assertEqual(document.active_at, activated_at)
+
+    def test_soft_delete_and_activate(self):
+        document = Document.objects.create(owner=self.user, title="Doc")
+        queryset = Document.objects.filter(id=document.id)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(queryset.soft_delete(), 1)
+        self.assertEqual(queryset.soft_delete(), 0)
+
+        with self.assertNumQueries(1):
+            queryset.activate()
+        document.refresh_from_db()
+        self.assertTrue(document.active)
+        self.assertIsNotNone(document.active_at)
+
+
+@override_settings(CACHES=NO_CACHE)
+@override_settings(CACHES=NO_CACHE)
+class DocumentPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="owner")
+        Document.objects.bulk_create(
+            Document(owner=cls.user, title=f"Doc {i}") for i in range(120)
+        )
+        documents = Document.objects.filter(owner=cls.user)
+        # Ties on created_at are ordered by id.
+        documents.update(created_at=timezone.now())
+        cls.ids = list(documents.order_by("-id").values_list("id", flat=True))
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get_page(self, url=None, **params):
+        if url is None:
+            params["user_id"] = self.user.id
+            response = self.client.get("/api/docs/", params)
+        else:
+            # `next` links carry the query parameters.
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return [result["id"] for result in data["results"]], data["next"]
+
+    def test_page_size(self):
+        self.assertEqual(len(self.get_page()[0]), 25)
+        self.assertEqual(len(self.get_page(limit=10)[0]), 10)
+        self.assertEqual(len(self.get_page(limit=500)[0]), 100)
+
+    def test_next_walks_every_page_once(self):
+        ids, url = self.get_page(limit=50)
+        pages = 1
+        while url:
+            page, url = self.get_page(url)
+            ids.extend(page)
+            pages += 1
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, self.ids)
+
+    def test_newest_first(self):
+        latest = Document.objects.create(owner=self.user, title="Latest")
+        self.assertEqual(self.get_page(limit=2)[0], [latest.id, self.ids[0]])
+
+
+class DocumentSparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="owner")
+        cls.document = Document.objects.create(
+            owner=cls.user, title="Doc", content="Some content"
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.params = {"user_id": self.user.id}
+
+    def test_list_with_content_and_snippet(self):
+        response = self.client.get(
+            "/api/docs/", {**self.params, "fields": "id,content,snippet"}
+        )
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {
+                    "id": self.document.id,
+                    "content": "Some content",
+                    "snippet": "Some content",
+                }
+            ],
+        )
+
+    def test_retrieve_omits_snippet_by_default(self):
+        response = self.client.get(f"/api/docs/{self.document.id}/", self.params)
+        self.assertNotIn("snippet", response.json())
+        self.assertEqual(response.json()["content"], "Some content")
+
+    def test_unknown_fields(self):
+        response = self.client.get("/api/docs/", {**self.params, "fields": "id,nope"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("nope", response.json()["fields"][0])
+
+        response = self.client.get(
+            f"/api/docs/{self.document.id}/", {**self.params, "fields": "owner"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(CACHES=NO_CACHE)
+class DocumentBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="owner")
+        cls.other = get_user_model().objects.create(username="other")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.params = {"user_id": self.user.id}
+
+    def post(self, path, **data):
+        return self.client.post(path, {**self.params, **data}, format="json")
+
+    def test_bulk_create(self):
+        documents = [
+            {"title": "One", "content": "First"},
+            {"title": "Two", "content": "Second", "active": False},
+        ]
+        response = self.post("/api/docs/bulk-create/", documents=documents)
+        self.assertEqual(response.status_code, 201)
+        results = response.json()["results"]
+        self.assertEqual([result["title"] for result in results], ["One", "Two"])
+        self.assertTrue(all(result["active"] for result in results))
+
+        created = Document.objects.filter(owner=self.user).order_by("id")
+        self.assertEqual(
+            list(created.values_list("title", "content_length", "active")),
+            [("One", 5, True), ("Two", 6, True)],
+        )
+        self.assertTrue(all(document.active_at for document in created))
+
+    def test_bulk_create_rejects_invalid_items(self):
+        documents = [{"title": "Doc"}] * 100 + [{"title": None}]
+        response = self.post("/api/docs/bulk-create/", documents=documents)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Document.objects.exists())
+
+    def test_bulk_update(self):
+        document = Document.objects.create(owner=self.user, title="Doc", content="a")
+        untouched = Document.objects.create(owner=self.user, title="Keep")
+        response = self.post(
+            "/api/docs/bulk-update/",
+            documents=[{"id": document.id, "content": "longer"}, {"id": 0}],
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["not_found"], [0])
+
+        document.refresh_from_db()
+        self.assertEqual(
+            (document.title, document.content, document.content_length),
+            ("Doc", "longer", 6),
+        )
+        untouched.refresh_from_db()
+        self.assertEqual(untouched.title, "Keep")
+
+    def test_bulk_update_skips_other_users(self):
+        document = Document.objects.create(owner=self.other, title="Theirs")
+        response = self.post(
+            "/api/docs/bulk-update/", documents=[{"id": document.id, "title": "Mine"}]
+        )
+        self.assertEqual(response.json()["not_found"], [document.id])
+        document.refresh_from_db()
+        self.assertEqual(document.title, "Theirs")
+
+    def test_bulk_delete(self):
+        mine = Document.objects.create(owner=self.user, title="Mine")
+        theirs = Document.objects.create(owner=self.other, title="Theirs")
+        response = self.post("/api/docs/bulk-delete/", ids=[mine.id, theirs.id])
+        self.assertEqual(response.json(), {"deleted": 1})
+
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertFalse(mine.active)
+        self.assertTrue(theirs.active)
+
+
+@override_settings(CACHES=NO_CACHE, EMBEDDING_PROVIDER="stub")
+class SemanticSearchTests(TestCase):
+    def setUp(self):
+        index_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(index_dir.cleanup)
+        patcher = override_settings(VECTOR_INDEX_DIR=index_dir.name)
+        patcher.enable()
+        self.addCleanup(patcher.disable)
+
+        self.user = get_user_model().objects.create(username="owner")
+        self.client = APIClient()
+
+    def embed(self, **options):
+        call_command("embed_documents", once=True, stdout=mock.Mock(), **options)
+
+    def search(self, query):
+        response = self.client.get(
+            "/api/docs/semantic-search/", {"user_id": self.user.id, "q": query}
+        )
+        return [result["title"] for result in response.json()["results"]]
+
+    def test_model_is_shared(self):
+        self.assertIs(get_embedding_model(), get_embedding_model("stub"))
+
+    def test_search(self):
+        Document.objects.create(owner=self.user, title="Cats", content="cats purr")
+        Document.objects.create(owner=self.user, title="Rockets", content="liftoff")
+        self.embed()
+        self.assertEqual(self.search("purring cats")[0], "Cats")
+
+        Document.objects.create(owner=self.user, title="Fuel", content="rocket fuel")
+        Document.objects.filter(title="Cats").soft_delete()
+        self.embed()
+        self.assertNotIn("Cats", self.search("purring cats"))
+        self.assertIn("Fuel", self.search("rocket fuel"))
+
+    def test_rebuild_swaps_versions(self):
+        Document.objects.create(owner=self.user, title="Doc", content="text")
+        user_dir = vector_index.get_user_index_dir(self.user.id)
+        for _ in range(3):
+            vector_index.build_user_index(self.user.id)
+        current = (user_dir / "current").read_text()
+        self.assertEqual(len(list(user_dir.glob("v*"))), 2)
+        self.assertTrue((user_dir / current / "document_ids.npy").exists())
+
+    def test_index_is_rebuilt_once_per_run(self):
+        Document.objects.bulk_create(
+            Document(owner=self.user, title=f"Doc {i}", content="text")
+            for i in range(5)
+        )
+        with mock.patch(
+            "documents.management.commands.embed_documents.build_user_index"
+        ) as build:
+            self.embed(batch_size=2)
+        build.assert_called_once_with(self.user.id)
+        self.assertEqual(DocumentChunk.objects.values("document").distinct().count(), 5)
+
+
+@override_settings(CACHES=NO_CACHE, DOCUMENT_CHUNK_THRESHOLD=10, DOCUMENT_PART_SIZE=4)
+class DocumentPartsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="owner")
+
+    def setUp(self):
+        self.document = Document.objects.create(
+            owner=self.user, title="Doc", content="0123456789abcdef"
+        )
+        self.client = APIClient()
+
+    def parts(self):
+        return list(
+            DocumentPart.objects.filter(document=self.document).values_list(
+                "id", "text"
+            )
+        )
+
+    def patch(self, **data):
+        return self.client.patch(
+            f"/api/docs/{self.document.id}/",
+            {"user_id": self.user.id, **data},
+            format="json",
+        )
+
+    def test_title_only_update_keeps_parts(self):
+        parts = self.parts()
+        self.assertEqual(len(parts), 4)
+        with self.assertNumQueries(2):
+            response = self.patch(title="Renamed")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.parts(), parts)
+
+        document = Document.objects.get(id=self.document.id)
+        document.title = "Again"
+        document.save()
+        self.assertEqual(self.parts(), parts)
+
+    def test_content_update_replaces_parts(self):
+        response = self.patch(content="abcdefghijkl")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([text for _, text in self.parts()], ["abcd", "efgh", "ijkl"])
+        self.document.refresh_from_db()
+        self.assertEqual(self.document.content_length, 12)
+
+        response = self.patch(content="short")
+        self.assertEqual(self.parts(), [])
+
+
+@override_settings(CACHES=NO_CACHE)
+class DocumentImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="owner")
+
+    def post(self, body, user_id=None, **extra):
+        return self.client.post(
+            f"/api/docs/import/?user_id={user_id or self.user.id}&batch_size=2",
+            body,
+            content_type="application/x-ndjson",
+            **extra,
+        )
+
+    def test_import(self):
+        body = '{"title": "One"}\nnot json\n{"title": "Two"}\n{"title": "Three"}\n'
+        response = self.post(body)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["created"], 3)
+        self.assertEqual(response.json()["errors"][0]["line"], 2)
+        self.assertEqual(Document.objects.filter(owner=self.user).count(), 3)
+
+    def test_body_without_content_length(self):
+        response = self.post(
+            '{"title": "One"}\n', CONTENT_LENGTH="", HTTP_TRANSFER_ENCODING="chunked"
+        )
+        self.assertEqual(response.status_code, 411)
+        self.assertFalse(Document.objects.exists())
+
+    def test_unknown_user(self):
+        response = self.post('{"title": "One"}\n', user_id=self.user.id + 100)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Document.objects.exists())
+
+    def test_records_of_unknown_owners_are_reported(self):
+        lines = [
+            {"owner_id": self.user.id, "title": "One"},
+            {"owner_id": self.user.id + 100, "title": "Lost"},
+            {"owner_id": self.user.id, "title": "Two"},
+        ]
+        path = Path(self.enterContext(tempfile.TemporaryDirectory())) / "in.ndjson"
+        path.write_text("".join(json.dumps(line) + "\n" for line in lines))
+        stderr = io.StringIO()
+        call_command(
+            "import_documents",
+            str(path),
+            batch_size=2,
+            stdout=io.StringIO(),
+            stderr=stderr,
+        )
+        self.assertEqual(
+            list(Document.objects.values_list("title", flat=True).order_by("id")),
+            ["One", "Two"],
+        )
+        self.assertIn("line 2: owner_id: Unknown user", stderr.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("import_documents", str(path), user_id=self.user.id + 100)
+
+
+@override_settings(CACHES=NO_CACHE)
+class FullTextSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="owner")
+        cls.other = get_user_model().objects.create(username="other")
+        for title, content in [
+            ("Quarterly report", "Revenue grew in the third quarter."),
+            ("Holiday plans", "Flights to Lisbon and a week by the sea."),
+            ("Lisbon notes", "Quarterly offsite venue ideas."),
+        ]:
+            Document.objects.create(owner=cls.user, title=title, content=content)
+        Document.objects.create(owner=cls.other, title="Quarterly", content="Not mine")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def search(self, query):
+        response = self.client.get(
+            "/api/docs/", {"user_id": self.user.id, "search": query}
+        )
+        return [result["title"] for result in response.json()["results"]]
+
+    def test_prefix_match(self):
+        self.assertEqual(
+            sorted(self.search("quarter")), ["Lisbon notes", "Quarterly report"]
+        )
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self.search("lisbon quarterly"), ["Lisbon notes"])
+        self.assertEqual(self.search("lisbon revenue"), [])
+
+    def test_title_ranks_above_content(self):
+        self.assertEqual(self.search("lisbon"), ["Lisbon notes", "Holiday plans"])
+
+    def test_operators_are_text(self):
+        self.assertEqual(self.search('sea" OR "revenue'), [])
+        self.assertEqual(self.search("-sea*"), ["Holiday plans"])
+
+    def test_index_follows_updates(self):
+        document = Document.objects.get(title="Holiday plans")
+        document.title = "Vacation in Porto"
+        document.save()
+        self.assertEqual(self.search("porto"), ["Vacation in Porto"])
+        self.assertEqual(self.search("holiday"), [])
+
+        self.client.patch(
+            f"/api/docs/{document.id}/",
+            {"user_id": self.user.id, "content": "Trains to Madrid."},
+            format="json",
+        )
+        self.assertEqual(self.search("madrid"), ["Vacation in Porto"])
+        self.assertEqual(self.search("flights"), [])
+
+        Document.objects.filter(id=document.id).soft_delete()
+        self.assertEqual(self.search("madrid"), [])
+        Document.objects.filter(id=document.id).activate()
+        self.assertEqual(self.search("madrid"), ["Vacation in Porto"])
+
+
+@override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "documents-tests",
+        }
+    }
+)
+class DocumentCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username="owner")
+        cls.other = get_user_model().objects.create(username="other")
+
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.document = Document.objects.create(owner=self.user, title="Doc")
+
+    def list(self, user=None):
+        response = self.client.get("/api/docs/", {"user_id": (user or self.user).id})
+        titles = [result["title"] for result in response.json()["results"]]
+        return response["X-Cache"], titles
+
+    def post(self, path, **data):
+        return self.client.post(path, {"user_id": self.user.id, **data}, format="json")
+
+    def test_hits_until_a_document_changes(self):
+        self.assertEqual(self.list(), ("MISS", ["Doc"]))
+        self.assertEqual(self.list(), ("HIT", ["Doc"]))
+        self.assertEqual(self.list(self.other), ("MISS", []))
+
+        self.document.title = "Renamed"
+        self.document.save()
+        self.assertEqual(self.list(), ("MISS", ["Renamed"]))
+        # Other users keep their cached reads.
+        self.assertEqual(self.list(self.other), ("HIT", []))
+
+    def test_retrieve_is_invalidated_by_patch(self):
+        path = f"/api/docs/{self.document.id}/"
+        params = {"user_id": self.user.id}
+        self.client.get(path, params)
+        self.assertEqual(self.client.get(path, params)["X-Cache"], "HIT")
+
+        self.client.patch(path, {**params, "title": "Patched"}, format="json")
+        response = self.client.get(path, params)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["title"], "Patched")
+
+    def test_bulk_operations_invalidate(self):
+        self.list()
+        self.post("/api/docs/bulk-create/", documents=[{"title": "Bulk"}])
+        self.assertEqual(self.list(), ("MISS", ["Bulk", "Doc"]))
+
+        self.post(
+            "/api/docs/bulk-update/",
+            documents=[{"id": self.document.id, "title": "Updated"}],
+        )
+        self.assertEqual(self.list(), ("MISS", ["Bulk", "Updated"]))
+
+        self.post("/api/docs/bulk-delete/", ids=[self.document.id])
+        self.assertEqual(self.list(), ("MISS", ["Bulk"]))
+
+        bulk = Document.objects.get(owner=self.user, title="Bulk")
+        self.client.delete(f"/api/docs/{bulk.id}/?user_id={self.user.id}")
+        self.assertEqual(self.list(), ("MISS", []))
+
+    def test_version_bump(self):
+        version = get_user_version(self.user.id)
+        invalidate_user(self.user.id)
+        self.assertEqual(get_user_version(self.user.id), version + 1)
+        get_cache().delete(version_key(self.user.id))
+        invalidate_user(self.user.id)
+        self.assertEqual(get_user_version(self.user.id), 2)
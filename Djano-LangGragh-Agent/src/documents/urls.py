@@ -8,4 +8,11 @@ router.register(r"docs", views.DocumentViewSet, basename="document")
 urlpatterns = [
     path("", include(router.urls)),
     path("agent/chat/", views.chat_with_agent, name="agent-chat"),
+    path("agent/jobs/", views.create_chat_job, name="agent-jobs"),
+    path("agent/jobs/<str:job_id>/", views.chat_job_detail, name="agent-job-detail"),
+    path(
+        "agent/jobs/<str:job_id>/events/",
+        views.chat_job_events,
+        name="agent-job-events",
+    ),
 ]
@@ -0,0 +1,149 @@
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .models import DocumentChunk
+
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 100
+
+
+def chunk_text(title, content, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """
+    Split a document into overlapping chunks, breaking on whitespace.
+    The title is prepended to the first chunk.
+    """
+    text = f"{title}\n\n{content or ''}".strip()
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            space = text.rfind(" ", start + overlap, end)
+            if space != -1:
+                end = space
+        chunks.append(text[start:end].strip())
+        if end == len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [chunk for chunk in chunks if chunk]
+
+
+def get_user_index_dir(user_id):
+    return Path(settings.VECTOR_INDEX_DIR) / f"user_{user_id}"
+
+
+def build_user_index(user_id):
+    """
+    Write the user's chunk vectors to a normalized float32 matrix on disk,
+    next to the document id of every row. Both files go into a new version
+    directory, and the `current` file is then swapped to name it, so readers
+    never pair vectors and ids of different builds.
+    """
+    rows = DocumentChunk.objects.filter(
+        owner_id=user_id, document__active=True
+    ).values_list("document_id", "embedding")
+
+    document_ids, vectors = [], []
+    for document_id, embedding in rows.iterator(chunk_size=2000):
+        document_ids.append(document_id)
+        vectors.append(np.frombuffer(embedding, dtype=np.float32))
+
+    if vectors:
+        matrix = np.vstack(vectors)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1, norms)
+    else:
+        matrix = np.zeros((0, 0), dtype=np.float32)
+
+    index_dir = get_user_index_dir(user_id)
+    version = f"v{time.time_ns()}"
+    (index_dir / version).mkdir(parents=True)
+    np.save(index_dir / version / "vectors.npy", matrix)
+    np.save(
+        index_dir / version / "document_ids.npy",
+        np.asarray(document_ids, dtype=np.int64),
+    )
+    tmp_path = index_dir / "current.tmp"
+    tmp_path.write_text(version)
+    os.replace(tmp_path, index_dir / "current")
+
+    # Keep the previous version for readers that have just read `current`.
+    versions = sorted(index_dir.glob("v*"), key=lambda path: int(path.name[1:]))
+    for path in versions[:-2]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def read_current_version(index_dir):
+    try:
+        return (index_dir / "current").read_text()
+    except FileNotFoundError:
+        return None
+
+
+class UserIndexCache:
+    """
+    Memory-mapped user indexes, reloaded when the worker rewrites them.
+    """
+
+    def __init__(self):
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def get(self, user_id):
+        index_dir = get_user_index_dir(user_id)
+        with self.lock:
+            # Retry if a rebuild removed the version between the two reads.
+            for _ in range(3):
+                version = read_current_version(index_dir)
+                if version is None:
+                    return None
+                cached = self.indexes.get(user_id)
+                if cached is not None and cached[0] == version:
+                    return cached[1], cached[2]
+                try:
+                    vectors = np.load(
+                        index_dir / version / "vectors.npy", mmap_mode="r"
+                    )
+                    document_ids = np.load(index_dir / version / "document_ids.npy")
+                except FileNotFoundError:
+                    continue
+                self.indexes[user_id] = (version, vectors, document_ids)
+                return vectors, document_ids
+        return None
+
+
+index_cache = UserIndexCache()
+
+
+def search_user_index(user_id, query_vector, limit=5):
+    """
+    Return [(document_id, score)] for the user's documents closest to the
+    query vector, best chunk per document.
+    """
+    index = index_cache.get(user_id)
+    if index is None:
+        return []
+    vectors, document_ids = index
+    if not len(document_ids):
+        return []
+
+    query = np.asarray(query_vector, dtype=np.float32)
+    if query.shape[0] != vectors.shape[1]:
+        return []
+    query = query / (np.linalg.norm(query) or 1.0)
+    scores = vectors @ query
+
+    results = {}
+    for row in np.argsort(-scores):
+        document_id = int(document_ids[row])
+        if document_id not in results:
+            results[document_id] = float(scores[row])
+            if len(results) == limit:
+                break
+    return list(results.items())
@@ -1,43 +1,409 @@
-from rest_framework.decorators import api_view
+import json
+import logging
+import time
+
+from rest_framework.decorators import action, api_view
 from rest_framework.response import Response
-from rest_framework import status, viewsets, filters
+from rest_framework import status, viewsets
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.db import transaction
+from django.db.models.functions import Substr
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404
-from ai.agents import get_document_agent
-from .models import Document
+from django.urls import reverse
+from django.utils import timezone
+from ai.admission import AdmissionRejected, chat_scheduler
+from ai.chat import run_chat
+from ai.embeddings import get_embedding_model
+from ai.jobs import TooManyJobs, submit_job
+from ai.metrics import agent_errors
+from ai.models import ChatJob, ChatJobEvent, ChatThread
+from .cache import cached_response, get_cache_stats, invalidate_user
+from .filters import FullTextSearchFilter
+from .pagination import DocumentCursorPagination
+from .vector_index import search_user_index
+from .models import Document, sync_document_parts
+from .ndjson import UnknownOwner, export_documents, import_documents
+from .storage import iter_document_content, read_document_range
 from .serializers import (
+    ChatJobSerializer,
     DocumentSerializer,
+    DocumentListSerializer,
+    DocumentBulkCreateSerializer,
+    DocumentBulkUpdateSerializer,
+    DocumentIdsSerializer,
+    DocumentRangeSerializer,
+    SemanticSearchSerializer,
     ChatRequestSerializer,
 )  # Assuming ChatRequestSerializer exists from previous step
 
+logger = logging.getLogger(__name__)
+
 
 class DocumentViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows documents to be viewed or edited.
-    Supports filtering by user_id and searching by title/content.
+    Supports filtering by user_id and ranked full-text search by title/content.
+    Lists omit `content` (a short `snippet` is returned instead); read actions
+    accept `?fields=id,title,...` to return and load only those fields.
+    Bulk endpoints handle up to 100 documents in one request and transaction.
+    Per-user reads are cached until one of the user's documents changes.
+    Semantic search ranks documents by embedding similarity to a query.
+    NDJSON import/export streams any number of documents in constant memory.
     """
 
     serializer_class = DocumentSerializer
-    filter_backends = [filters.SearchFilter]
+    filter_backends = [FullTextSearchFilter]
+    pagination_class = DocumentCursorPagination
     search_fields = ["title", "content"]
+    document_columns = [field.name for field in Document._meta.concrete_fields]
+    snippet_length = 160
+    read_actions = ("list", "retrieve", "bulk_get")
 
     def get_queryset(self):
-        queryset = Document.objects.filter(active=True).order_by("-created_at")
-        user_id = self.request.query_params.get("user_id") or self.request.data.get(
-            "user_id"
-        )
+        queryset = Document.objects.filter(active=True).order_by("-created_at", "-id")
+        user_id = self.get_user_id()
 
         if user_id:
             queryset = queryset.filter(owner_id=user_id)
+
+        if self.action in self.read_actions:
+            queryset = self.project_queryset(queryset)
+        elif self.action in ("content_range", "download"):
+            queryset = queryset.defer("content")
+        return queryset
+
+    def get_user_id(self):
+        return self.request.query_params.get("user_id") or self.request.data.get(
+            "user_id"
+        )
+
+    def get_requested_fields(self):
+        if self.action not in self.read_actions:
+            return None
+        fields = self.request.query_params.get("fields")
+        if not fields:
+            return None
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [
+            field for field in fields if field not in DocumentSerializer.Meta.fields
+        ]
+        if unknown:
+            raise ValidationError(
+                {"fields": [f"Unknown fields: {', '.join(unknown)}."]}
+            )
+        return fields
+
+    def project_queryset(self, queryset):
+        fields = self.get_requested_fields()
+        if fields is None:
+            if self.action == "list":
+                fields = DocumentListSerializer.get_default_fields()
+            else:
+                fields = DocumentSerializer.get_default_fields()
+
+        # id and created_at are always loaded: the cursor paginator reads them.
+        columns = {"id", "created_at"}
+        columns.update(field for field in fields if field in self.document_columns)
+        if "content" in columns:
+            # Load a bounded prefix instead of the whole column, see
+            # DocumentSerializer.to_representation.
+            columns.discard("content")
+            columns.add("content_length")
+            queryset = queryset.annotate(
+                content_head=Substr("content", 1, settings.DOCUMENT_CHUNK_THRESHOLD)
+            )
+        queryset = queryset.only(*columns)
+        if "snippet" in fields:
+            queryset = queryset.annotate(
+                snippet=Substr("content", 1, self.snippet_length)
+            )
         return queryset
 
+    def get_serializer_class(self):
+        if self.action == "list" and "content" not in (
+            self.get_requested_fields() or []
+        ):
+            return DocumentListSerializer
+        return DocumentSerializer
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_requested_fields()
+        if fields is not None:
+            kwargs["fields"] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return cached_response(
+            self.get_user_id(),
+            request,
+            lambda: super(DocumentViewSet, self).list(request, *args, **kwargs),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return cached_response(
+            self.get_user_id(),
+            request,
+            lambda: super(DocumentViewSet, self).retrieve(request, *args, **kwargs),
+        )
+
     def perform_create(self, serializer):
         user_id = self.request.data.get("user_id")
 
         serializer.save(owner_id=user_id, active=True)
 
-    def perform_destroy(self, instance):
-        instance.active = False
-        instance.save()
+    def destroy(self, request, *args, **kwargs):
+        # Soft-delete with a single UPDATE instead of loading and saving the
+        # document. No post_save is sent, so invalidate the owner's cache here.
+        try:
+            queryset = self.get_queryset().filter(pk=kwargs["pk"])
+        except (TypeError, ValueError):
+            raise Http404
+        owner_id = self.get_user_id() or (
+            queryset.values_list("owner_id", flat=True).first()
+        )
+        if not queryset.soft_delete():
+            raise Http404
+        invalidate_user(owner_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=["post"], url_path="bulk-create")
+    def bulk_create(self, request):
+        serializer = DocumentBulkCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user_id = request.data.get("user_id")
+
+        now = timezone.now()
+        documents = []
+        for item in serializer.validated_data["documents"]:
+            # Created documents are always active, as in perform_create.
+            item.pop("active", None)
+            documents.append(
+                Document(
+                    owner_id=user_id,
+                    active=True,
+                    active_at=now,
+                    content_length=len(item.get("content") or ""),
+                    **item,
+                )
+            )
+        with transaction.atomic():
+            documents = Document.objects.bulk_create(documents)
+            sync_document_parts(documents, created=True)
+        invalidate_user(user_id)
+
+        data = DocumentSerializer(documents, many=True).data
+        return Response({"results": data}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["post"], url_path="bulk-update")
+    def bulk_update(self, request):
+        serializer = DocumentBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = {
+            item.pop("id"): item for item in serializer.validated_data["documents"]
+        }
+
+        with transaction.atomic():
+            documents = list(
+                self.get_queryset().select_for_update().filter(id__in=changes)
+            )
+            now = timezone.now()
+            fields = {"updated_at"}
+            for document in documents:
+                for field, value in changes[document.id].items():
+                    setattr(document, field, value)
+                    fields.add(field)
+                document.updated_at = now
+                document.content_length = len(document.content or "")
+            if "content" in fields:
+                fields.add("content_length")
+            Document.objects.bulk_update(documents, sorted(fields))
+            if "content" in fields:
+                sync_document_parts(
+                    [
+                        document
+                        for document in documents
+                        if "content" in changes[document.id]
+                    ]
+                )
+        for owner_id in {document.owner_id for document in documents}:
+            invalidate_user(owner_id)
+
+        found = {document.id for document in documents}
+        data = DocumentSerializer(documents, many=True).data
+        return Response(
+            {"results": data, "not_found": [pk for pk in changes if pk not in found]}
+        )
+
+    @action(detail=False, methods=["post"], url_path="bulk-delete")
+    def bulk_delete(self, request):
+        serializer = DocumentIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+
+        queryset = self.get_queryset().filter(id__in=ids)
+        owner_ids = set(queryset.values_list("owner_id", flat=True))
+        deleted = queryset.soft_delete()
+        for owner_id in owner_ids:
+            invalidate_user(owner_id)
+        return Response({"deleted": deleted})
+
+    @action(detail=False, methods=["post"], url_path="import")
+    def import_ndjson(self, request):
+        """
+        Import an NDJSON request body (one document per line) for `user_id`.
+        The body is read line by line and saved in batches of `batch_size`.
+        """
+        # Read user_id from the query string: touching request.data would
+        # parse (and buffer) the whole body.
+        user_id = request.query_params.get("user_id")
+        if not user_id:
+            return Response(
+                {"error": "user_id is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            batch_size = int(request.query_params.get("batch_size", 0)) or None
+        except ValueError:
+            return Response(
+                {"error": "batch_size must be an integer."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if request.stream is None:
+            # DRF only reads bodies with a Content-Length; a chunked upload
+            # would otherwise look empty and "succeed" with no documents.
+            if not request.META.get("CONTENT_LENGTH"):
+                return Response(
+                    {"error": "Content-Length is required."},
+                    status=status.HTTP_411_LENGTH_REQUIRED,
+                )
+            return Response(
+                {"error": "The request body is empty."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            report = import_documents(
+                request.stream, owner_id=user_id, batch_size=batch_size
+            )
+        except UnknownOwner as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=["get"], url_path="export")
+    def export_ndjson(self, request):
+        if not self.get_user_id():
+            return Response(
+                {"error": "user_id is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        response = StreamingHttpResponse(
+            export_documents(self.get_queryset()), content_type="application/x-ndjson"
+        )
+        response["Content-Disposition"] = 'attachment; filename="documents.ndjson"'
+        return response
+
+    @action(detail=False, methods=["get"], url_path="bulk-get")
+    def bulk_get(self, request):
+        return cached_response(
+            self.get_user_id(), request, lambda: self.get_bulk_documents(request)
+        )
+
+    def get_bulk_documents(self, request):
+        ids = request.query_params.get("ids", "")
+        serializer = DocumentIdsSerializer(
+            data={"ids": [pk for pk in ids.split(",") if pk.strip()]}
+        )
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data["ids"]
+
+        documents = list(self.get_queryset().filter(id__in=ids))
+        found = {document.id for document in documents}
+        data = self.get_serializer(documents, many=True).data
+        return Response(
+            {"results": data, "not_found": [pk for pk in ids if pk not in found]}
+        )
+
+    @action(detail=True, methods=["get"], url_path="content")
+    def content_range(self, request, pk=None):
+        """
+        Return document metadata plus `length` characters of content starting
+        at `offset`, reading only the parts that overlap the range.
+        """
+        serializer = DocumentRangeSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        offset = serializer.validated_data["offset"]
+        length = serializer.validated_data["length"]
+
+        document = self.get_object()
+        content = read_document_range(document, offset, length)
+        end = offset + len(content)
+        return Response(
+            {
+                "id": document.id,
+                "title": document.title,
+                "content_length": document.content_length,
+                "offset": offset,
+                "length": len(content),
+                "next_offset": end if end < document.content_length else None,
+                "content": content,
+            }
+        )
+
+    @action(detail=True, methods=["get"])
+    def download(self, request, pk=None):
+        document = self.get_object()
+        response = StreamingHttpResponse(
+            iter_document_content(document), content_type="text/plain; charset=utf-8"
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="document-{document.id}.txt"'
+        )
+        return response
+
+    @action(detail=False, methods=["get"], url_path="semantic-search")
+    def semantic_search(self, request):
+        serializer = SemanticSearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        user_id = self.get_user_id()
+        if not user_id:
+            return Response(
+                {"error": "user_id is required."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        query_vector = get_embedding_model().embed_query(serializer.validated_data["q"])
+        matches = search_user_index(
+            user_id, query_vector, limit=serializer.validated_data["limit"]
+        )
+        scores = dict(matches)
+        titles = dict(
+            self.get_queryset().filter(id__in=scores).values_list("id", "title")
+        )
+        results = [
+            {"id": document_id, "title": titles[document_id], "score": score}
+            for document_id, score in matches
+            if document_id in titles
+        ]
+        return Response({"results": results})
+
+    @action(detail=False, methods=["get"], url_path="cache-stats")
+    def cache_stats(self, request):
+        return Response(get_cache_stats())
+
+
+def get_request_user_id(request):
+    return request.user.id if request.user.is_authenticated else 1
+
+
+def get_chat_thread(user_id, thread_id):
+    if thread_id:
+        return get_object_or_404(ChatThread, thread_id=thread_id, owner_id=user_id)
+    return ChatThread.objects.create(owner_id=user_id)
 
 
 @api_view(["GET", "POST"])
@@ -53,25 +419,124 @@ def chat_with_agent(request):
 
     prompt = serializer.validated_data["prompt"]
 
+    # 2. Determine User ID
+    user_id = get_request_user_id(request)
+
+    # 3. Wait for a fair share of the agent, or reject fast with 429
     try:
-        # 2. Determine User ID
-        user_id = request.user.id if request.user.is_authenticated else 1
+        slot = chat_scheduler.admit(user_id)
+    except AdmissionRejected as e:
+        return rejected_response(e)
+
+    with slot:
+        # 4. Resume the user's thread or start a new one
+        thread = get_chat_thread(user_id, serializer.validated_data.get("thread_id"))
+
+        try:
+            # 5. Run the agent on the thread
+            response_text = run_chat(thread, prompt)
+
+            return Response(
+                {"response": response_text, "thread_id": thread.thread_id},
+                status=status.HTTP_200_OK,
+            )
+
+        except Exception as e:
+            logger.exception("Agent chat failed on thread %s", thread.thread_id)
+            agent_errors.inc(kind="chat", error=type(e).__name__)
+            return Response(
+                {"error": str(e), "error_type": type(e).__name__},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
-        # 3. Initialize the Agent
-        agent = get_document_agent()
 
-        # 4. Prepare inputs and config for LangGraph
-        inputs = {"messages": [{"role": "user", "content": prompt}]}
-        config = {"configurable": {"user_id": user_id}}
+def rejected_response(error):
+    return Response(
+        {"error": str(error), "reason": error.reason, "retry_after": error.retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={"Retry-After": str(error.retry_after)},
+    )
 
-        # 5. Invoke the Agent
-        result = agent.invoke(inputs, config=config)
 
-        # 6. Extract the final response
-        last_message = result["messages"][-1]
-        response_text = last_message.content
+@api_view(["POST"])
+def create_chat_job(request):
+    """
+    Queue a chat turn for the background worker pool and return immediately.
+    """
+    serializer = ChatRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    user_id = get_request_user_id(request)
+    try:
+        chat_scheduler.check_rate(user_id)
+    except AdmissionRejected as e:
+        return rejected_response(e)
+
+    thread = get_chat_thread(user_id, serializer.validated_data.get("thread_id"))
+    try:
+        job = submit_job(thread, serializer.validated_data["prompt"])
+    except TooManyJobs as e:
+        return Response({"error": str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
+    data = ChatJobSerializer(job).data
+    data["status_url"] = reverse("agent-job-detail", args=[job.job_id])
+    data["events_url"] = reverse("agent-job-events", args=[job.job_id])
+    return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+@api_view(["GET"])
+def chat_job_detail(request, job_id):
+    job = get_object_or_404(
+        ChatJob.objects.select_related("thread"),
+        job_id=job_id,
+        owner_id=get_request_user_id(request),
+    )
+    return Response(ChatJobSerializer(job).data)
+
+
+def chat_job_events(request, job_id):
+    """
+    Stream a job's progress events as Server-Sent Events.
+
+    Each request is a short long-poll: it sends the events after the cursor
+    (`?after=` or the Last-Event-ID header EventSource sends on reconnect)
+    and ends once no new event has arrived for AGENT_JOBS_EVENTS_WAIT
+    seconds, so a worker thread is never held for the whole job. Once the
+    job has finished and every event was sent, it returns 204, which tells
+    EventSource to stop reconnecting.
+    """
+    job = get_object_or_404(
+        ChatJob, job_id=job_id, owner_id=get_request_user_id(request)
+    )
+    try:
+        after = int(
+            request.GET.get("after") or request.headers.get("Last-Event-ID") or 0
+        )
+    except ValueError:
+        return HttpResponseBadRequest("after must be an event id.")
+    events = ChatJobEvent.objects.filter(job=job)
+    if job.finished and not events.filter(id__gt=after).exists():
+        return HttpResponse(status=204)
 
-        return Response({"response": response_text}, status=status.HTTP_200_OK)
+    def stream():
+        last_id = after
+        yield "retry: 1000\n\n"
+        deadline = time.monotonic() + settings.AGENT_JOBS_EVENTS_WAIT
+        while True:
+            # Status first: once it reads finished, every event is written.
+            job.refresh_from_db(fields=["status"])
+            new_events = list(events.filter(id__gt=last_id))
+            for event in new_events:
+                last_id = event.id
+                yield f"id: {event.id}\ndata: {json.dumps(event.data)}\n\n"
+            if job.finished or time.monotonic() >= deadline:
+                return
+            if new_events:
+                deadline = time.monotonic() + settings.AGENT_JOBS_EVENTS_WAIT
+            else:
+                time.sleep(0.5)
 
-    except Exception as e:
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    return response
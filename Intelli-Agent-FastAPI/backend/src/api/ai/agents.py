@@ -1,12 +1,21 @@
-from langgraph.prebuilt import create_react_agent
-from langgraph_supervisor import create_supervisor
+import asyncio
 
+from fastapi import Request
+
+from api.ai.cache import get_email_cache
 from api.ai.llms import get_openai_llm
-from api.ai.tools import research_email, send_me_email
+from api.config import AI_WARM_UP
+
+# langgraph and the tools (langchain_core) are imported by the functions that
+# need them: importing the app stays cheap and the cost moves to warm_up.
+
+
+def get_email_agent(model=None):
+    from langgraph.prebuilt import create_react_agent
 
+    from api.ai.tools import send_me_email
 
-def get_email_agent():
-    model = get_openai_llm()
+    model = model or get_openai_llm()
     agent = create_react_agent(
         model=model,
         tools=[send_me_email],
@@ -16,8 +25,12 @@ def get_email_agent():
     return agent
 
 
-def get_research_agent():
-    model = get_openai_llm()
+def get_research_agent(model=None):
+    from langgraph.prebuilt import create_react_agent
+
+    from api.ai.tools import research_email
+
+    model = model or get_openai_llm()
     agent = create_react_agent(
         model=model,
         tools=[research_email],
@@ -28,10 +41,14 @@ def get_research_agent():
     return agent
 
 
-def get_supervisor(checkpointer=None):
-    llm = get_openai_llm()
-    email_agent = get_email_agent()
-    research_agent = get_research_agent()
+def get_supervisor(checkpointer=None, model=None):
+    from langgraph_supervisor import create_supervisor
+
+    # Build once at startup (see main.lifespan) and share: the compiled graph
+    # keeps no per-run state, so concurrent invocations are independent.
+    llm = model or get_openai_llm()
+    email_agent = get_email_agent(llm)
+    research_agent = get_research_agent(llm)
 
     supe = create_supervisor(
         agents=[email_agent, research_agent],
@@ -42,3 +59,38 @@ def get_supervisor(checkpointer=None):
         ),
     ).compile(checkpointer=checkpointer)
     return supe
+
+
+def build_supervisor():
+    """
+    Import the AI stack and compile the supervisor, in a worker thread.
+    """
+    get_email_cache()
+    return get_supervisor(model=get_openai_llm())
+
+
+def start_warm_up(app):
+    app.state.supervisor = asyncio.ensure_future(asyncio.to_thread(build_supervisor))
+    return app.state.supervisor
+
+
+async def warm_up(app):
+    """
+    Build the supervisor shared by all requests. With AI_WARM_UP=background
+    the app serves (health checks, history) while it loads, and chat
+    requests wait for it.
+    """
+    supervisor = start_warm_up(app)
+    if AI_WARM_UP != "background":
+        await supervisor
+
+
+async def get_shared_supervisor(request: Request):
+    """
+    Dependency returning the supervisor compiled at startup.
+    """
+    supervisor = getattr(request.app.state, "supervisor", None)
+    if supervisor is None:
+        # App served without its lifespan (e.g. a bare TestClient).
+        supervisor = start_warm_up(request.app)
+    return await asyncio.shield(supervisor)
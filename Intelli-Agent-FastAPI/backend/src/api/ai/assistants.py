@@ -5,7 +5,7 @@ from api.ai.tools import send_me_email
 EMAIL_TOOLS = {"send_me_email": send_me_email}
 
 
-def email_assistant(query: str):
+async def email_assistant(query: str):
     llm_base = get_openai_llm()
     llm = llm_base.bind_tools(list(EMAIL_TOOLS.values()))
 
@@ -16,7 +16,7 @@ def email_assistant(query: str):
         ),
         ("human", f"{query}."),
     ]
-    response = llm.invoke(messages)
+    response = await llm.ainvoke(messages)
     messages.append(response)
     if hasattr(response, "tool_calls") and response.tool_calls:
         for tool_call in response.tool_calls:
@@ -25,8 +25,8 @@ def email_assistant(query: str):
             tool_arg = tool_call.get("args")
             if not tool_func:
                 continue
-            tool_result = tool_func.invoke(tool_arg)
+            tool_result = await tool_func.ainvoke(tool_arg)
             messages.append(tool_result)
-        final_response = llm.invoke(messages)
+        final_response = await llm.ainvoke(messages)
         return final_response
     return response
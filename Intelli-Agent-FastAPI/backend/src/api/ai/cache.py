@@ -0,0 +1,262 @@
+"""
+Response cache for `generate_email_message`.
+
+Entries are keyed by the normalized research query. When
+EMAIL_CACHE_SIMILARITY is set, a miss then looks for a cached query whose
+embedding has at least that cosine similarity. Entries expire after
+EMAIL_CACHE_TTL seconds. The store is an in-process LRU (`memory`) or the
+`emailcacheentry` table (`database`, shared by every worker), chosen with
+EMAIL_CACHE_BACKEND (`none` turns caching off). Concurrent calls for the same
+query share one LLM call (single flight). Hit rates are on `GET /metrics`.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter, OrderedDict
+from datetime import timedelta
+from functools import lru_cache
+
+from sqlalchemy import delete
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api import metrics
+from api.ai.llms import OPENAI_MODEL_NAME, get_openai_embeddings
+from api.ai.models import EmailCacheEntry
+from api.ai.schemas import EmailMessageSchema
+from api.chat.models import get_utc_now
+from api.db import engine
+
+logger = logging.getLogger(__name__)
+
+EMAIL_CACHE_BACKEND = os.environ.get("EMAIL_CACHE_BACKEND") or "memory"
+EMAIL_CACHE_TTL = float(os.environ.get("EMAIL_CACHE_TTL") or 3600)
+EMAIL_CACHE_MAX_ENTRIES = int(os.environ.get("EMAIL_CACHE_MAX_ENTRIES") or 1000)
+EMAIL_CACHE_SIMILARITY = float(os.environ.get("EMAIL_CACHE_SIMILARITY") or 0)
+# Most recent entries compared by the database store on a similarity lookup.
+EMAIL_CACHE_SIMILARITY_CANDIDATES = int(
+    os.environ.get("EMAIL_CACHE_SIMILARITY_CANDIDATES") or 500
+)
+
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.strip(" .!?")
+
+
+def cache_key(normalized: str) -> str:
+    return hashlib.sha256(f"{OPENAI_MODEL_NAME}\n{normalized}".encode()).hexdigest()
+
+
+def unit_vector(vector):
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def similarity(a, b):
+    # Both vectors are unit length, so the dot product is the cosine.
+    return sum(x * y for x, y in zip(a, b))
+
+
+class MemoryStore:
+    """
+    Least recently used entries of this process, at most MAX_ENTRIES.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_entries=EMAIL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        # key -> (expires_at, value, embedding)
+        self.entries = OrderedDict()
+
+    def size(self):
+        return len(self.entries)
+
+    async def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= get_utc_now():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[1]
+
+    async def set(self, key, query, value, embedding, ttl):
+        expires_at = get_utc_now() + timedelta(seconds=ttl)
+        self.entries[key] = (expires_at, value, embedding)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    async def nearest(self, embedding, threshold):
+        now = get_utc_now()
+        best, best_score = None, threshold
+        for expires_at, value, other in self.entries.values():
+            if other is None or expires_at <= now:
+                continue
+            score = similarity(embedding, other)
+            if score >= best_score:
+                best, best_score = value, score
+        return best
+
+
+class DatabaseStore:
+    """
+    Entries in the emailcacheentry table, shared by every API process.
+    """
+
+    name = "database"
+
+    def size(self):
+        return None  # not worth a COUNT on every scrape
+
+    async def get(self, key):
+        query = (
+            select(EmailCacheEntry.response)
+            .where(EmailCacheEntry.key == key)
+            .where(EmailCacheEntry.expires_at > get_utc_now())
+        )
+        async with AsyncSession(engine) as session:
+            response = (await session.exec(query)).first()
+        if response is None:
+            return None
+        return EmailMessageSchema.model_validate_json(response)
+
+    async def set(self, key, query, value, embedding, ttl):
+        now = get_utc_now()
+        entry = EmailCacheEntry(
+            key=key,
+            query=query,
+            response=value.model_dump_json(),
+            embedding=json.dumps(embedding) if embedding is not None else None,
+            created_at=now,
+            expires_at=now + timedelta(seconds=ttl),
+        )
+        async with AsyncSession(engine) as session:
+            await session.merge(entry)
+            await session.exec(
+                delete(EmailCacheEntry).where(col(EmailCacheEntry.expires_at) <= now)
+            )
+            await session.commit()
+
+    async def nearest(self, embedding, threshold):
+        query = (
+            select(EmailCacheEntry)
+            .where(EmailCacheEntry.expires_at > get_utc_now())
+            .where(col(EmailCacheEntry.embedding).is_not(None))
+            .order_by(col(EmailCacheEntry.created_at).desc())
+            .limit(EMAIL_CACHE_SIMILARITY_CANDIDATES)
+        )
+        async with AsyncSession(engine) as session:
+            entries = (await session.exec(query)).all()
+        best, best_score = None, threshold
+        for entry in entries:
+            score = similarity(embedding, json.loads(entry.embedding))
+            if score >= best_score:
+                best, best_score = entry, score
+        if best is None:
+            return None
+        return EmailMessageSchema.model_validate_json(best.response)
+
+
+class EmailMessageCache:
+    def __init__(self, store, ttl=EMAIL_CACHE_TTL, similarity=EMAIL_CACHE_SIMILARITY):
+        self.store = store
+        self.ttl = ttl
+        self.similarity = similarity
+        # key -> task generating the response, shared by concurrent callers.
+        self.inflight = {}
+        self.stats = Counter()
+
+    async def get_or_generate(self, query, generate):
+        """
+        Cached response for QUERY, or `await generate(query)` once for all
+        concurrent callers asking the same normalized query.
+        """
+        self.stats["requests"] += 1
+        normalized = normalize_query(query)
+        key = cache_key(normalized)
+
+        value = await self.store.get(key)
+        if value is not None:
+            self.stats["hits"] += 1
+            return value
+
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self.fill(key, normalized, query, generate))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+        # Shielded: one caller going away must not cancel the shared call.
+        return await asyncio.shield(task)
+
+    async def fill(self, key, normalized, query, generate):
+        embedding = None
+        if self.similarity:
+            try:
+                vector = await get_openai_embeddings().aembed_query(normalized)
+                embedding = unit_vector(vector)
+                value = await self.store.nearest(embedding, self.similarity)
+            except Exception:
+                logger.exception("Email cache similarity lookup failed")
+                value = None
+            if value is not None:
+                self.stats["similar_hits"] += 1
+                await self.store.set(key, normalized, value, embedding, self.ttl)
+                return value
+
+        self.stats["misses"] += 1
+        try:
+            value = await generate(query)
+        except Exception:
+            self.stats["errors"] += 1
+            raise
+        # Requests the model flagged as invalid are not worth replaying.
+        if not value.invalid_request:
+            await self.store.set(key, normalized, value, embedding, self.ttl)
+        return value
+
+    def collect_metrics(self):
+        stats = self.stats
+        served = stats["hits"] + stats["similar_hits"] + stats["coalesced"]
+        return {
+            "backend": self.store.name,
+            "requests": stats["requests"],
+            "hits": stats["hits"],
+            "similar_hits": stats["similar_hits"],
+            "coalesced": stats["coalesced"],
+            "misses": stats["misses"],
+            "errors": stats["errors"],
+            "hit_rate": served / stats["requests"] if stats["requests"] else 0.0,
+            "entries": self.store.size(),
+        }
+
+
+STORES = {"memory": MemoryStore, "database": DatabaseStore}
+EMAIL_CACHE_BACKENDS = ("none", *STORES)
+
+
+@lru_cache(maxsize=None)
+def get_email_cache():
+    """
+    The cache of this process, or None when turned off. Checked by
+    api.config.validate_settings at startup.
+    """
+    if EMAIL_CACHE_BACKEND == "none":
+        return None
+    if EMAIL_CACHE_BACKEND not in STORES:
+        raise RuntimeError(
+            f"EMAIL_CACHE_BACKEND must be one of {', '.join(EMAIL_CACHE_BACKENDS)}"
+        )
+    cache = EmailMessageCache(STORES[EMAIL_CACHE_BACKEND]())
+    metrics.register("email_cache", cache.collect_metrics)
+    return cache
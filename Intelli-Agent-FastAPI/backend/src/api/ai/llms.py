@@ -1,18 +1,50 @@
 import os
-
-from langchain_openai import ChatOpenAI
+from functools import lru_cache
 
 OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
 OPENAI_MODEL_NAME = os.environ.get("OPENAI_MODEL_NAME") or "gpt-4o-mini"
+OPENAI_EMBEDDING_MODEL_NAME = (
+    os.environ.get("OPENAI_EMBEDDING_MODEL_NAME") or "text-embedding-3-small"
+)
 OPEN_API_KEY = os.environ.get("OPENAI_API_KEY")
-
-if not OPEN_API_KEY:
-    raise NotImplementedError("OPEN_API_KEY is required")
+# Chat completion requests per second of each process, unlimited if unset.
+OPENAI_REQUESTS_PER_SECOND = float(os.environ.get("OPENAI_REQUESTS_PER_SECOND") or 0)
 
 
+# langchain_openai (and the openai SDK under it) is imported on first use:
+# it is most of the import time of the app. See api.ai.agents.warm_up.
+@lru_cache(maxsize=None)
 def get_openai_llm():
+    from langchain_core.rate_limiters import InMemoryRateLimiter
+    from langchain_openai import ChatOpenAI
+
+    # One client per process: ChatOpenAI is safe to share between concurrent
+    # requests and keeps a pooled HTTP client with warm connections.
     openai_params = {"model": OPENAI_MODEL_NAME, "api_key": OPEN_API_KEY}
     if OPENAI_BASE_URL:
         openai_params["base_url"] = OPENAI_BASE_URL
+    if OPENAI_REQUESTS_PER_SECOND:
+        openai_params["rate_limiter"] = InMemoryRateLimiter(
+            requests_per_second=OPENAI_REQUESTS_PER_SECOND,
+            check_every_n_seconds=0.05,
+            max_bucket_size=max(1, OPENAI_REQUESTS_PER_SECOND),
+        )
 
     return ChatOpenAI(**openai_params)
+
+
+@lru_cache(maxsize=None)
+def get_openai_embeddings():
+    from langchain_openai import OpenAIEmbeddings
+
+    # Only short queries are embedded: skip the tiktoken length check (and its
+    # encoding download) and send the text as is.
+    openai_params = {
+        "model": OPENAI_EMBEDDING_MODEL_NAME,
+        "api_key": OPEN_API_KEY,
+        "check_embedding_ctx_length": False,
+    }
+    if OPENAI_BASE_URL:
+        openai_params["base_url"] = OPENAI_BASE_URL
+
+    return OpenAIEmbeddings(**openai_params)
@@ -0,0 +1,22 @@
+from sqlmodel import SQLModel, Field, DateTime
+from datetime import datetime
+
+from api.chat.models import get_utc_now
+
+
+class EmailCacheEntry(SQLModel, table=True):
+    # sha256 of the model name and the normalized query.
+    key: str = Field(primary_key=True, max_length=64)
+    query: str
+    # EmailMessageSchema as JSON.
+    response: str
+    # Unit-length query embedding as a JSON list, when similarity is on.
+    embedding: str | None = Field(default=None)
+    created_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+    )
+    expires_at: datetime = Field(
+        sa_type=DateTime(timezone=True), nullable=False, index=True
+    )
@@ -0,0 +1,303 @@
+"""
+Optional local pre-router in front of the supervisor.
+
+Most requests are "research this and email it to me", for which the
+supervisor always hands off to the research agent, then the email agent, at
+the cost of three extra LLM round trips. The pre-router recognizes these
+requests locally, with keyword rules first and then a nearest-centroid
+classifier over word n-grams. The classifier is trained at startup on seed
+examples plus the routes the supervisor took for past chats. Confident
+matches run the fixed research -> email pipeline directly. Anything else
+goes to the supervisor.
+
+Enable with ROUTER_ENABLED=true. `GET /metrics` reports the bypass rate and
+the latency saved.
+"""
+
+import logging
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+
+from fastapi import Request
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api import metrics
+from api.ai.schemas import ChatResponseSchema
+from api.ai.services import format_email_message, generate_email_message
+from api.chat.models import ChatMessage
+from api.db import engine
+
+logger = logging.getLogger(__name__)
+
+ROUTER_ENABLED = (os.environ.get("ROUTER_ENABLED") or "false") == "true"
+# Margin of the best class over the other one, in cosine similarity.
+ROUTER_MIN_CONFIDENCE = float(os.environ.get("ROUTER_MIN_CONFIDENCE") or 0.15)
+ROUTER_TRAINING_SIZE = int(os.environ.get("ROUTER_TRAINING_SIZE") or 5000)
+
+ROUTER = "router"
+RESEARCH_EMAIL = "research_email"
+OTHER = "other"
+# Supervisor routes that match the fixed pipeline.
+RESEARCH_EMAIL_ROUTES = {ROUTER, "research_agent,email_agent"}
+# Once the pipeline calls this tool the email may be queued, so failures
+# must not hand the request to the supervisor, which would send it again.
+EMAIL_TOOL = "send_me_email"
+
+EMAIL_WORDS = re.compile(r"\b(e-?mail|mail|inbox|send)\b")
+SELF_WORDS = re.compile(r"\b(me|myself|my)\b")
+RESEARCH_WORDS = re.compile(
+    r"\b(research|summar\w*|latest|news|explain|overview|report|about|"
+    r"find|look up|compose|draft|write)\b"
+)
+# Other recipients or follow-ups on earlier emails need the supervisor.
+OTHER_WORDS = re.compile(r"@|\b(cc|forward|reply|status|sent already|did you)\b")
+
+SEED_EXAMPLES = [
+    ("research the latest battery technology and email me a summary", RESEARCH_EMAIL),
+    ("summarize recent ai news and send it to my inbox", RESEARCH_EMAIL),
+    ("find out about the james webb telescope and mail me", RESEARCH_EMAIL),
+    ("write an email to me about healthy breakfast ideas", RESEARCH_EMAIL),
+    ("send me an overview of rust vs go", RESEARCH_EMAIL),
+    ("email me a report on electric car sales", RESEARCH_EMAIL),
+    ("draft an email for me explaining quantum computing", RESEARCH_EMAIL),
+    ("hello", OTHER),
+    ("what can you do", OTHER),
+    ("did you send the last email", OTHER),
+    ("forward the previous email to my boss", OTHER),
+    ("thanks", OTHER),
+    ("who are you", OTHER),
+    ("what is the status of my request", OTHER),
+]
+
+
+def features(text):
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    grams = Counter(words)
+    grams.update(" ".join(pair) for pair in zip(words, words[1:]))
+    norm = math.sqrt(sum(count * count for count in grams.values())) or 1.0
+    return {gram: count / norm for gram, count in grams.items()}
+
+
+def cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(value * b.get(gram, 0.0) for gram, value in a.items())
+
+
+class CentroidClassifier:
+    """
+    Nearest centroid over L2-normalized word unigram and bigram counts.
+    """
+
+    def __init__(self):
+        self.centroids = {}
+
+    def fit(self, examples):
+        sums = defaultdict(Counter)
+        for text, label in examples:
+            sums[label].update(features(text))
+        self.centroids = {}
+        for label, total in sums.items():
+            norm = math.sqrt(sum(value * value for value in total.values())) or 1.0
+            self.centroids[label] = {
+                gram: value / norm for gram, value in total.items()
+            }
+        return self
+
+    def predict(self, text):
+        """
+        Best label and its margin over the runner-up.
+        """
+        vector = features(text)
+        scores = sorted(
+            (
+                (cosine(vector, centroid), label)
+                for label, centroid in self.centroids.items()
+            ),
+            reverse=True,
+        )
+        if not scores or scores[0][0] == 0.0:
+            return OTHER, 0.0
+        runner_up = scores[1][0] if len(scores) > 1 else 0.0
+        return scores[0][1], scores[0][0] - runner_up
+
+
+@dataclass
+class Decision:
+    bypass: bool
+    reason: str
+    confidence: float = 0.0
+
+
+class PreRouter:
+    def __init__(self, classifier, min_confidence=ROUTER_MIN_CONFIDENCE):
+        self.classifier = classifier
+        self.min_confidence = min_confidence
+        self.stats = Counter()
+        # route kind -> [count, total seconds]
+        self.latency = defaultdict(lambda: [0, 0.0])
+
+    def route(self, message: str) -> Decision:
+        self.stats["requests"] += 1
+        text = message.lower()
+        if OTHER_WORDS.search(text):
+            decision = Decision(False, "rule")
+        elif (
+            EMAIL_WORDS.search(text)
+            and SELF_WORDS.search(text)
+            and RESEARCH_WORDS.search(text)
+        ):
+            decision = Decision(True, "rule", 1.0)
+        else:
+            label, confidence = self.classifier.predict(text)
+            bypass = label == RESEARCH_EMAIL and confidence >= self.min_confidence
+            decision = Decision(bypass, "classifier", confidence)
+        kind = "bypassed" if decision.bypass else "supervisor"
+        self.stats[kind] += 1
+        self.stats[f"{kind}_by_{decision.reason}"] += 1
+        return decision
+
+    def record(self, route: str, seconds: float):
+        """
+        Record how long a chat took; ROUTE is ChatMessage.route.
+        """
+        entry = self.latency[ROUTER if route == ROUTER else "supervisor"]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def collect_metrics(self):
+        requests = self.stats["requests"]
+        mean = {
+            kind: total / count if count else None
+            for kind, (count, total) in self.latency.items()
+        }
+        bypass_mean, supervisor_mean = mean.get(ROUTER), mean.get("supervisor")
+        saved = None
+        if bypass_mean is not None and supervisor_mean is not None:
+            saved = self.latency[ROUTER][0] * max(supervisor_mean - bypass_mean, 0.0)
+        return {
+            **self.stats,
+            "bypass_rate": self.stats["bypassed"] / requests if requests else 0.0,
+            "mean_seconds_bypassed": bypass_mean,
+            "mean_seconds_supervisor": supervisor_mean,
+            "estimated_seconds_saved": saved,
+        }
+
+
+AGENTS = ("research_agent", "email_agent")
+
+
+def agent_route(agents) -> str:
+    """
+    ChatMessage.route of a supervisor run: the sub-agents it handed off to,
+    in order, e.g. "research_agent,email_agent".
+    """
+    route = []
+    for agent in agents:
+        if agent in AGENTS and (not route or route[-1] != agent):
+            route.append(agent)
+    return ",".join(route)
+
+
+def supervisor_route(messages) -> str:
+    return agent_route(getattr(message, "name", None) for message in messages)
+
+
+async def load_training_examples(limit=ROUTER_TRAINING_SIZE):
+    """
+    (message, label) pairs from the routes of the latest chats.
+    """
+    query = (
+        select(ChatMessage.message, ChatMessage.route)
+        .where(col(ChatMessage.route).is_not(None))
+        .order_by(col(ChatMessage.created_at).desc())
+        .limit(limit)
+    )
+    async with AsyncSession(engine) as session:
+        rows = (await session.exec(query)).all()
+    return [
+        (message, RESEARCH_EMAIL if route in RESEARCH_EMAIL_ROUTES else OTHER)
+        for message, route in rows
+    ]
+
+
+async def build_pre_router():
+    examples = SEED_EXAMPLES + await load_training_examples()
+    router = PreRouter(CentroidClassifier().fit(examples))
+    metrics.register("router", router.collect_metrics)
+    return router
+
+
+def get_pre_router(request: Request):
+    """
+    Dependency returning the pre-router built at startup, if enabled.
+    """
+    return getattr(request.app.state, "pre_router", None)
+
+
+def is_email_start(name, data) -> bool:
+    return name == "tool_start" and data["tool"] == EMAIL_TOOL
+
+
+async def research_email_pipeline(message: str):
+    """
+    The supervisor's usual research -> email route without its LLM hops, as
+    the (event, data) pairs of api.chat.streaming. Ends with a `final` event,
+    or with a handoff back to the supervisor when the research step flags
+    the request as invalid.
+    """
+    yield "handoff", {"from": ROUTER, "to": "research_agent"}
+    tool = {"agent": "research_agent", "tool": "research_email"}
+    yield "tool_start", {**tool, "input": {"query": message}}
+    email = await generate_email_message(message)
+    if email.invalid_request:
+        yield "handoff", {"from": ROUTER, "to": "supervisor"}
+        return
+    email_content = format_email_message(email)
+    yield "tool_end", {**tool, "output": email_content}
+
+    # langchain_core, see api.ai.agents
+    from api.ai.tools import EMAIL_NOT_QUEUED, send_me_email
+
+    yield "handoff", {"from": "research_agent", "to": "email_agent"}
+    tool = {"agent": "email_agent", "tool": EMAIL_TOOL}
+    arguments = {"subject": email.subject, "content": email.contents}
+    yield "tool_start", {**tool, "input": arguments}
+    result = await send_me_email.ainvoke(arguments)
+    yield "tool_end", {**tool, "output": result}
+
+    if result == EMAIL_NOT_QUEUED:
+        final_message = (
+            f'Researched your request, but could not email "{email.subject}". '
+            "Please try again later."
+        )
+    else:
+        final_message = (
+            f'Researched your request and emailed "{email.subject}". {result}.'
+        )
+    yield "final", ChatResponseSchema(
+        final_message=final_message, email_content=email_content
+    )
+
+
+async def run_research_email_pipeline(message: str):
+    """
+    Run the fixed pipeline and return its ChatResponseSchema, or None when
+    the supervisor has to take over. Failures once the email is being queued
+    are raised instead, so that the supervisor does not send it again.
+    """
+    emailing = False
+    try:
+        async for name, data in research_email_pipeline(message):
+            if name == "final":
+                return data
+            emailing = emailing or is_email_start(name, data)
+    except Exception:
+        if emailing:
+            raise
+        logger.exception("Pre-routed pipeline failed, using the supervisor")
+    return None
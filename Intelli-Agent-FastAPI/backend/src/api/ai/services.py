@@ -1,8 +1,16 @@
+from api.ai.cache import get_email_cache
 from api.ai.llms import get_openai_llm
-from api.ai.schemas import EmailMessageSchema
+from api.ai.schemas import ChatResponseSchema, EmailMessageSchema
 
 
-def generate_email_message(query: str) -> EmailMessageSchema:
+async def generate_email_message(query: str) -> EmailMessageSchema:
+    email_cache = get_email_cache()
+    if email_cache is None:
+        return await compose_email_message(query)
+    return await email_cache.get_or_generate(query, compose_email_message)
+
+
+async def compose_email_message(query: str) -> EmailMessageSchema:
     llm_base = get_openai_llm()
     llm = llm_base.with_structured_output(EmailMessageSchema)
 
@@ -13,4 +21,27 @@ def generate_email_message(query: str) -> EmailMessageSchema:
         ),
         ("human", f"{query}. Do not use markdown in your response only plaintext"),
     ]
-    return llm.invoke(messages)
+    return await llm.ainvoke(messages)
+
+
+def format_email_message(response: EmailMessageSchema) -> str:
+    return f"Subject {response.subject}:\nBody: {response.contents}"
+
+
+def build_chat_response(messages) -> ChatResponseSchema:
+    """
+    Final supervisor message plus the research agent's last answer, from the
+    messages of a finished supervisor run.
+    """
+    final_message_content = messages[-1].content
+
+    email_content_str = None
+    for message in reversed(messages):
+        if message.name == "research_agent":
+            if message.content and not message.tool_calls:
+                email_content_str = message.content
+                break
+
+    return ChatResponseSchema(
+        final_message=final_message_content, email_content=email_content_str
+    )
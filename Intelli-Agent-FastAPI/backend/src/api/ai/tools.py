@@ -1,11 +1,17 @@
+import logging
+
 from langchain_core.tools import tool
 
-from api.emailer.sender import send_mail
-from api.ai.services import generate_email_message
+from api.emailer.outbox import enqueue_email
+from api.ai.services import format_email_message, generate_email_message
+
+logger = logging.getLogger(__name__)
+
+EMAIL_NOT_QUEUED = "Email not successfully queued"
 
 
 @tool
-def send_me_email(subject: str, content: str) -> str:
+async def send_me_email(subject: str, content: str) -> str:
     """
     Send an email to myself with a subject and content.
 
@@ -13,21 +19,22 @@ def send_me_email(subject: str, content: str) -> str:
     - subject: str - Text subject of the email
     - content: str - Text body content of the email
     """
+    # Queued in the outbox; the background sender delivers it.
     try:
-        send_mail(subject=subject, content=content)
-    except:
-        return "Email not successfully sent"
-    return "Email successfully sent"
+        email_id = await enqueue_email(subject=subject, content=content)
+    except Exception:
+        logger.exception("Could not queue email")
+        return EMAIL_NOT_QUEUED
+    return f"Email queued for sending (id {email_id})"
 
 
 @tool
-def research_email(query: str):
+async def research_email(query: str):
     """
     Perform research based on the query
 
     Arguments:
     - query: str - Topic of research
     """
-    response = generate_email_message(query=query)
-    msg = f"Subject {response.subject}:\nBody: {response.content}"
-    return msg
+    response = await generate_email_message(query=query)
+    return format_email_message(response)
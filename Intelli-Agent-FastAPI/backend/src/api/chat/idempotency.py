@@ -0,0 +1,172 @@
+"""
+Idempotent execution of chat requests.
+
+The first request with a key claims an `IdempotencyRecord` and runs. Repeats
+get its stored result, and concurrent repeats wait for the first run instead
+of starting another. A run holds its claim for IDEMPOTENCY_LEASE seconds, so a
+crashed worker's claim runs out. Completed results replay for TTL seconds
+after the run finishes, so duplicates that waited on a long run still get its
+result. Failed runs release the key straight away.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from datetime import timedelta
+
+from sqlalchemy import delete, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.chat.models import IdempotencyRecord, get_utc_now
+from api.db import engine
+
+# Replay window of requests sent with an Idempotency-Key header.
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL") or 86400)
+# Keyless requests with the same payload within this window are duplicates.
+IDEMPOTENCY_WINDOW = float(os.environ.get("IDEMPOTENCY_WINDOW") or 10)
+IDEMPOTENCY_LEASE = float(os.environ.get("IDEMPOTENCY_LEASE") or 600)
+# How long a duplicate waits for the first run before giving up with a 409.
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.environ.get("IDEMPOTENCY_WAIT_TIMEOUT") or 300)
+IDEMPOTENCY_POLL_INTERVAL = 0.5
+
+# key -> event set when a run of this process finishes, to wake local waiters
+# without waiting for the next poll.
+_finished = {}
+
+
+class IdempotencyKeyReused(Exception):
+    pass
+
+
+class RequestInProgress(Exception):
+    pass
+
+
+def request_hash(payload: dict) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def derived_key(payload: dict) -> str:
+    return f"auto:{request_hash(payload)}"
+
+
+async def claim(key, payload_hash):
+    """
+    Claim KEY for a new run. Returns None when claimed, else the record of
+    the run holding it.
+    """
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        while True:
+            now = get_utc_now()
+            lease = now + timedelta(seconds=IDEMPOTENCY_LEASE)
+            session.add(
+                IdempotencyRecord(
+                    key=key, request_hash=payload_hash, created_at=now, expires_at=lease
+                )
+            )
+            try:
+                await session.commit()
+                return None
+            except IntegrityError:
+                await session.rollback()
+
+            # Take over an expired or failed record.
+            result = await session.exec(
+                update(IdempotencyRecord)
+                .where(IdempotencyRecord.key == key)
+                .where(IdempotencyRecord.expires_at <= now)
+                .values(
+                    request_hash=payload_hash,
+                    status="running",
+                    response=None,
+                    created_at=now,
+                    expires_at=lease,
+                )
+            )
+            await session.commit()
+            if result.rowcount == 1:
+                return None
+            record = await session.get(IdempotencyRecord, key)
+            if record is not None:
+                return record
+            # Another request's finish() deleted the expired record since the
+            # insert failed: try again.
+
+
+async def finish(key, ttl, response=None):
+    """
+    Store the result of a run (RESPONSE as JSON), or release the key when
+    RESPONSE is None, and wake local waiters.
+    """
+    now = get_utc_now()
+    if response is None:
+        values = {"status": "failed", "expires_at": now}
+    else:
+        expires_at = now + timedelta(seconds=ttl)
+        values = {"status": "completed", "response": response, "expires_at": expires_at}
+    async with AsyncSession(engine) as session:
+        await session.exec(
+            update(IdempotencyRecord)
+            .where(IdempotencyRecord.key == key)
+            .values(**values)
+        )
+        # Expired records no longer deduplicate anything.
+        await session.exec(
+            delete(IdempotencyRecord)
+            .where(col(IdempotencyRecord.expires_at) < now)
+            .where(IdempotencyRecord.key != key)
+        )
+        await session.commit()
+    event = _finished.pop(key, None)
+    if event is not None:
+        event.set()
+
+
+async def acquire(key, payload: dict):
+    """
+    Wait until KEY is claimed for a new run, or its first run has completed.
+    Returns None when claimed (call `finish` once done), else the response
+    JSON of the first run. Raises IdempotencyKeyReused when KEY was used for
+    a different payload, and RequestInProgress when the first run outlasts
+    IDEMPOTENCY_WAIT_TIMEOUT.
+    """
+    payload_hash = request_hash(payload)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        record = await claim(key, payload_hash)
+        if record is None:
+            _finished.setdefault(key, asyncio.Event())
+            return None
+        if record.request_hash != payload_hash:
+            raise IdempotencyKeyReused(key)
+        if record.status == "completed":
+            return record.response
+        if loop.time() >= deadline:
+            raise RequestInProgress(key)
+        event = _finished.setdefault(key, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), IDEMPOTENCY_POLL_INTERVAL)
+        except TimeoutError:
+            pass
+
+
+async def run_once(key, payload: dict, run, ttl=IDEMPOTENCY_TTL):
+    """
+    Run `await run()` once for KEY and return (response JSON, replayed).
+    `run` returns a pydantic model. Raises like `acquire`.
+    """
+    response = await acquire(key, payload)
+    if response is not None:
+        return response, True
+    try:
+        response = (await run()).model_dump_json()
+    except BaseException:
+        # Also on cancellation (client gone): let the next request retry.
+        await asyncio.shield(finish(key, ttl))
+        raise
+    await finish(key, ttl, response)
+    return response, False
@@ -0,0 +1,265 @@
+"""
+Background jobs for chats.
+
+`enqueue_job` stores the chat message and a `ChatJob` and returns straight
+away. Workers (`python -m api.chat.jobs`, in as many processes as needed)
+claim due jobs with `FOR UPDATE SKIP LOCKED` and run at most JOB_CONCURRENCY
+of them at a time each. They write each job's progress to the `chatjobevent`
+table, which `job_events` streams back to clients. A running job holds a
+lease that its worker renews. If the worker dies, the lease runs out and
+another worker runs the job again, up to JOB_MAX_ATTEMPTS claims.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from contextlib import aclosing
+from datetime import timedelta
+
+from sqlalchemy import update
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.ai.agents import build_supervisor
+from api.ai.router import ROUTER_ENABLED, build_pre_router
+from api.ai.schemas import ChatResponseSchema
+from api.chat.models import (
+    ChatJob,
+    ChatJobEvent,
+    ChatJobRead,
+    ChatMessage,
+    get_utc_now,
+)
+from api.chat.services import save_chat_response
+from api.chat.streaming import chat_events, format_sse
+from api.config import validate_settings
+from api.db import engine
+
+logger = logging.getLogger(__name__)
+
+# Jobs run at once by each worker process. With OPENAI_REQUESTS_PER_SECOND,
+# this keeps the workers within the LLM rate limit.
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY") or 4)
+JOB_LEASE = float(os.environ.get("JOB_LEASE") or 120)
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS") or 3)
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL") or 1)
+JOB_EVENTS_POLL_INTERVAL = float(os.environ.get("JOB_EVENTS_POLL_INTERVAL") or 0.5)
+
+FINISHED = ("completed", "failed")
+
+
+async def enqueue_job(message: str) -> ChatJob:
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        chat_message = ChatMessage(message=message)
+        session.add(chat_message)
+        await session.flush()
+        job = ChatJob(chat_message_id=chat_message.id, message=message)
+        session.add(job)
+        await session.commit()
+    return job
+
+
+def read_job(job: ChatJob) -> ChatJobRead:
+    data = job.model_dump()
+    if job.response is not None:
+        data["response"] = ChatResponseSchema.model_validate_json(job.response)
+    return ChatJobRead.model_validate(data)
+
+
+async def add_event(job_id: int, event: str, data: dict):
+    async with AsyncSession(engine) as session:
+        session.add(
+            ChatJobEvent(job_id=job_id, event=event, data=json.dumps(data, default=str))
+        )
+        await session.commit()
+
+
+async def job_events(job_id: int, request, after: int = 0):
+    """
+    Server-sent events of a job after event id AFTER, until the job has
+    finished. Each event carries its id, so clients resume with
+    Last-Event-ID.
+    """
+    while True:
+        async with AsyncSession(engine) as session:
+            # Status first: the events of a finished job are all written.
+            job = await session.get(ChatJob, job_id)
+            query = (
+                select(ChatJobEvent)
+                .where(ChatJobEvent.job_id == job_id)
+                .where(col(ChatJobEvent.id) > after)
+                .order_by(col(ChatJobEvent.id))
+            )
+            events = (await session.exec(query)).all()
+        for event in events:
+            after = event.id
+            yield format_sse(event.event, json.loads(event.data), event.id)
+        if job is None or job.status in FINISHED:
+            return
+        if await request.is_disconnected():
+            return
+        if not events:
+            await asyncio.sleep(JOB_EVENTS_POLL_INTERVAL)
+
+
+class JobWorker:
+    def __init__(self, concurrency=JOB_CONCURRENCY):
+        self.concurrency = concurrency
+        self.supervisor = None
+        self.pre_router = None
+        self.running = set()
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    async def stop(self):
+        tasks = [task for task in (self.task, *self.running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self):
+        self.supervisor = await asyncio.to_thread(build_supervisor)
+        self.pre_router = await build_pre_router() if ROUTER_ENABLED else None
+        slots = asyncio.Semaphore(self.concurrency)
+        while True:
+            await slots.acquire()
+            try:
+                job = await self.claim_job()
+            except Exception:
+                logger.exception("Claiming a chat job failed")
+                job = None
+            if job is None:
+                slots.release()
+                await asyncio.sleep(JOB_POLL_INTERVAL)
+                continue
+            task = asyncio.create_task(self.process(job))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+            task.add_done_callback(lambda _: slots.release())
+
+    async def claim_job(self):
+        now = get_utc_now()
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            # Give up on jobs whose workers keep dying.
+            await session.exec(
+                update(ChatJob)
+                .where(ChatJob.status == "running")
+                .where(ChatJob.next_attempt_at <= now)
+                .where(ChatJob.attempts >= JOB_MAX_ATTEMPTS)
+                .values(status="failed", error="Lease expired", finished_at=now)
+            )
+            due = (
+                select(ChatJob.id)
+                .where(col(ChatJob.status).in_(("queued", "running")))
+                .where(ChatJob.next_attempt_at <= now)
+                .order_by(col(ChatJob.next_attempt_at))
+                .limit(1)
+                .with_for_update(skip_locked=True)
+            )
+            job_id = (await session.exec(due)).first()
+            if job_id is not None:
+                await session.exec(
+                    update(ChatJob)
+                    .where(ChatJob.id == job_id)
+                    .values(
+                        status="running",
+                        attempts=ChatJob.attempts + 1,
+                        next_attempt_at=now + timedelta(seconds=JOB_LEASE),
+                        started_at=now,
+                    )
+                )
+            job = await session.get(ChatJob, job_id) if job_id is not None else None
+            await session.commit()
+        return job
+
+    async def update_claimed(self, job, **values):
+        """
+        Update JOB if this worker's claim still holds. Returns whether it did.
+        """
+        async with AsyncSession(engine) as session:
+            result = await session.exec(
+                update(ChatJob)
+                .where(ChatJob.id == job.id)
+                .where(ChatJob.status == "running")
+                .where(ChatJob.attempts == job.attempts)
+                .values(**values)
+            )
+            await session.commit()
+        return result.rowcount == 1
+
+    async def renew_lease(self, job):
+        while True:
+            await asyncio.sleep(JOB_LEASE / 3)
+            lease = get_utc_now() + timedelta(seconds=JOB_LEASE)
+            await self.update_claimed(job, next_attempt_at=lease)
+
+    async def process(self, job):
+        started = time.perf_counter()
+        heartbeat = asyncio.create_task(self.renew_lease(job))
+        inputs = {"messages": [{"role": "user", "content": job.message}]}
+        bypass = (
+            self.pre_router is not None and self.pre_router.route(job.message).bypass
+        )
+        response = None
+
+        async def on_final(chat_response, route):
+            await save_chat_response(job.chat_message_id, chat_response, route)
+            if self.pre_router is not None:
+                self.pre_router.record(route, time.perf_counter() - started)
+
+        try:
+            await add_event(
+                job.id, "status", {"status": "running", "attempt": job.attempts}
+            )
+            events = chat_events(self.supervisor, inputs, bypass, on_final)
+            async with aclosing(events):
+                async for name, data in events:
+                    if name == "token":
+                        continue  # one row per token is not worth it
+                    if name == "final":
+                        response = data
+                        data = data.model_dump()
+                    await add_event(job.id, name, data)
+            if response is None:
+                raise RuntimeError("Error with supervisor")
+        except asyncio.CancelledError:
+            # Worker shutting down: hand the job back without using up a claim.
+            values = {"status": "queued", "attempts": job.attempts - 1}
+            await asyncio.shield(
+                self.update_claimed(job, next_attempt_at=get_utc_now(), **values)
+            )
+            raise
+        except Exception as error:
+            logger.exception("Chat job %s failed", job.id)
+            await add_event(job.id, "error", {"detail": "Error with supervisor"})
+            values = {"status": "failed", "error": repr(error)}
+        else:
+            values = {"status": "completed", "response": response.model_dump_json()}
+        finally:
+            heartbeat.cancel()
+        if not await self.update_claimed(job, finished_at=get_utc_now(), **values):
+            logger.warning("Chat job %s lost its lease before finishing", job.id)
+
+
+async def run_worker():
+    validate_settings()
+    worker = JobWorker().start()
+    # `docker stop` sends SIGTERM: hand running jobs back before exiting.
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, worker.task.cancel)
+    try:
+        await worker.task
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await worker.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_worker())
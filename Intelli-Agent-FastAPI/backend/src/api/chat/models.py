@@ -1,9 +1,11 @@
-from sqlmodel import SQLModel, Field, DateTime
+from sqlmodel import SQLModel, Field, DateTime, Index
 from datetime import datetime, timezone
 
+from api.ai.schemas import ChatResponseSchema
+
 
 def get_utc_now():
-    return datetime.now().replace(tzinfo=timezone.utc)
+    return datetime.now(timezone.utc)
 
 
 class ChatMessagePayload(SQLModel):
@@ -11,8 +13,16 @@ class ChatMessagePayload(SQLModel):
 
 
 class ChatMessage(SQLModel, table=True):
+    # History is read newest first and paged by (created_at, id).
+    __table_args__ = (Index("ix_chatmessage_created_at_id", "created_at", "id"),)
+
     id: int | None = Field(default=None, primary_key=True)
     message: str
+    final_message: str | None = Field(default=None)
+    email_content: str | None = Field(default=None)
+    # "router" when the pre-router answered, else the agents the supervisor
+    # handed off to, in order (e.g. "research_agent,email_agent").
+    route: str | None = Field(default=None)
     created_at: datetime = Field(
         default_factory=get_utc_now,
         sa_type=DateTime(timezone=True),
@@ -24,4 +34,84 @@ class ChatMessage(SQLModel, table=True):
 class ChatMessageListItem(SQLModel):
     id: int | None = Field(default=None)
     message: str
+    final_message: str | None = Field(default=None)
+    email_content: str | None = Field(default=None)
     created_at: datetime = Field(default=None)
+
+
+class IdempotencyRecord(SQLModel, table=True):
+    # Idempotency-Key header, or "auto:<payload hash>" for keyless requests.
+    key: str = Field(primary_key=True, max_length=255)
+    request_hash: str = Field(max_length=64)
+    # running -> completed | failed
+    status: str = Field(default="running")
+    # ChatResponseSchema as JSON once completed.
+    response: str | None = Field(default=None)
+    created_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+    )
+    # Until when the record holds: the lease of a running request, then the
+    # replay window. Past it, the next request with the key runs again.
+    expires_at: datetime = Field(
+        sa_type=DateTime(timezone=True), nullable=False, index=True
+    )
+
+
+class ChatJob(SQLModel, table=True):
+    # Workers claim due jobs by (status, next_attempt_at).
+    __table_args__ = (
+        Index("ix_chatjob_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    chat_message_id: int = Field(foreign_key="chatmessage.id")
+    message: str
+    # queued -> running -> completed | failed
+    status: str = Field(default="queued")
+    # Claims so far; a worker only writes results while this is still its own.
+    attempts: int = Field(default=0)
+    # ChatResponseSchema as JSON once completed.
+    response: str | None = Field(default=None)
+    error: str | None = Field(default=None)
+    # When the job may be picked up: now while queued, the lease expiry while
+    # running (renewed by the worker, so a crashed worker's claim runs out).
+    next_attempt_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+    )
+    created_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+    )
+    started_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+    finished_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
+
+
+class ChatJobEvent(SQLModel, table=True):
+    # Progress of a job, read back in id order by the events stream.
+    id: int | None = Field(default=None, primary_key=True)
+    job_id: int = Field(foreign_key="chatjob.id", index=True)
+    event: str
+    # JSON data of the server-sent event.
+    data: str
+    created_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+    )
+
+
+class ChatJobRead(SQLModel):
+    id: int
+    chat_message_id: int
+    status: str
+    attempts: int = Field(default=0)
+    response: ChatResponseSchema | None = Field(default=None)
+    error: str | None = Field(default=None)
+    created_at: datetime
+    started_at: datetime | None = Field(default=None)
+    finished_at: datetime | None = Field(default=None)
@@ -1,61 +1,276 @@
-from fastapi import APIRouter, Depends, HTTPException
-from api.chat.models import ChatMessage, ChatMessagePayload, ChatMessageListItem
+import asyncio
+import time
+from contextlib import contextmanager
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from api.chat.models import (
+    ChatJob,
+    ChatJobRead,
+    ChatMessage,
+    ChatMessagePayload,
+    ChatMessageListItem,
+)
 from api.db import get_session
-from sqlmodel import Session, select
+from sqlalchemy import tuple_
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
-from api.ai.services import generate_email_message
+from api.ai.services import build_chat_response, generate_email_message
 from api.ai.schemas import (
     EmailMessageSchema,
     SupervisorMessageSchema,
     ChatResponseSchema,
 )
-from api.ai.agents import get_supervisor
+from api.ai.agents import get_shared_supervisor
+from api.ai.router import (
+    ROUTER,
+    get_pre_router,
+    run_research_email_pipeline,
+    supervisor_route,
+)
+from api.chat.idempotency import (
+    IDEMPOTENCY_TTL,
+    IDEMPOTENCY_WINDOW,
+    IdempotencyKeyReused,
+    RequestInProgress,
+    acquire,
+    derived_key,
+    finish,
+    run_once,
+)
+from api.chat.jobs import enqueue_job, job_events, read_job
+from api.chat.services import save_chat_response
+from api.chat.streaming import format_sse, stream_chat_events
 
 router = APIRouter()
 
 
 # /api/chats/
 @router.get("/")
-def chat_health():
+async def chat_health():
     return {"status": "ok"}
 
 
 @router.get("/recent/", response_model=List[ChatMessageListItem])
-def chat_list_messages(session: Session = Depends(get_session)):
-    query = select(ChatMessage)
-    result = session.exec(query).fetchall()[:10]
+async def chat_list_messages(
+    before: int | None = None,
+    limit: int = Query(default=10, ge=1, le=100),
+    session: AsyncSession = Depends(get_session),
+):
+    # Newest first, paged by keyset on the (created_at, id) index: pass the id
+    # of the last message of a page as `before` to get the next page.
+    query = (
+        select(ChatMessage)
+        .order_by(col(ChatMessage.created_at).desc(), col(ChatMessage.id).desc())
+        .limit(limit)
+    )
+    if before is not None:
+        before_created_at = (
+            select(ChatMessage.created_at)
+            .where(ChatMessage.id == before)
+            .scalar_subquery()
+        )
+        query = query.where(
+            tuple_(ChatMessage.created_at, ChatMessage.id)
+            < tuple_(before_created_at, before)
+        )
+    result = (await session.exec(query)).all()
     return result
 
 
+def idempotency_key_and_ttl(idempotency_key, data: dict):
+    """
+    Key of the Idempotency-Key header. Keyless requests are deduplicated on
+    their payload for a short window.
+    """
+    if idempotency_key:
+        return idempotency_key, IDEMPOTENCY_TTL
+    return derived_key(data), IDEMPOTENCY_WINDOW
+
+
+@contextmanager
+def idempotency_errors():
+    try:
+        yield
+    except IdempotencyKeyReused:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for a different request",
+        )
+    except RequestInProgress:
+        raise HTTPException(
+            status_code=409,
+            detail="A request with this Idempotency-Key is still in progress",
+            headers={"Retry-After": "5"},
+        )
+
+
+async def run_idempotent(idempotency_key, data: dict, run, response: Response):
+    """
+    `run_once` keyed by the Idempotency-Key header, see idempotency_key_and_ttl.
+    """
+    key, ttl = idempotency_key_and_ttl(idempotency_key, data)
+    with idempotency_errors():
+        result, replayed = await run_once(key, data, run, ttl)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+
+async def stream_once(events, key, ttl, results):
+    """
+    Stream EVENTS under the claim of KEY, then store the final response for
+    repeats of the request (or release KEY when the run has none).
+    """
+    try:
+        async for message in events:
+            yield message
+    finally:
+        response = results[-1] if results else None
+        await asyncio.shield(finish(key, ttl, response))
+
+
 @router.post("/", response_model=ChatResponseSchema)
-def chat_create_message(
-    payload: ChatMessagePayload, session: Session = Depends(get_session)
+async def chat_create_message(
+    payload: ChatMessagePayload,
+    response: Response,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    session: AsyncSession = Depends(get_session),
+    supe=Depends(get_shared_supervisor),
+    pre_router=Depends(get_pre_router),
 ):
     data = payload.model_dump()  # pydantic -> dict
-    obj = ChatMessage.model_validate(data)
-    session.add(obj)
-    session.commit()
-    supe = get_supervisor()
+
+    async def run():
+        started = time.perf_counter()
+        obj = ChatMessage.model_validate(data)
+        session.add(obj)
+        await session.commit()
+        chat_response = None
+        if pre_router is not None and pre_router.route(payload.message).bypass:
+            chat_response = await run_research_email_pipeline(payload.message)
+            route = ROUTER
+        if chat_response is None:
+            msg_data = {
+                "messages": [
+                    {"role": "user", "content": f"{payload.message}"},
+                ]
+            }
+            result = await supe.ainvoke(msg_data)
+            if not result:
+                raise HTTPException(status_code=400, detail="Error with supervisor")
+            messages = result.get("messages")
+            if not messages:
+                raise HTTPException(status_code=400, detail="Error with supervisor")
+            chat_response = build_chat_response(messages)
+            route = supervisor_route(messages)
+        # Keep the answer with the prompt so history never re-runs the agents.
+        obj.final_message = chat_response.final_message
+        obj.email_content = chat_response.email_content
+        obj.route = route
+        session.add(obj)
+        if pre_router is not None:
+            pre_router.record(route, time.perf_counter() - started)
+        await session.commit()
+        return chat_response
+
+    # Repeats of a request (retries, double clicks) replay the first result.
+    result = await run_idempotent(idempotency_key, data, run, response)
+    return ChatResponseSchema.model_validate_json(result)
+
+
+@router.post("/stream")
+async def chat_stream_message(
+    payload: ChatMessagePayload,
+    request: Request,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+    session: AsyncSession = Depends(get_session),
+    supe=Depends(get_shared_supervisor),
+    pre_router=Depends(get_pre_router),
+):
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    # Repeats (double clicks, retries) wait for the first run and get its
+    # final event instead of running the agents, and sending the email, again.
+    data = {**payload.model_dump(), "mode": "stream"}
+    key, ttl = idempotency_key_and_ttl(idempotency_key, data)
+    with idempotency_errors():
+        replay = await acquire(key, data)
+    if replay is not None:
+        final = ChatResponseSchema.model_validate_json(replay).model_dump()
+        return StreamingResponse(
+            iter([format_sse("final", final)]),
+            media_type="text/event-stream",
+            headers={**headers, "Idempotent-Replayed": "true"},
+        )
+
+    started = time.perf_counter()
+    try:
+        obj = ChatMessage.model_validate(payload.model_dump())
+        session.add(obj)
+        await session.commit()
+    except BaseException:
+        await asyncio.shield(finish(key, ttl))
+        raise
+    chat_message_id = obj.id
     msg_data = {
         "messages": [
             {"role": "user", "content": f"{payload.message}"},
         ]
     }
-    result = supe.invoke(msg_data)
-    if not result:
-        raise HTTPException(status_code=400, detail="Error with supervisor")
-    messages = result.get("messages")
-    if not messages:
-        raise HTTPException(status_code=400, detail="Error with supervisor")
-    final_message_content = messages[-1].content
-
-    email_content_str = None
-    for message in reversed(messages):
-        if message.name == "research_agent":
-            if message.content and not message.tool_calls:
-                email_content_str = message.content
-                break
-
-    return ChatResponseSchema(
-        final_message=final_message_content, email_content=email_content_str
+    bypass = pre_router is not None and pre_router.route(payload.message).bypass
+    results = []
+
+    async def on_final(chat_response, route):
+        await save_chat_response(chat_message_id, chat_response, route)
+        results.append(chat_response.model_dump_json())
+        if pre_router is not None:
+            pre_router.record(route, time.perf_counter() - started)
+
+    events = stream_chat_events(supe, msg_data, request, bypass, on_final)
+    return StreamingResponse(
+        stream_once(events, key, ttl, results),
+        media_type="text/event-stream",
+        headers=headers,
+    )
+
+
+@router.post("/jobs", response_model=ChatJobRead, status_code=202)
+async def chat_create_job(
+    payload: ChatMessagePayload,
+    response: Response,
+    idempotency_key: str | None = Header(default=None, max_length=255),
+):
+    # Queue the chat for a worker (python -m api.chat.jobs) and return its id
+    # at once; poll GET /jobs/{id} or follow GET /jobs/{id}/events.
+    data = {**payload.model_dump(), "mode": "job"}
+
+    async def run():
+        return read_job(await enqueue_job(payload.message))
+
+    result = await run_idempotent(idempotency_key, data, run, response)
+    return ChatJobRead.model_validate_json(result)
+
+
+@router.get("/jobs/{job_id}", response_model=ChatJobRead)
+async def chat_get_job(job_id: int, session: AsyncSession = Depends(get_session)):
+    job = await session.get(ChatJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return read_job(job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def chat_job_events(
+    job_id: int,
+    request: Request,
+    after: int = 0,
+    last_event_id: int | None = Header(default=None),
+    session: AsyncSession = Depends(get_session),
+):
+    if await session.get(ChatJob, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(
+        job_events(job_id, request, last_event_id or after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
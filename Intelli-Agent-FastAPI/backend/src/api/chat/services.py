@@ -0,0 +1,19 @@
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.ai.schemas import ChatResponseSchema
+from api.chat.models import ChatMessage
+from api.db import engine
+
+
+async def save_chat_response(
+    chat_message_id: int, response: ChatResponseSchema, route: str | None = None
+):
+    async with AsyncSession(engine) as session:
+        obj = await session.get(ChatMessage, chat_message_id)
+        if obj is None:
+            return
+        obj.final_message = response.final_message
+        obj.email_content = response.email_content
+        obj.route = route
+        session.add(obj)
+        await session.commit()
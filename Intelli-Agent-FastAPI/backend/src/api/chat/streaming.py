@@ -0,0 +1,155 @@
+import json
+import logging
+
+from api.ai.router import (
+    ROUTER,
+    agent_route,
+    is_email_start,
+    research_email_pipeline,
+)
+from api.ai.services import build_chat_response
+
+logger = logging.getLogger(__name__)
+
+HANDOFF_PREFIX = "transfer_to_"
+
+
+def format_sse(event: str, data: dict, event_id=None) -> str:
+    message = f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n{message}"
+    return message
+
+
+def event_agent(event) -> str:
+    # Sub-agent events run under a "<agent>:<task id>|..." checkpoint namespace.
+    namespace = event["metadata"].get("langgraph_checkpoint_ns") or ""
+    return namespace.split(":", 1)[0] or "supervisor"
+
+
+def translate_event(event):
+    """
+    Turn one `astream_events` (v2) event into the (event, data) pairs sent to
+    the client: `handoff`, `token`, `tool_start`, `tool_end` and `final` (with
+    the ChatResponseSchema of the run).
+    """
+    kind = event["event"]
+    data = event["data"]
+
+    if kind == "on_chat_model_stream":
+        content = data["chunk"].content
+        if content and isinstance(content, str):
+            token = {
+                "agent": event_agent(event),
+                "content": content,
+                # Tokens of model calls made by a tool, such as the structured
+                # email drafted inside research_email.
+                "in_tool": event["metadata"].get("langgraph_node") == "tools",
+            }
+            yield "token", token
+
+    elif kind in ("on_tool_start", "on_tool_end"):
+        name = event["name"]
+        if name.startswith(HANDOFF_PREFIX):
+            if kind == "on_tool_end":
+                handoff = {
+                    "from": event_agent(event),
+                    "to": name[len(HANDOFF_PREFIX) :],
+                }
+                yield "handoff", handoff
+        elif kind == "on_tool_start":
+            tool = {
+                "agent": event_agent(event),
+                "tool": name,
+                "input": data.get("input"),
+            }
+            yield "tool_start", tool
+        else:
+            output = data.get("output")
+            tool = {
+                "agent": event_agent(event),
+                "tool": name,
+                "output": getattr(output, "content", output),
+            }
+            yield "tool_end", tool
+
+    elif not event["parent_ids"]:
+        # Events of the supervisor graph itself.
+        if kind == "on_chain_stream":
+            for node in data["chunk"]:
+                if node != "supervisor":
+                    yield "handoff", {"from": node, "to": "supervisor"}
+        elif kind == "on_chain_end":
+            messages = (data.get("output") or {}).get("messages")
+            if not messages:
+                yield "error", {"detail": "Error with supervisor"}
+            else:
+                yield "final", build_chat_response(messages)
+
+
+async def chat_events(supe, inputs, bypass=False, on_final=None):
+    """
+    Run a chat and yield its progress as the (event, data) pairs of
+    translate_event, awaiting `on_final(response, route)` before the final
+    event. When BYPASS is set, the pre-router's research -> email pipeline
+    runs first, and the supervisor only if the pipeline hands the request
+    back before sending the email. Closing this generator cancels the run.
+    """
+    if bypass:
+        message = inputs["messages"][-1]["content"]
+        pipeline = research_email_pipeline(message)
+        final = None
+        emailing = False
+        try:
+            async for name, data in pipeline:
+                if name == "final":
+                    final = data
+                    break
+                emailing = emailing or is_email_start(name, data)
+                yield name, data
+        except Exception:
+            # Only fall back before the email is queued.
+            if emailing:
+                raise
+            logger.exception("Pre-routed pipeline failed, using the supervisor")
+        finally:
+            await pipeline.aclose()
+        if final is not None:
+            if on_final is not None:
+                await on_final(final, ROUTER)
+            yield "final", final
+            return
+
+    agents = []
+    events = supe.astream_events(inputs, version="v2")
+    try:
+        async for event in events:
+            for name, data in translate_event(event):
+                if name == "handoff":
+                    agents.append(data["to"])
+                elif name == "final" and on_final is not None:
+                    await on_final(data, agent_route(agents))
+                yield name, data
+    finally:
+        await events.aclose()
+
+
+async def stream_chat_events(supe, inputs, request, bypass=False, on_final=None):
+    """
+    chat_events as server-sent events. The run is cancelled as soon as the
+    client goes away: Starlette cancels this generator on disconnect, and
+    closing `astream_events` cancels the graph.
+    """
+    events = chat_events(supe, inputs, bypass, on_final)
+    try:
+        async for name, data in events:
+            if await request.is_disconnected():
+                break
+            if name == "final":
+                data = data.model_dump()
+            yield format_sse(name, data)
+    except Exception:
+        logger.exception("Supervisor stream failed")
+        yield format_sse("error", {"detail": "Error with supervisor"})
+    finally:
+        await events.aclose()
@@ -0,0 +1,33 @@
+"""
+Startup check of the settings read from the environment.
+
+Modules read their settings when imported but do not fail there, so the app
+can be imported (by tools, tests and benchmarks) without a full
+environment. The app's lifespan and the worker entry points call
+`validate_settings` instead, which reports every problem at once.
+"""
+
+import os
+
+from api.ai.cache import EMAIL_CACHE_BACKEND, EMAIL_CACHE_BACKENDS
+from api.db import DATABASE_URL
+from api.emailer.sender import EMAIL_ADDRESS
+
+AI_WARM_UP = os.environ.get("AI_WARM_UP") or "startup"
+
+
+def validate_settings():
+    problems = []
+    if not DATABASE_URL:
+        problems.append("`DATABASE_URL` needs to be set.")
+    if not os.environ.get("OPENAI_API_KEY"):
+        problems.append("`OPENAI_API_KEY` needs to be set.")
+    if not EMAIL_ADDRESS:
+        problems.append("`EMAIL_ADDRESS` needs to be set.")
+    if EMAIL_CACHE_BACKEND not in EMAIL_CACHE_BACKENDS:
+        backends = ", ".join(EMAIL_CACHE_BACKENDS)
+        problems.append(f"`EMAIL_CACHE_BACKEND` must be one of {backends}.")
+    if AI_WARM_UP not in ("startup", "background"):
+        problems.append("`AI_WARM_UP` must be startup or background.")
+    if problems:
+        raise RuntimeError(" ".join(problems))
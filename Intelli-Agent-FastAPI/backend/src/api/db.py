@@ -1,23 +1,33 @@
 import os
-import sqlmodel
-
-from sqlmodel import Session, SQLModel
 
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
-
-if DATABASE_URL == "":
-    raise NotImplementedError("`DATABASE_URL` needs to be set.")
-
-print(DATABASE_URL)
-engine = sqlmodel.create_engine(DATABASE_URL)
-
-
-def init_db():
-    print("creating database tables...")
-    SQLModel.metadata.create_all(engine)
-
-
-def get_session():
-    with Session(engine) as session:
+DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE") or 10)
+DATABASE_MAX_OVERFLOW = int(os.environ.get("DATABASE_MAX_OVERFLOW") or 20)
+DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT") or 30)
+
+if DATABASE_URL and DATABASE_URL.startswith("postgresql://"):
+    # psycopg 3 serves both the sync and the async engine.
+    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg://", 1)
+
+# Sessions only hold a connection for the length of a transaction, not for
+# the agent run, so a small pool serves many in-flight chats. pre_ping drops
+# connections closed by the server (restarts, idle timeouts) before use.
+# Without DATABASE_URL there is no engine; api.config.validate_settings stops
+# the app at startup.
+engine = None
+if DATABASE_URL:
+    engine = create_async_engine(
+        DATABASE_URL,
+        pool_size=DATABASE_POOL_SIZE,
+        max_overflow=DATABASE_MAX_OVERFLOW,
+        pool_timeout=DATABASE_POOL_TIMEOUT,
+        pool_pre_ping=True,
+    )
+
+
+async def get_session():
+    async with AsyncSession(engine, expire_on_commit=False) as session:
         yield session
@@ -0,0 +1,34 @@
+from sqlmodel import SQLModel, Field, DateTime, Index
+from datetime import datetime
+
+from api.chat.models import get_utc_now
+
+
+class OutboxEmail(SQLModel, table=True):
+    # Senders claim due rows by (status, next_attempt_at).
+    __table_args__ = (
+        Index("ix_outboxemail_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    to_email: str
+    from_email: str
+    subject: str
+    content: str
+    # queued -> sending -> sent, or back to queued until failed.
+    status: str = Field(default="queued")
+    attempts: int = Field(default=0)
+    last_error: str | None = Field(default=None)
+    # When the email may next be picked up: the retry time while queued and
+    # the lease expiry while sending (a crashed sender's claim runs out).
+    next_attempt_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+    )
+    created_at: datetime = Field(
+        default_factory=get_utc_now,
+        sa_type=DateTime(timezone=True),
+        nullable=False,
+    )
+    sent_at: datetime | None = Field(default=None, sa_type=DateTime(timezone=True))
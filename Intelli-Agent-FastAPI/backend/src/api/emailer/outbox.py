@@ -0,0 +1,257 @@
+"""
+Durable outbox for outgoing email.
+
+`enqueue_email` stores the email and returns its id straight away. An
+`OutboxSender`, started in the app's lifespan (or on its own with
+`python -m api.emailer.outbox`), claims due emails in batches, sends them over
+a small pool of authenticated SMTP connections that stay open between
+batches, and retries failures with exponential backoff. Several senders can
+share a Postgres database: claims use `FOR UPDATE SKIP LOCKED`.
+"""
+
+import asyncio
+import logging
+import os
+import random
+from datetime import timedelta
+
+import aiosmtplib
+from sqlalchemy import update
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.chat.models import get_utc_now
+from api.db import engine
+from api.emailer.models import OutboxEmail
+from api.emailer.sender import (
+    EMAIL_ADDRESS,
+    EMAIL_HOST,
+    EMAIL_PASSWORD,
+    EMAIL_PORT,
+    EMAIL_TIMEOUT,
+    EMAIL_USE_TLS,
+    build_message,
+)
+
+logger = logging.getLogger(__name__)
+
+EMAIL_POOL_SIZE = int(os.environ.get("EMAIL_POOL_SIZE") or 2)
+EMAIL_BATCH_SIZE = int(os.environ.get("EMAIL_BATCH_SIZE") or 20)
+EMAIL_MAX_ATTEMPTS = int(os.environ.get("EMAIL_MAX_ATTEMPTS") or 5)
+EMAIL_RETRY_DELAY = float(os.environ.get("EMAIL_RETRY_DELAY") or 10)
+EMAIL_RETRY_MAX_DELAY = float(os.environ.get("EMAIL_RETRY_MAX_DELAY") or 900)
+EMAIL_POLL_INTERVAL = float(os.environ.get("EMAIL_POLL_INTERVAL") or 5)
+EMAIL_SEND_LEASE = float(os.environ.get("EMAIL_SEND_LEASE") or 300)
+EMAIL_SENDER_ENABLED = (os.environ.get("EMAIL_SENDER_ENABLED") or "true") == "true"
+
+# Event of the sender running in this process, set by enqueue_email so new
+# mail goes out at once instead of at the next poll.
+_wakeup = None
+
+
+async def enqueue_email(
+    subject: str,
+    content: str,
+    to_email: str | None = None,
+    from_email: str | None = None,
+) -> int:
+    email = OutboxEmail(
+        to_email=to_email or EMAIL_ADDRESS,
+        from_email=from_email or EMAIL_ADDRESS,
+        subject=subject,
+        content=content,
+    )
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add(email)
+        await session.commit()
+    if _wakeup is not None:
+        _wakeup.set()
+    return email.id
+
+
+def retry_delay(attempts: int) -> float:
+    delay = min(EMAIL_RETRY_DELAY * 2 ** (attempts - 1), EMAIL_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def is_permanent(error: Exception) -> bool:
+    # 5xx replies (bad recipient, rejected content) will not succeed later.
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, aiosmtplib.SMTPResponseException) and error.code >= 500
+
+
+class SMTPConnection:
+    """
+    One authenticated SMTP connection, reopened when the server has dropped
+    it (idle timeouts are common between batches).
+    """
+
+    def __init__(self):
+        self.smtp = None
+
+    async def connect(self):
+        self.smtp = aiosmtplib.SMTP(
+            hostname=EMAIL_HOST,
+            port=EMAIL_PORT,
+            username=EMAIL_ADDRESS if EMAIL_PASSWORD else None,
+            password=EMAIL_PASSWORD or None,
+            use_tls=EMAIL_USE_TLS,
+            timeout=EMAIL_TIMEOUT,
+        )
+        await self.smtp.connect()
+
+    async def send(self, message):
+        for retry in (False, True):
+            if self.smtp is None or not self.smtp.is_connected:
+                await self.connect()
+            try:
+                return await self.smtp.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                self.smtp = None
+                if retry:
+                    raise
+
+    async def close(self):
+        if self.smtp is not None and self.smtp.is_connected:
+            try:
+                await self.smtp.quit()
+            except aiosmtplib.SMTPException:
+                self.smtp.close()
+        self.smtp = None
+
+
+class OutboxSender:
+    def __init__(self, pool_size=EMAIL_POOL_SIZE, batch_size=EMAIL_BATCH_SIZE):
+        self.connections = [SMTPConnection() for _ in range(pool_size)]
+        self.batch_size = batch_size
+        self.wakeup = None
+        self.task = None
+
+    def start(self):
+        global _wakeup
+        self.wakeup = _wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self.run())
+        return self
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        for connection in self.connections:
+            await connection.close()
+
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            try:
+                sent = await self.send_batch()
+            except Exception:
+                logger.exception("Email outbox batch failed")
+                sent = 0
+            if sent < self.batch_size:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), EMAIL_POLL_INTERVAL)
+                except TimeoutError:
+                    pass
+
+    async def claim_batch(self):
+        now = get_utc_now()
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            due = (
+                select(OutboxEmail.id)
+                .where(col(OutboxEmail.status).in_(("queued", "sending")))
+                .where(OutboxEmail.next_attempt_at <= now)
+                .order_by(col(OutboxEmail.next_attempt_at))
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            ids = (await session.exec(due)).all()
+            if not ids:
+                return []
+            lease = now + timedelta(seconds=EMAIL_SEND_LEASE)
+            await session.exec(
+                update(OutboxEmail)
+                .where(col(OutboxEmail.id).in_(ids))
+                .values(status="sending", next_attempt_at=lease)
+            )
+            query = select(OutboxEmail).where(col(OutboxEmail.id).in_(ids))
+            emails = (await session.exec(query)).all()
+            await session.commit()
+        return emails
+
+    async def send_batch(self):
+        """
+        Claim and send one batch, spread over the connection pool. Returns
+        the number of emails claimed.
+        """
+        emails = await self.claim_batch()
+        if not emails:
+            return 0
+
+        pending = list(emails)
+        errors = {}
+
+        async def drain(connection):
+            while pending:
+                email = pending.pop()
+                message = build_message(
+                    email.subject, email.content, email.to_email, email.from_email
+                )
+                try:
+                    await connection.send(message)
+                except Exception as error:
+                    errors[email.id] = error
+
+        await asyncio.gather(*(drain(connection) for connection in self.connections))
+        await self.record_results(emails, errors)
+        return len(emails)
+
+    async def record_results(self, emails, errors):
+        """
+        Store the outcome of each claimed email, unless its lease ran out and
+        another sender claimed it again in the meantime.
+        """
+        now = get_utc_now()
+        async with AsyncSession(engine) as session:
+            for email in emails:
+                error = errors.get(email.id)
+                attempts = email.attempts + 1
+                if error is None:
+                    values = {"status": "sent", "sent_at": now, "last_error": None}
+                elif is_permanent(error) or attempts >= EMAIL_MAX_ATTEMPTS:
+                    logger.warning("Email %s failed: %r", email.id, error)
+                    values = {"status": "failed", "last_error": repr(error)}
+                else:
+                    delay = retry_delay(attempts)
+                    values = {
+                        "status": "queued",
+                        "next_attempt_at": now + timedelta(seconds=delay),
+                        "last_error": repr(error),
+                    }
+                result = await session.exec(
+                    update(OutboxEmail)
+                    .where(OutboxEmail.id == email.id)
+                    .where(OutboxEmail.status == "sending")
+                    .where(OutboxEmail.next_attempt_at == email.next_attempt_at)
+                    .values(attempts=attempts, **values)
+                )
+                if result.rowcount == 0:
+                    logger.warning("Email %s lost its lease while sending", email.id)
+            await session.commit()
+
+
+async def run_sender():
+    sender = OutboxSender().start()
+    try:
+        await sender.task
+    finally:
+        await sender.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_sender())
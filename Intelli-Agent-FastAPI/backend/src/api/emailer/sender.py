@@ -6,10 +6,14 @@ from email.message import EmailMessage
 EMAIL_ADDRESS = os.environ.get("EMAIL_ADDRESS")
 EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")
 EMAIL_HOST = os.environ.get("EMAIL_HOST") or "smtp.gmail.com"
-EMAIL_PORT = os.environ.get("EMAIL_PORT") or 465
+EMAIL_PORT = int(os.environ.get("EMAIL_PORT") or 465)
+# Implicit TLS by default on 465; other ports upgrade with STARTTLS if offered.
+EMAIL_USE_TLS = os.environ.get("EMAIL_USE_TLS") or str(EMAIL_PORT == 465)
+EMAIL_USE_TLS = EMAIL_USE_TLS.lower() == "true"
+EMAIL_TIMEOUT = float(os.environ.get("EMAIL_TIMEOUT") or 30)
 
 
-def send_mail(
+def build_message(
     subject: str = "No subject provided",
     content: str = "No message provided",
     to_email: str = EMAIL_ADDRESS,
@@ -20,6 +24,16 @@ def send_mail(
     msg["From"] = from_email
     msg["To"] = to_email
     msg.set_content(content)
+    return msg
+
+
+def send_mail(
+    subject: str = "No subject provided",
+    content: str = "No message provided",
+    to_email: str = EMAIL_ADDRESS,
+    from_email: str = EMAIL_ADDRESS,
+):
+    msg = build_message(subject, content, to_email, from_email)
     with smtplib.SMTP_SSL(EMAIL_HOST, EMAIL_PORT) as smtp:
         smtp.login(EMAIL_ADDRESS, EMAIL_PASSWORD)
         return smtp.send_message(msg)
@@ -0,0 +1,14 @@
+"""
+Process-local metrics served as JSON at `GET /metrics`. Components register a
+function returning a dict of their current numbers under a section name.
+"""
+
+_sections = {}
+
+
+def register(name, collect):
+    _sections[name] = collect
+
+
+def collect_metrics():
+    return {name: collect() for name, collect in _sections.items()}
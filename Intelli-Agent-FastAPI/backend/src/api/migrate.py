@@ -0,0 +1,84 @@
+"""
+Database migrations, with Alembic (backend/src/migrations).
+
+`python -m api.migrate` upgrades DATABASE_URL to the latest revision. It runs
+once per deploy (the `migrate` service in compose.yaml) rather than on every
+app start. At startup the app only checks that the schema is current.
+"""
+
+import logging
+import os
+
+from sqlalchemy import text
+
+from api.db import engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini"
+)
+
+
+class SchemaOutOfDate(Exception):
+    pass
+
+
+def load_models():
+    """
+    Import every module defining tables, so SQLModel.metadata is complete.
+    """
+    import api.ai.models  # noqa: F401
+    import api.chat.models  # noqa: F401
+    import api.emailer.models  # noqa: F401
+
+
+def alembic_config():
+    from alembic.config import Config
+
+    return Config(ALEMBIC_INI)
+
+
+def upgrade(revision="head"):
+    from alembic import command
+
+    command.upgrade(alembic_config(), revision)
+
+
+async def current_revision():
+    async with engine.connect() as connection:
+        try:
+            result = await connection.execute(
+                text("SELECT version_num FROM alembic_version")
+            )
+        except Exception:
+            return None  # not migrated yet
+        return result.scalar()
+
+
+async def check_schema():
+    """
+    Raise SchemaOutOfDate unless the database is at the latest revision. A
+    revision this code does not know (a newer deploy migrated already) is
+    only logged.
+    """
+    from alembic.script import ScriptDirectory
+
+    scripts = ScriptDirectory.from_config(alembic_config())
+    head = scripts.get_current_head()
+    current = await current_revision()
+    if current == head:
+        return
+    if current is None or current in {
+        script.revision for script in scripts.walk_revisions()
+    }:
+        raise SchemaOutOfDate(
+            f"Database schema is at {current}, not {head}: "
+            "run `python -m api.migrate`."
+        )
+    logger.warning("Database schema is at unknown revision %s", current)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    upgrade()
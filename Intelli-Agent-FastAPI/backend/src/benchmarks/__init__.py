@@ -0,0 +1,4 @@
+"""
+Benchmarks for the FastAPI backend. Run them as modules from backend/src/,
+e.g. `python -m benchmarks.history`, against a throwaway DATABASE_URL.
+"""
@@ -0,0 +1,131 @@
+"""
+Startup benchmark: import time of the app and, optionally, its lifespan.
+
+Imports `main` in fresh interpreters (`python -X importtime`) and reports the
+median and slowest import time and the packages that cost the most. Importing
+the app should not pull in langchain, langgraph or the openai SDK: those load
+in the warm-up phase of the lifespan. With --lifespan, also times the startup
+phases (settings, schema check, AI warm-up) against DATABASE_URL (a migrated
+throwaway database; no model is called). --max-import-ms fails the run when
+the median import time is over budget, for CI.
+
+Usage (from backend/src/):
+    python -m benchmarks.startup --runs 10 --max-import-ms 1500
+    DATABASE_URL=sqlite+aiosqlite:////tmp/bench.db OPENAI_API_KEY=unused \\
+        EMAIL_ADDRESS=me@example.com python -m benchmarks.startup --lifespan
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+SRC = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAZY_PACKAGES = ("langchain_core", "langchain_openai", "langgraph", "openai")
+
+LIFESPAN = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+from api.ai.agents import warm_up
+from api.config import validate_settings
+from api.migrate import check_schema
+timings = {"import": time.perf_counter() - started}
+
+async def phases():
+    for name, phase in (
+        ("validate_settings", validate_settings),
+        ("check_schema", check_schema),
+        ("warm_up", lambda: warm_up(main.app)),
+    ):
+        started = time.perf_counter()
+        result = phase()
+        if asyncio.iscoroutine(result):
+            await result
+        timings[name] = time.perf_counter() - started
+    await main.engine.dispose()
+
+asyncio.run(phases())
+print(json.dumps(timings))
+"""
+
+
+def import_once():
+    """
+    Import `main` in a new interpreter. Returns the total import time and
+    the time spent importing each top-level package, in milliseconds.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=SRC,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    packages = defaultdict(float)
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        own, cumulative, name = line[len("import time:") :].split("|")
+        if not own.strip().isdigit():
+            continue  # header line
+        name = name.strip()
+        packages[name.split(".")[0]] += int(own) / 1000
+        if name == "main":
+            total = int(cumulative) / 1000
+    return total, packages
+
+
+def lifespan_once():
+    result = subprocess.run(
+        [sys.executable, "-c", LIFESPAN], cwd=SRC, capture_output=True, text=True
+    )
+    if result.returncode:
+        sys.exit(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--lifespan", action="store_true")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    totals, packages = [], defaultdict(list)
+    for _ in range(args.runs):
+        total, imported = import_once()
+        totals.append(total)
+        for package, ms in imported.items():
+            packages[package].append(ms)
+
+    median = statistics.median(totals)
+    print(f"import main: median {median:.0f} ms, max {max(totals):.0f} ms")
+    print(f"{'package':<24} {'median ms':>10}")
+    slowest = sorted(packages.items(), key=lambda item: -statistics.median(item[1]))
+    for package, times in slowest[: args.top]:
+        print(f"{package:<24} {statistics.median(times):>10.0f}")
+    eager = [package for package in LAZY_PACKAGES if package in packages]
+    if eager:
+        print(f"imported eagerly: {', '.join(eager)}")
+
+    if args.lifespan:
+        phases = defaultdict(list)
+        for _ in range(args.runs):
+            for name, seconds in lifespan_once().items():
+                phases[name].append(seconds * 1000)
+        print(f"{'startup phase':<24} {'median ms':>10}")
+        for name, times in phases.items():
+            print(f"{name:<24} {statistics.median(times):>10.0f}")
+
+    if args.max_import_ms is not None and median > args.max_import_ms:
+        sys.exit(f"median import time {median:.0f} ms > {args.max_import_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
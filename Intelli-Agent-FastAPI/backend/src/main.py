@@ -1,15 +1,33 @@
 from fastapi import FastAPI
 import os
 from contextlib import asynccontextmanager
-from api.db import init_db
+from api.config import validate_settings
+from api.db import engine
+from api.migrate import check_schema
+from api.ai.agents import warm_up
+from api.ai.router import ROUTER_ENABLED, build_pre_router
+from api.emailer.outbox import EMAIL_SENDER_ENABLED, OutboxSender
 from api.chat.routing import router as chat_router
+from api.metrics import collect_metrics
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # before app startup
-    init_db()
+    validate_settings()
+    # Tables are created and altered by `python -m api.migrate`, not here.
+    await check_schema()
+    # Import the AI stack and compile the agent graphs once; requests share
+    # them through the get_shared_supervisor dependency.
+    await warm_up(app)
+    # Send obvious research-and-email requests straight down the fixed pipeline.
+    app.state.pre_router = await build_pre_router() if ROUTER_ENABLED else None
+    # Deliver queued email from this process unless a separate sender runs.
+    app.state.email_sender = OutboxSender().start() if EMAIL_SENDER_ENABLED else None
     yield
+    if app.state.email_sender is not None:
+        await app.state.email_sender.stop()
+    await engine.dispose()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -19,3 +37,8 @@ app.include_router(chat_router, prefix="/api/chats")
 @app.get("/")
 def read_index():
     return {"System Status": "Up and running!"}
+
+
+@app.get("/metrics")
+def read_metrics():
+    return collect_metrics()
@@ -0,0 +1,167 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19 08:57:41.268100
+
+Databases created before migrations (by `create_all` at app startup) already
+have some of these tables: those are kept, and the columns and index added to
+chatmessage since its first version are added when missing.
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def create_chatmessage(inspector):
+    columns = [
+        sa.Column("final_message", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("email_content", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("route", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    ]
+    if not inspector.has_table("chatmessage"):
+        op.create_table(
+            "chatmessage",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("message", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            *columns,
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    else:
+        existing = {column["name"] for column in inspector.get_columns("chatmessage")}
+        for column in columns:
+            if column.name not in existing:
+                op.add_column("chatmessage", column)
+    indexes = {index["name"] for index in inspector.get_indexes("chatmessage")}
+    if "ix_chatmessage_created_at_id" not in indexes:
+        op.create_index(
+            "ix_chatmessage_created_at_id", "chatmessage", ["created_at", "id"]
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    inspector = sa.inspect(op.get_bind())
+    create_chatmessage(inspector)
+
+    if not inspector.has_table("emailcacheentry"):
+        op.create_table(
+            "emailcacheentry",
+            sa.Column(
+                "key", sqlmodel.sql.sqltypes.AutoString(length=64), nullable=False
+            ),
+            sa.Column("query", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("response", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("embedding", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("key"),
+        )
+        op.create_index(
+            "ix_emailcacheentry_expires_at", "emailcacheentry", ["expires_at"]
+        )
+
+    if not inspector.has_table("idempotencyrecord"):
+        op.create_table(
+            "idempotencyrecord",
+            sa.Column(
+                "key", sqlmodel.sql.sqltypes.AutoString(length=255), nullable=False
+            ),
+            sa.Column(
+                "request_hash",
+                sqlmodel.sql.sqltypes.AutoString(length=64),
+                nullable=False,
+            ),
+            sa.Column("status", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("response", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+            sa.PrimaryKeyConstraint("key"),
+        )
+        op.create_index(
+            "ix_idempotencyrecord_expires_at", "idempotencyrecord", ["expires_at"]
+        )
+
+    if not inspector.has_table("outboxemail"):
+        op.create_table(
+            "outboxemail",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("to_email", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("from_email", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("subject", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("content", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("status", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("last_error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+            sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("sent_at", sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_outboxemail_status_next_attempt_at",
+            "outboxemail",
+            ["status", "next_attempt_at"],
+        )
+
+    if not inspector.has_table("chatjob"):
+        op.create_table(
+            "chatjob",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("chat_message_id", sa.Integer(), nullable=False),
+            sa.Column("message", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("status", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("response", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+            sa.Column("error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+            sa.Column("next_attempt_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.Column("started_at", sa.DateTime(timezone=True), nullable=True),
+            sa.Column("finished_at", sa.DateTime(timezone=True), nullable=True),
+            sa.ForeignKeyConstraint(["chat_message_id"], ["chatmessage.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_chatjob_status_next_attempt_at",
+            "chatjob",
+            ["status", "next_attempt_at"],
+        )
+
+    if not inspector.has_table("chatjobevent"):
+        op.create_table(
+            "chatjobevent",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("job_id", sa.Integer(), nullable=False),
+            sa.Column("event", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("data", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+            sa.ForeignKeyConstraint(["job_id"], ["chatjob.id"]),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_chatjobevent_job_id", "chatjobevent", ["job_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_chatjobevent_job_id", table_name="chatjobevent")
+    op.drop_table("chatjobevent")
+    op.drop_index("ix_chatjob_status_next_attempt_at", table_name="chatjob")
+    op.drop_table("chatjob")
+    op.drop_index("ix_outboxemail_status_next_attempt_at", table_name="outboxemail")
+    op.drop_table("outboxemail")
+    op.drop_index("ix_idempotencyrecord_expires_at", table_name="idempotencyrecord")
+    op.drop_table("idempotencyrecord")
+    op.drop_index("ix_emailcacheentry_expires_at", table_name="emailcacheentry")
+    op.drop_table("emailcacheentry")
+    op.drop_index("ix_chatmessage_created_at_id", table_name="chatmessage")
+    op.drop_table("chatmessage")
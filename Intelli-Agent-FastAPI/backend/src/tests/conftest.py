@@ -0,0 +1,62 @@
+"""
+Shared fixtures. Run from backend/src with `python -m pytest tests`.
+
+api.db creates its engine from DATABASE_URL on import, so the tests point it
+at a throwaway SQLite database before importing anything from api.
+"""
+
+import os
+import tempfile
+
+DATABASE_DIR = tempfile.mkdtemp(prefix="intelli-agent-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DATABASE_DIR}/test.db"
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("EMAIL_ADDRESS", "me@example.com")
+
+import pytest  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+from api.db import engine  # noqa: E402
+from api.migrate import load_models  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    # One event loop for the whole run: the engine's pooled connections
+    # belong to the loop that opened them.
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def tables(anyio_backend):
+    load_models()
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all)
+    yield
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db(tables):
+    """
+    Empty tables for the test.
+    """
+    yield
+    async with engine.begin() as connection:
+        for table in reversed(SQLModel.metadata.sorted_tables):
+            await connection.execute(table.delete())
+
+
+@pytest.fixture
+async def client(db):
+    """
+    HTTP client for the app, without its lifespan.
+    """
+    import httpx
+
+    from main import app
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+    app.dependency_overrides.clear()
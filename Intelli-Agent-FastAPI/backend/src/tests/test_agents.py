@@ -0,0 +1,85 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage
+
+from api.ai import agents
+from api.ai.router import get_pre_router
+from main import app
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSupervisor:
+    async def ainvoke(self, inputs):
+        return {"messages": [AIMessage(content="Done", name="supervisor")]}
+
+
+class Builds:
+    """
+    Stand-in for build_supervisor that counts its calls and blocks until
+    released.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.count += 1
+        self.release.wait(5)
+        return FakeSupervisor()
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    builds = Builds()
+    monkeypatch.setattr(agents, "build_supervisor", builds)
+    app.dependency_overrides[get_pre_router] = lambda: None
+    yield builds
+    builds.release.set()
+    if hasattr(app.state, "supervisor"):
+        del app.state.supervisor
+
+
+async def test_supervisor_is_compiled_once(client, builds):
+    builds.release.set()
+    for message in ("first", "second"):
+        response = await client.post("/api/chats/", json={"message": message})
+        assert response.status_code == 200
+    assert builds.count == 1
+
+
+async def test_background_warm_up_does_not_block(client, builds, monkeypatch):
+    monkeypatch.setattr(agents, "AI_WARM_UP", "background")
+    await agents.warm_up(app)
+    assert not app.state.supervisor.done()
+    # The app serves while the supervisor loads; chats wait for it.
+    assert (await client.get("/api/chats/")).status_code == 200
+    chat = asyncio.ensure_future(client.post("/api/chats/", json={"message": "hi"}))
+    await asyncio.sleep(0.05)
+    assert not chat.done()
+
+    builds.release.set()
+    assert (await chat).status_code == 200
+    assert builds.count == 1
+
+
+def test_importing_the_app_does_not_load_the_ai_stack():
+    code = (
+        "import sys, main; "
+        "print(sorted(m for m in ('langgraph', 'langchain_core', 'openai') "
+        "if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={**os.environ, "DATABASE_URL": ""},
+    )
+    assert result.stdout.strip() == "[]"
@@ -0,0 +1,146 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+
+from api.ai import cache
+from api.ai.cache import DatabaseStore, EmailMessageCache, MemoryStore, cache_key
+from api.ai.schemas import EmailMessageSchema
+from api.chat.models import get_utc_now
+
+pytestmark = pytest.mark.anyio
+
+
+class Generator:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.queries = []
+        self.error = None
+
+    async def __call__(self, query):
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return EmailMessageSchema(subject=query, contents="Body")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    class Clock:
+        now = get_utc_now()
+
+        def advance(self, seconds):
+            self.now += timedelta(seconds=seconds)
+
+    clock = Clock()
+    monkeypatch.setattr(cache, "get_utc_now", lambda: clock.now)
+    return clock
+
+
+async def test_concurrent_misses_share_one_call():
+    email_cache = EmailMessageCache(MemoryStore(), ttl=60, similarity=0)
+    generate = Generator(delay=0.05)
+
+    queries = ["Fusion power", " fusion   POWER. ", "fusion power!"]
+    results = await asyncio.gather(
+        *(email_cache.get_or_generate(query, generate) for query in queries)
+    )
+
+    assert len(generate.queries) == 1
+    assert all(result is results[0] for result in results)
+    assert await email_cache.get_or_generate("fusion power", generate) is results[0]
+    stats = email_cache.collect_metrics()
+    assert (stats["misses"], stats["coalesced"], stats["hits"]) == (1, 2, 1)
+    assert stats["hit_rate"] == 0.75
+
+
+async def test_cancelled_caller_does_not_cancel_the_shared_call():
+    email_cache = EmailMessageCache(MemoryStore(), ttl=60, similarity=0)
+    generate = Generator(delay=0.05)
+
+    first = asyncio.ensure_future(email_cache.get_or_generate("fusion", generate))
+    second = asyncio.ensure_future(email_cache.get_or_generate("fusion", generate))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert (await second).subject == "fusion"
+    assert len(generate.queries) == 1
+
+
+async def test_errors_are_shared_but_not_cached():
+    email_cache = EmailMessageCache(MemoryStore(), ttl=60, similarity=0)
+    generate = Generator(delay=0.01)
+    generate.error = RuntimeError("LLM down")
+
+    results = await asyncio.gather(
+        email_cache.get_or_generate("fusion", generate),
+        email_cache.get_or_generate("fusion", generate),
+        return_exceptions=True,
+    )
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert len(generate.queries) == 1
+
+    generate.error = None
+    assert (await email_cache.get_or_generate("fusion", generate)).subject == "fusion"
+    assert len(generate.queries) == 2
+
+
+async def test_invalid_requests_are_not_cached():
+    email_cache = EmailMessageCache(MemoryStore(), ttl=60, similarity=0)
+
+    async def generate(query):
+        return EmailMessageSchema(subject="", contents="", invalid_request=True)
+
+    await email_cache.get_or_generate("hello", generate)
+    assert email_cache.store.size() == 0
+
+
+async def test_entries_expire(clock):
+    email_cache = EmailMessageCache(MemoryStore(), ttl=60, similarity=0)
+    generate = Generator()
+
+    await email_cache.get_or_generate("fusion", generate)
+    clock.advance(59)
+    await email_cache.get_or_generate("fusion", generate)
+    assert len(generate.queries) == 1
+
+    clock.advance(1)
+    await email_cache.get_or_generate("fusion", generate)
+    assert len(generate.queries) == 2
+
+
+async def test_memory_store_evicts_least_recently_used():
+    store = MemoryStore(max_entries=2)
+    value = EmailMessageSchema(subject="Subject", contents="Body")
+    await store.set("a", "a", value, None, 60)
+    await store.set("b", "b", value, None, 60)
+    await store.get("a")
+    await store.set("c", "c", value, None, 60)
+
+    assert list(store.entries) == ["a", "c"]
+    assert await store.get("b") is None
+
+
+async def test_memory_store_nearest(clock):
+    store = MemoryStore()
+    value = EmailMessageSchema(subject="Subject", contents="Body")
+    await store.set("a", "a", value, [1.0, 0.0], 60)
+
+    assert await store.nearest([0.8, 0.6], 0.75) is value
+    assert await store.nearest([0.6, 0.8], 0.75) is None
+    clock.advance(60)
+    assert await store.nearest([1.0, 0.0], 0.75) is None
+
+
+async def test_database_store(db, clock):
+    store = DatabaseStore()
+    key = cache_key("fusion")
+    value = EmailMessageSchema(subject="Subject", contents="Body")
+    await store.set(key, "fusion", value, [1.0, 0.0], 60)
+
+    assert await store.get(key) == value
+    assert await store.nearest([1.0, 0.0], 0.9) == value
+    clock.advance(60)
+    assert await store.get(key) is None
+    assert await store.nearest([1.0, 0.0], 0.9) is None
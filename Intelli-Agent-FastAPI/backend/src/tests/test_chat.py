@@ -0,0 +1,61 @@
+import pytest
+from langchain_core.messages import AIMessage
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.ai.agents import get_shared_supervisor
+from api.ai.router import get_pre_router
+from api.chat.models import ChatMessage
+from api.db import engine
+from main import app
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSupervisor:
+    def __init__(self):
+        self.inputs = []
+
+    async def ainvoke(self, inputs):
+        self.inputs.append(inputs)
+        return {
+            "messages": [
+                AIMessage(content="Fusion is hard.", name="research_agent"),
+                AIMessage(content="Emailed you.", name="supervisor"),
+            ]
+        }
+
+    def invoke(self, inputs):
+        raise AssertionError("the chat routes must not block the event loop")
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = FakeSupervisor()
+    app.dependency_overrides[get_shared_supervisor] = lambda: supervisor
+    app.dependency_overrides[get_pre_router] = lambda: None
+    return supervisor
+
+
+async def test_chat_is_saved_with_its_response(client, supervisor):
+    response = await client.post("/api/chats/", json={"message": "Research fusion"})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "final_message": "Emailed you.",
+        "email_content": "Fusion is hard.",
+    }
+    assert supervisor.inputs == [
+        {"messages": [{"role": "user", "content": "Research fusion"}]}
+    ]
+    async with AsyncSession(engine) as session:
+        [message] = (await session.exec(select(ChatMessage))).all()
+    assert (message.message, message.final_message, message.email_content) == (
+        "Research fusion",
+        "Emailed you.",
+        "Fusion is hard.",
+    )
+    assert message.route == "research_agent"
+
+    history = (await client.get("/api/chats/recent/")).json()
+    assert [item["final_message"] for item in history] == ["Emailed you."]
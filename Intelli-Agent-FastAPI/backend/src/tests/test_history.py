@@ -0,0 +1,60 @@
+from datetime import timedelta
+
+import pytest
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.chat.models import ChatMessage, get_utc_now
+from api.db import engine
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def messages(db):
+    """
+    Five messages, newest last; the last three share a timestamp.
+    """
+    now = get_utc_now()
+    created = [now - timedelta(minutes=2), now - timedelta(minutes=1), now, now, now]
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        rows = [
+            ChatMessage(message=f"Message {i}", created_at=created_at)
+            for i, created_at in enumerate(created)
+        ]
+        session.add_all(rows)
+        await session.commit()
+    return [row.id for row in rows]
+
+
+async def get_page(client, **params):
+    response = await client.get("/api/chats/recent/", params=params)
+    assert response.status_code == 200
+    return [item["id"] for item in response.json()]
+
+
+async def test_pages_newest_first(client, messages):
+    newest_first = messages[::-1]
+
+    first = await get_page(client, limit=2)
+    second = await get_page(client, limit=2, before=first[-1])
+    third = await get_page(client, limit=2, before=second[-1])
+
+    assert first + second + third == newest_first
+    assert await get_page(client, limit=2, before=third[-1]) == []
+    assert await get_page(client) == newest_first
+
+
+async def test_ties_are_broken_by_id(client, messages):
+    # Messages 2 to 4 share created_at: the page after message 3 is message 2
+    # and then the older ones, with no repeats or gaps.
+    assert await get_page(client, before=messages[3]) == messages[2::-1]
+
+
+async def test_unknown_before_is_an_empty_page(client, messages):
+    assert await get_page(client, before=max(messages) + 1) == []
+
+
+async def test_limit_is_bounded(client, db):
+    for limit in (0, 101):
+        response = await client.get("/api/chats/recent/", params={"limit": limit})
+        assert response.status_code == 422
@@ -0,0 +1,217 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from sqlalchemy import delete
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.ai.agents import get_shared_supervisor
+from api.ai.router import get_pre_router
+from api.ai.schemas import ChatResponseSchema
+from api.chat import idempotency
+from api.chat.idempotency import claim, request_hash, run_once
+from api.chat.models import ChatMessage, IdempotencyRecord
+from api.db import engine
+from main import app
+
+pytestmark = pytest.mark.anyio
+
+
+async def get_record(key):
+    async with AsyncSession(engine) as session:
+        return await session.get(IdempotencyRecord, key)
+
+
+async def test_concurrent_duplicates_run_once(db):
+    calls = []
+
+    async def run():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return ChatResponseSchema(final_message="Done")
+
+    results = await asyncio.gather(
+        run_once("key", {"message": "hi"}, run),
+        run_once("key", {"message": "hi"}, run),
+    )
+
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True]
+    assert results[0][0] == results[1][0]
+    assert (await get_record("key")).status == "completed"
+
+
+async def test_window_starts_when_the_run_finishes(db):
+    calls = []
+
+    async def run():
+        calls.append(1)
+        await asyncio.sleep(0.5)
+        return ChatResponseSchema(final_message="Done")
+
+    # The run outlasts the replay window of keyless requests.
+    results = await asyncio.gather(
+        run_once("key", {"message": "hi"}, run, ttl=0.2),
+        run_once("key", {"message": "hi"}, run, ttl=0.2),
+    )
+
+    assert len(calls) == 1
+    assert sorted(replayed for _, replayed in results) == [False, True]
+
+
+async def test_failed_run_releases_the_key(db):
+    async def fail():
+        raise RuntimeError("supervisor down")
+
+    async def run():
+        return ChatResponseSchema(final_message="Done")
+
+    with pytest.raises(RuntimeError):
+        await run_once("key", {"message": "hi"}, fail)
+    assert (await get_record("key")).status == "failed"
+
+    _, replayed = await run_once("key", {"message": "hi"}, run)
+    assert not replayed
+
+
+async def test_claim_retries_when_the_record_is_deleted(db, monkeypatch):
+    first = request_hash({"message": "first"})
+    assert await claim("key", first) is None
+
+    class RacingSession(AsyncSession):
+        # The record disappears between the failed insert and the read, as
+        # when another request's finish() deletes it once expired.
+        raced = False
+
+        async def get(self, entity, ident, **kwargs):
+            if not RacingSession.raced:
+                RacingSession.raced = True
+                await self.exec(
+                    delete(IdempotencyRecord).where(IdempotencyRecord.key == ident)
+                )
+                await self.commit()
+            return await super().get(entity, ident, **kwargs)
+
+    monkeypatch.setattr(idempotency, "AsyncSession", RacingSession)
+    second = request_hash({"message": "second"})
+    assert await claim("key", second) is None
+
+    record = await get_record("key")
+    assert (record.request_hash, record.status) == (second, "running")
+
+
+class FakeSupervisor:
+    def __init__(self):
+        self.runs = 0
+        self.error = None
+
+    async def ainvoke(self, inputs):
+        self.runs += 1
+        return {"messages": [AIMessage(content="Done", name="supervisor")]}
+
+    async def astream_events(self, inputs, version):
+        self.runs += 1
+        await asyncio.sleep(0.2)
+        if self.error is not None:
+            raise self.error
+        messages = [AIMessage(content="Done", name="supervisor")]
+        yield {
+            "event": "on_chain_end",
+            "name": "LangGraph",
+            "data": {"output": {"messages": messages}},
+            "metadata": {},
+            "parent_ids": [],
+        }
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = FakeSupervisor()
+    app.dependency_overrides[get_shared_supervisor] = lambda: supervisor
+    app.dependency_overrides[get_pre_router] = lambda: None
+    return supervisor
+
+
+async def test_replay(client, supervisor):
+    headers = {"Idempotency-Key": "key"}
+    first = await client.post("/api/chats/", json={"message": "hi"}, headers=headers)
+    second = await client.post("/api/chats/", json={"message": "hi"}, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert (
+        first.json()
+        == second.json()
+        == {
+            "final_message": "Done",
+            "email_content": None,
+        }
+    )
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert supervisor.runs == 1
+
+
+async def test_key_reused_for_another_payload(client, supervisor):
+    headers = {"Idempotency-Key": "key"}
+    await client.post("/api/chats/", json={"message": "hi"}, headers=headers)
+    response = await client.post(
+        "/api/chats/", json={"message": "bye"}, headers=headers
+    )
+
+    assert response.status_code == 422
+    assert supervisor.runs == 1
+
+
+async def test_request_in_progress(client, supervisor, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_TIMEOUT", 0)
+    # Claimed by a run that has not finished.
+    await claim("key", request_hash({"message": "hi"}))
+
+    response = await client.post(
+        "/api/chats/", json={"message": "hi"}, headers={"Idempotency-Key": "key"}
+    )
+
+    assert response.status_code == 409
+    assert response.headers["Retry-After"] == "5"
+    assert supervisor.runs == 0
+
+
+FINAL = 'event: final\ndata: {"final_message": "Done", "email_content": null}\n\n'
+
+
+async def test_stream_double_click(client, supervisor):
+    first, second = await asyncio.gather(
+        client.post("/api/chats/stream", json={"message": "hi"}),
+        client.post("/api/chats/stream", json={"message": "hi"}),
+    )
+
+    assert first.text == second.text == FINAL
+    assert sorted(
+        response.headers.get("Idempotent-Replayed", "") for response in (first, second)
+    ) == ["", "true"]
+    assert supervisor.runs == 1
+
+    async with AsyncSession(engine) as session:
+        [message] = (await session.exec(select(ChatMessage))).all()
+    assert message.final_message == "Done"
+
+
+async def test_failed_stream_releases_the_key(client, supervisor):
+    supervisor.error = RuntimeError("supervisor down")
+    response = await client.post("/api/chats/stream", json={"message": "hi"})
+    assert "event: error" in response.text
+
+    supervisor.error = None
+    response = await client.post("/api/chats/stream", json={"message": "hi"})
+    assert response.text == FINAL
+    assert supervisor.runs == 2
+
+
+async def test_stream_key_reused_for_another_payload(client, supervisor):
+    headers = {"Idempotency-Key": "key"}
+    await client.post("/api/chats/stream", json={"message": "hi"}, headers=headers)
+    response = await client.post(
+        "/api/chats/stream", json={"message": "bye"}, headers=headers
+    )
+    assert response.status_code == 422
@@ -0,0 +1,173 @@
+import json
+
+import pytest
+from langchain_core.messages import AIMessage
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.chat import jobs
+from api.chat.jobs import JobWorker, add_event, enqueue_job, job_events
+from api.chat.models import ChatJob, ChatJobEvent, ChatMessage, get_utc_now
+from api.db import engine
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeSupervisor:
+    def __init__(self, messages=None):
+        if messages is None:
+            messages = [AIMessage(content="Done", name="supervisor")]
+        self.messages = messages
+
+    async def astream_events(self, inputs, version):
+        yield {
+            "event": "on_chain_stream",
+            "name": "LangGraph",
+            "data": {"chunk": {"research_agent": {}}},
+            "metadata": {},
+            "parent_ids": [],
+        }
+        yield {
+            "event": "on_chain_end",
+            "name": "LangGraph",
+            "data": {"output": {"messages": self.messages}},
+            "metadata": {},
+            "parent_ids": [],
+        }
+
+
+class Request:
+    async def is_disconnected(self):
+        return False
+
+
+async def get(model, id):
+    async with AsyncSession(engine) as session:
+        return await session.get(model, id)
+
+
+async def expire_lease(job_id):
+    async with AsyncSession(engine) as session:
+        await session.exec(
+            update(ChatJob)
+            .where(ChatJob.id == job_id)
+            .values(next_attempt_at=get_utc_now())
+        )
+        await session.commit()
+
+
+@pytest.fixture
+def worker():
+    worker = JobWorker(concurrency=1)
+    worker.supervisor = FakeSupervisor()
+    return worker
+
+
+async def test_claims_due_jobs_once(db, worker):
+    job = await enqueue_job("hello")
+
+    claimed = await worker.claim_job()
+    assert (claimed.id, claimed.status, claimed.attempts) == (job.id, "running", 1)
+    # Leased until JOB_LEASE from now.
+    assert await worker.claim_job() is None
+
+
+async def test_expired_leases_are_reclaimed_and_fenced(db, worker):
+    job = await enqueue_job("hello")
+    first = await worker.claim_job()
+    await expire_lease(job.id)
+
+    second = await worker.claim_job()
+    assert (second.id, second.attempts) == (job.id, 2)
+
+    # The first claim no longer writes to the job.
+    assert not await worker.update_claimed(first, status="completed")
+    assert await worker.update_claimed(second, status="completed")
+
+
+async def test_gives_up_after_max_attempts(db, worker, monkeypatch):
+    monkeypatch.setattr(jobs, "JOB_MAX_ATTEMPTS", 1)
+    job = await enqueue_job("hello")
+    await worker.claim_job()
+    await expire_lease(job.id)
+
+    assert await worker.claim_job() is None
+    job = await get(ChatJob, job.id)
+    assert (job.status, job.error) == ("failed", "Lease expired")
+
+
+async def test_process(db, worker):
+    job = await enqueue_job("hello")
+    await worker.process(await worker.claim_job())
+
+    job = await get(ChatJob, job.id)
+    assert job.status == "completed"
+    assert json.loads(job.response)["final_message"] == "Done"
+    assert (await get(ChatMessage, job.chat_message_id)).final_message == "Done"
+
+    async with AsyncSession(engine) as session:
+        query = select(ChatJobEvent.event).order_by(ChatJobEvent.id)
+        events = (await session.exec(query)).all()
+    assert events == ["status", "handoff", "final"]
+
+
+async def test_process_after_losing_the_lease(db, worker):
+    job = await enqueue_job("hello")
+    first = await worker.claim_job()
+    await expire_lease(job.id)
+    await worker.claim_job()
+
+    await worker.process(first)
+
+    job = await get(ChatJob, job.id)
+    assert (job.status, job.attempts, job.response) == ("running", 2, None)
+
+
+async def test_process_failure(db, worker):
+    worker.supervisor = FakeSupervisor(messages=[])
+    job = await enqueue_job("hello")
+    await worker.process(await worker.claim_job())
+
+    job = await get(ChatJob, job.id)
+    assert job.status == "failed"
+    assert "Error with supervisor" in job.error
+
+
+async def test_events_resume_after_an_id(db):
+    job = await enqueue_job("hello")
+    for i in range(3):
+        await add_event(job.id, "status", {"step": i})
+    async with AsyncSession(engine) as session:
+        await session.exec(
+            update(ChatJob).where(ChatJob.id == job.id).values(status="completed")
+        )
+        await session.commit()
+
+    messages = [message async for message in job_events(job.id, Request())]
+    assert len(messages) == 3
+    first_id = int(messages[0].split("\n")[0].removeprefix("id: "))
+
+    resumed = [m async for m in job_events(job.id, Request(), after=first_id)]
+    assert resumed == messages[1:]
+
+
+async def test_events_endpoint_honours_last_event_id(client):
+    job = await enqueue_job("hello")
+    await add_event(job.id, "status", {"status": "running"})
+    await add_event(job.id, "final", {"final_message": "Done"})
+    async with AsyncSession(engine) as session:
+        await session.exec(
+            update(ChatJob).where(ChatJob.id == job.id).values(status="completed")
+        )
+        await session.commit()
+        query = select(ChatJobEvent.id).order_by(ChatJobEvent.id)
+        first_id, last_id = (await session.exec(query)).all()
+
+    path = f"/api/chats/jobs/{job.id}/events"
+    response = await client.get(path, headers={"Last-Event-ID": str(first_id)})
+    assert response.status_code == 200
+    assert response.text == (
+        f'id: {last_id}\nevent: final\ndata: {{"final_message": "Done"}}\n\n'
+    )
+    assert (await client.get("/api/chats/jobs/0/events")).status_code == 404
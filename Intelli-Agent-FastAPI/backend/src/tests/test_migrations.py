@@ -0,0 +1,50 @@
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine
+from sqlmodel import SQLModel
+
+import api.db
+from api import config
+from api.ai import cache
+from api.migrate import alembic_config, load_models
+
+
+def test_migrations_match_the_models(tmp_path, monkeypatch):
+    path = tmp_path / "migrated.db"
+    # migrations/env.py reads the URL from api.db.
+    monkeypatch.setattr(api.db, "DATABASE_URL", f"sqlite+aiosqlite:///{path}")
+    alembic = alembic_config()
+    alembic.attributes["configure_logger"] = False
+    command.upgrade(alembic, "head")
+
+    load_models()
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection)
+        assert compare_metadata(context, SQLModel.metadata) == []
+    engine.dispose()
+
+
+def test_validate_settings_reports_every_problem(monkeypatch):
+    monkeypatch.setattr(config, "DATABASE_URL", None)
+    monkeypatch.setattr(config, "EMAIL_ADDRESS", None)
+    monkeypatch.setattr(config, "AI_WARM_UP", "later")
+
+    with pytest.raises(RuntimeError) as error:
+        config.validate_settings()
+    message = str(error.value)
+    assert "DATABASE_URL" in message
+    assert "EMAIL_ADDRESS" in message
+    assert "AI_WARM_UP" in message
+
+
+def test_unknown_email_cache_backend(monkeypatch):
+    monkeypatch.setattr(cache, "EMAIL_CACHE_BACKEND", "redis")
+    cache.get_email_cache.cache_clear()
+    try:
+        with pytest.raises(RuntimeError, match="EMAIL_CACHE_BACKEND"):
+            cache.get_email_cache()
+    finally:
+        cache.get_email_cache.cache_clear()
@@ -0,0 +1,191 @@
+import socket
+from datetime import timedelta
+
+import pytest
+from aiosmtpd.controller import Controller
+from sqlalchemy import update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from api.chat.models import get_utc_now
+from api.db import engine
+from api.emailer import outbox
+from api.emailer.models import OutboxEmail
+from api.emailer.outbox import OutboxSender, enqueue_email, retry_delay
+
+pytestmark = pytest.mark.anyio
+
+
+class Handler:
+    """
+    Accepts every message, unless given SMTP replies to answer first.
+    """
+
+    def __init__(self):
+        self.messages = []
+        self.replies = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.replies:
+            return self.replies.pop(0)
+        self.messages.append(envelope)
+        return "250 Message accepted for delivery"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    handler = Handler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setattr(outbox, "EMAIL_HOST", controller.hostname)
+    monkeypatch.setattr(outbox, "EMAIL_PORT", controller.port)
+    monkeypatch.setattr(outbox, "EMAIL_USE_TLS", False)
+    monkeypatch.setattr(outbox, "EMAIL_PASSWORD", None)
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+async def sender(db, smtp):
+    sender = OutboxSender(pool_size=2, batch_size=10)
+    yield sender
+    await sender.stop()
+
+
+async def get_emails():
+    async with AsyncSession(engine) as session:
+        query = select(OutboxEmail).order_by(OutboxEmail.id)
+        return (await session.exec(query)).all()
+
+
+async def make_due():
+    async with AsyncSession(engine) as session:
+        await session.exec(update(OutboxEmail).values(next_attempt_at=get_utc_now()))
+        await session.commit()
+
+
+async def test_delivers_over_the_pool(sender, smtp):
+    for i in range(3):
+        await enqueue_email(f"Subject {i}", f"Body {i}")
+
+    assert await sender.send_batch() == 3
+    assert await sender.send_batch() == 0
+
+    assert len(smtp.messages) == 3
+    assert {envelope.rcpt_tos[0] for envelope in smtp.messages} == {"me@example.com"}
+    for email in await get_emails():
+        assert (email.status, email.attempts) == ("sent", 1)
+        assert email.sent_at is not None
+
+
+async def test_retries_temporary_failures_with_backoff(sender, smtp, monkeypatch):
+    monkeypatch.setattr(outbox, "EMAIL_RETRY_DELAY", 10)
+    smtp.replies.append("451 Try again later")
+    await enqueue_email("Subject", "Body")
+    before = get_utc_now()
+
+    await sender.send_batch()
+
+    [email] = await get_emails()
+    assert (email.status, email.attempts) == ("queued", 1)
+    assert "451" in email.last_error
+    delay = email.next_attempt_at.replace(tzinfo=before.tzinfo) - before
+    assert timedelta(seconds=8) <= delay <= timedelta(seconds=13)
+    # Not due yet.
+    assert await sender.send_batch() == 0
+
+    await make_due()
+    await sender.send_batch()
+
+    [email] = await get_emails()
+    assert (email.status, email.attempts) == ("sent", 2)
+    assert email.last_error is None
+    assert len(smtp.messages) == 1
+
+
+async def test_gives_up_after_max_attempts(sender, smtp, monkeypatch):
+    monkeypatch.setattr(outbox, "EMAIL_MAX_ATTEMPTS", 2)
+    smtp.replies.extend(["451 Try again later"] * 2)
+    await enqueue_email("Subject", "Body")
+
+    await sender.send_batch()
+    await make_due()
+    await sender.send_batch()
+
+    [email] = await get_emails()
+    assert (email.status, email.attempts) == ("failed", 2)
+
+
+async def test_permanent_failures_are_not_retried(sender, smtp):
+    smtp.replies.append("550 No such user")
+    await enqueue_email("Subject", "Body")
+
+    await sender.send_batch()
+
+    [email] = await get_emails()
+    assert (email.status, email.attempts) == ("failed", 1)
+    assert "550" in email.last_error
+    assert smtp.messages == []
+
+
+async def test_reclaims_expired_leases(sender, smtp):
+    now = get_utc_now()
+    async with AsyncSession(engine) as session:
+        for subject, lease in (("Crashed", -1), ("Still sending", 60)):
+            session.add(
+                OutboxEmail(
+                    to_email="me@example.com",
+                    from_email="me@example.com",
+                    subject=subject,
+                    content="Body",
+                    status="sending",
+                    next_attempt_at=now + timedelta(seconds=lease),
+                )
+            )
+        await session.commit()
+
+    assert await sender.send_batch() == 1
+
+    crashed, sending = await get_emails()
+    assert crashed.status == "sent"
+    assert sending.status == "sending"
+    [envelope] = smtp.messages
+    assert b"Subject: Crashed" in envelope.content
+
+
+async def test_results_of_an_expired_claim_are_dropped(sender, smtp, caplog):
+    await enqueue_email("Subject", "Body")
+    emails = await sender.claim_batch()
+    # The batch outlives its lease and another sender takes the email over.
+    await make_due()
+    other = OutboxSender(pool_size=1)
+    reclaimed = await other.claim_batch()
+
+    await sender.record_results(emails, {})
+    assert "lost its lease" in caplog.text
+    [email] = await get_emails()
+    assert (email.status, email.attempts) == ("sending", 0)
+
+    await other.record_results(reclaimed, {})
+    [email] = await get_emails()
+    assert (email.status, email.attempts) == ("sent", 1)
+
+
+def test_retry_delay_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(outbox, "EMAIL_RETRY_DELAY", 10)
+    monkeypatch.setattr(outbox, "EMAIL_RETRY_MAX_DELAY", 60)
+    monkeypatch.setattr(outbox.random, "uniform", lambda low, high: 1.0)
+
+    assert [retry_delay(attempts) for attempts in range(1, 6)] == [
+        10,
+        20,
+        40,
+        60,
+        60,
+    ]
@@ -0,0 +1,210 @@
+import pytest
+from langchain_core.messages import AIMessage
+
+import api.ai.tools
+from api.ai.tools import EMAIL_NOT_QUEUED
+from api.ai import router
+from api.ai.router import (
+    OTHER,
+    RESEARCH_EMAIL,
+    SEED_EXAMPLES,
+    CentroidClassifier,
+    PreRouter,
+    run_research_email_pipeline,
+)
+from api.ai.schemas import EmailMessageSchema
+from api.chat import streaming
+from api.chat.streaming import chat_events
+
+
+@pytest.fixture
+def pre_router():
+    return PreRouter(CentroidClassifier().fit(SEED_EXAMPLES))
+
+
+def test_classifier_predicts_nearest_centroid():
+    classifier = CentroidClassifier().fit(SEED_EXAMPLES)
+
+    label, confidence = classifier.predict("summarize rust news and mail it to me")
+    assert label == RESEARCH_EMAIL
+    assert confidence > 0
+
+    assert classifier.predict("who are you")[0] == OTHER
+    # No shared n-gram with any example.
+    assert classifier.predict("zzz") == (OTHER, 0.0)
+    assert CentroidClassifier().predict("hello") == (OTHER, 0.0)
+
+
+def test_rules_come_before_the_classifier(pre_router):
+    decision = pre_router.route("Research fusion power and email me a summary")
+    assert (decision.bypass, decision.reason) == (True, "rule")
+
+    # Other recipients always go to the supervisor.
+    decision = pre_router.route("research fusion power and email bob@example.com")
+    assert (decision.bypass, decision.reason) == (False, "rule")
+
+    decision = pre_router.route("hello there")
+    assert (decision.bypass, decision.reason) == (False, "classifier")
+
+
+def test_classifier_needs_min_confidence():
+    classifier = CentroidClassifier().fit(SEED_EXAMPLES)
+    message = "a quick overview of rust vs go"
+    label, confidence = classifier.predict(message)
+    assert label == RESEARCH_EMAIL
+
+    assert PreRouter(classifier, min_confidence=confidence).route(message).bypass
+    strict = PreRouter(classifier, min_confidence=confidence + 0.01)
+    assert not strict.route(message).bypass
+
+
+def test_metrics(pre_router):
+    pre_router.route("research fusion power and email me a summary")
+    pre_router.route("hello")
+    pre_router.record(router.ROUTER, 2.0)
+    pre_router.record("research_agent,email_agent", 5.0)
+
+    stats = pre_router.collect_metrics()
+    assert stats["requests"] == 2
+    assert stats["bypass_rate"] == 0.5
+    assert stats["bypassed_by_rule"] == 1
+    assert stats["supervisor_by_classifier"] == 1
+    assert stats["estimated_seconds_saved"] == 3.0
+
+
+class FakeSupervisor:
+    def __init__(self):
+        self.runs = 0
+
+    async def astream_events(self, inputs, version):
+        self.runs += 1
+        messages = [AIMessage(content="From the supervisor", name="supervisor")]
+        yield {
+            "event": "on_chain_end",
+            "name": "LangGraph",
+            "data": {"output": {"messages": messages}},
+            "metadata": {},
+            "parent_ids": [],
+        }
+
+
+class FakePipeline:
+    """
+    Stand-ins for the LLM and email steps of research_email_pipeline.
+    """
+
+    def __init__(self):
+        self.research_error = None
+        self.email_error = None
+        self.emails = []
+
+    async def generate_email_message(self, query):
+        if self.research_error is not None:
+            raise self.research_error
+        return EmailMessageSchema(subject="Fusion", contents="Fusion is hard.")
+
+    async def ainvoke(self, arguments):
+        # send_me_email
+        self.emails.append(arguments)
+        if self.email_error is not None:
+            raise self.email_error
+        return self.email_result
+
+    email_result = "Email queued for sending (id 1)"
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    fake = FakePipeline()
+    monkeypatch.setattr(router, "generate_email_message", fake.generate_email_message)
+    monkeypatch.setattr(api.ai.tools, "send_me_email", fake)
+    return fake
+
+
+INPUTS = {"messages": [{"role": "user", "content": "research fusion, email me"}]}
+
+
+async def collect(events):
+    return [item async for item in events]
+
+
+@pytest.mark.anyio
+async def test_bypass_final(pipeline):
+    finals = []
+
+    async def on_final(response, route):
+        finals.append(route)
+
+    supervisor = FakeSupervisor()
+    events = await collect(chat_events(supervisor, INPUTS, True, on_final))
+
+    assert [name for name, _ in events] == [
+        "handoff",
+        "tool_start",
+        "tool_end",
+        "handoff",
+        "tool_start",
+        "tool_end",
+        "final",
+    ]
+    assert events[-1][1].email_content == "Subject Fusion:\nBody: Fusion is hard."
+    assert finals == [router.ROUTER]
+    assert supervisor.runs == 0
+
+
+@pytest.mark.anyio
+async def test_bypass_falls_back_before_the_email(pipeline):
+    pipeline.research_error = RuntimeError("LLM down")
+    supervisor = FakeSupervisor()
+    events = await collect(chat_events(supervisor, INPUTS, True))
+
+    assert events[-1][1].final_message == "From the supervisor"
+    assert supervisor.runs == 1
+    assert pipeline.emails == []
+
+
+@pytest.mark.anyio
+async def test_bypass_does_not_fall_back_once_emailing(pipeline):
+    pipeline.email_error = RuntimeError("outbox down")
+    supervisor = FakeSupervisor()
+    with pytest.raises(RuntimeError, match="outbox down"):
+        await collect(chat_events(supervisor, INPUTS, True))
+    assert supervisor.runs == 0
+    assert len(pipeline.emails) == 1
+
+
+@pytest.mark.anyio
+async def test_bypass_on_final_failure_is_not_retried(pipeline):
+    async def on_final(response, route):
+        raise RuntimeError("database down")
+
+    supervisor = FakeSupervisor()
+    with pytest.raises(RuntimeError, match="database down"):
+        await collect(chat_events(supervisor, INPUTS, True, on_final))
+    assert supervisor.runs == 0
+    assert len(pipeline.emails) == 1
+
+
+@pytest.mark.anyio
+async def test_run_research_email_pipeline(pipeline):
+    response = await run_research_email_pipeline("research fusion, email me")
+    assert response.final_message.startswith("Researched your request and emailed")
+
+    pipeline.research_error = RuntimeError("LLM down")
+    assert await run_research_email_pipeline("research fusion, email me") is None
+
+    pipeline.research_error = None
+    pipeline.email_error = RuntimeError("outbox down")
+    with pytest.raises(RuntimeError, match="outbox down"):
+        await run_research_email_pipeline("research fusion, email me")
+
+
+@pytest.mark.anyio
+async def test_bypass_reports_emails_that_were_not_queued(pipeline):
+    pipeline.email_result = EMAIL_NOT_QUEUED
+    events = await collect(chat_events(FakeSupervisor(), INPUTS, True))
+
+    name, response = events[-1]
+    assert name == "final"
+    assert "could not email" in response.final_message
+    assert "emailed" not in response.final_message
@@ -0,0 +1,91 @@
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from api.chat.streaming import format_sse, translate_event
+
+
+def event(kind, data, namespace="", node="agent", name="", parent_ids=("run",)):
+    return {
+        "event": kind,
+        "name": name,
+        "data": data,
+        "metadata": {"langgraph_checkpoint_ns": namespace, "langgraph_node": node},
+        "parent_ids": list(parent_ids),
+    }
+
+
+def translate(*args, **kwargs):
+    return list(translate_event(event(*args, **kwargs)))
+
+
+def test_tokens_by_agent():
+    chunk = {"chunk": AIMessageChunk(content="Hi")}
+    assert translate("on_chat_model_stream", chunk) == [
+        ("token", {"agent": "supervisor", "content": "Hi", "in_tool": False})
+    ]
+    namespace = "research_agent:1234|tools:5678"
+    assert translate("on_chat_model_stream", chunk, namespace, node="tools") == [
+        ("token", {"agent": "research_agent", "content": "Hi", "in_tool": True})
+    ]
+    # Tool call chunks have no text.
+    assert (
+        translate("on_chat_model_stream", {"chunk": AIMessageChunk(content="")}) == []
+    )
+
+
+def test_handoffs():
+    name = "transfer_to_email_agent"
+    assert translate("on_tool_start", {"input": {}}, name=name) == []
+    assert translate("on_tool_end", {"output": None}, name=name) == [
+        ("handoff", {"from": "supervisor", "to": "email_agent"})
+    ]
+
+    # Sub-agents hand back through the supervisor graph's stream.
+    chunk = {"chunk": {"research_agent": {}, "supervisor": {}}}
+    assert translate("on_chain_stream", chunk, parent_ids=()) == [
+        ("handoff", {"from": "research_agent", "to": "supervisor"})
+    ]
+    assert translate("on_chain_stream", chunk) == []
+
+
+def test_tool_calls():
+    namespace = "email_agent:1234"
+    start = {"input": {"subject": "Hi"}}
+    assert translate("on_tool_start", start, namespace, name="send_me_email") == [
+        (
+            "tool_start",
+            {"agent": "email_agent", "tool": "send_me_email", "input": start["input"]},
+        )
+    ]
+    end = {"output": ToolMessage(content="Email queued", tool_call_id="1")}
+    assert translate("on_tool_end", end, namespace, name="send_me_email") == [
+        (
+            "tool_end",
+            {"agent": "email_agent", "tool": "send_me_email", "output": "Email queued"},
+        )
+    ]
+
+
+def test_final():
+    messages = [
+        AIMessage(content="Fusion is hard.", name="research_agent"),
+        AIMessage(content="Emailed you.", name="supervisor"),
+    ]
+    [(name, response)] = translate(
+        "on_chain_end", {"output": {"messages": messages}}, parent_ids=()
+    )
+    assert name == "final"
+    assert response.final_message == "Emailed you."
+    assert response.email_content == "Fusion is hard."
+
+    assert translate("on_chain_end", {"output": {}}, parent_ids=()) == [
+        ("error", {"detail": "Error with supervisor"})
+    ]
+    # Nested graphs end too, before the supervisor.
+    assert translate("on_chain_end", {"output": {"messages": messages}}) == []
+
+
+def test_format_sse():
+    assert format_sse("token", {"content": "Hi"}) == (
+        'event: token\ndata: {"content": "Hi"}\n\n'
+    )
+    assert format_sse("final", {}, 7) == "id: 7\nevent: final\ndata: {}\n\n"
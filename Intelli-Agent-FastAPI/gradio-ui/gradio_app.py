@@ -6,6 +6,25 @@ import textwrap
 import time
 
 FASTAPI_URL = os.getenv("FASTAPI_URL", "http://backend:8000/api/chats/")
+FASTAPI_STREAM_URL = os.getenv(
+    "FASTAPI_STREAM_URL", FASTAPI_URL.rstrip("/") + "/stream"
+)
+
+
+def iter_sse(response):
+    """
+    Yield (event, data) pairs from a server-sent events response.
+    """
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if not line:
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:") :].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:") :].strip())
 
 
 def process_prompt(prompt: str):
@@ -21,25 +40,63 @@ def process_prompt(prompt: str):
             "{}",
             duration,
         )
+        return
 
     payload = {"message": prompt}
-    headers = {"Content-Type": "application/json"}
-    final_message, email_content, technical_details = "Error", "Error", "{}"
+    final_message, email_content, technical_details = "Thinking...", "", "{}"
+    # Progress events (tokens left out) shown with the final response.
+    steps = []
+    supervisor_text, research_text = "", ""
 
     try:
-        response = requests.post(FASTAPI_URL, data=json.dumps(payload), headers=headers)
-        response.raise_for_status()
-
-        response_data = response.json()
-
-        final_message = (
-            response_data.get("final_message") or "Could not extract the final message."
-        )
-        email_content = (
-            response_data.get("email_content")
-            or "No detailed email content was returned."
-        )
-        technical_details = json.dumps(response_data, indent=2)
+        with requests.post(
+            FASTAPI_STREAM_URL, json=payload, stream=True, timeout=(10, 300)
+        ) as response:
+            response.raise_for_status()
+
+            for event, data in iter_sse(response):
+                if event == "token":
+                    if data["agent"] == "supervisor":
+                        supervisor_text += data["content"]
+                        final_message = supervisor_text
+                    elif data["agent"] == "research_agent" and not data["in_tool"]:
+                        research_text += data["content"]
+                        email_content = research_text
+                    else:
+                        continue
+                else:
+                    steps.append({"event": event, **data})
+
+                if event == "handoff":
+                    supervisor_text = ""
+                    final_message = (
+                        f"🔀 Handing off from `{data['from']}` to `{data['to']}`..."
+                    )
+                elif event == "tool_start":
+                    final_message = (
+                        f"🛠️ `{data['agent']}` is running `{data['tool']}`..."
+                    )
+                elif event == "tool_end":
+                    final_message = f"✅ `{data['tool']}` finished."
+                    if data["tool"] == "research_email":
+                        email_content = data["output"]
+                elif event == "final":
+                    final_message = (
+                        data.get("final_message")
+                        or "Could not extract the final message."
+                    )
+                    email_content = (
+                        data.get("email_content")
+                        or "No detailed email content was returned."
+                    )
+                    technical_details = json.dumps(
+                        {"response": data, "steps": steps}, indent=2
+                    )
+                elif event == "error":
+                    raise RuntimeError(data.get("detail") or "Error with supervisor")
+
+                duration = f"{time.time() - start_time:.2f} seconds"
+                yield final_message, email_content, technical_details, duration
 
     except requests.exceptions.RequestException as e:
         error_message = f"Error connecting to backend: {e}"
@@ -48,12 +105,12 @@ def process_prompt(prompt: str):
             error_message,
             error_message,
         )
-    except json.JSONDecodeError:
-        error_message = f"Error: Invalid JSON from server. Response: {response.text}"
+    except (json.JSONDecodeError, RuntimeError) as e:
+        error_message = f"Error: Invalid response from server: {e}"
         final_message, email_content, technical_details = (
             error_message,
             error_message,
-            error_message,
+            json.dumps({"error": str(e), "steps": steps}, indent=2),
         )
 
     duration = f"{time.time() - start_time:.2f} seconds"